@@ -0,0 +1,154 @@
+"""Benchmark of game states and of the search over them.
+
+Measures the memory taken by one TwoPlayerGameState (including its
+attribute dictionary, if any), how many states per second can be
+created, both directly and through Reversi.generate_successors, and the
+speed of an alpha-beta search of a few fixed Reversi positions.
+
+The state measurements only use the original interface of
+TwoPlayerGameState, so running this script on an older checkout gives
+the numbers to compare with. The paths added to speed up the search can
+be switched off in the same tree, to compare with and without them:
+
+    python benchmark_states.py                 # everything on
+    python benchmark_states.py --no-in-place   # copy successors
+    python benchmark_states.py --no-in-place --no-lazy
+                                               # ... build all of them and
+                                               # score them on creation
+    python benchmark_states.py --cache-size 65536
+                                               # cache heuristic values
+
+--no-lazy only matters with --no-in-place, since in-place searches do
+not build successors.
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+import argparse
+import random
+import sys
+import time
+
+from game import Player, SearchStats, TwoPlayerGameState
+from heuristic import Heuristic
+from reversi import Reversi
+from strategy import MinimaxAlphaBetaStrategy, RandomStrategy
+
+parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+parser.add_argument('--no-in-place', action='store_true',
+                    help='search with copied successors instead of apply_move')
+parser.add_argument('--no-lazy', action='store_true',
+                    help='build all the successors of a node at once, scored')
+parser.add_argument('--cache-size', type=int, default=0,
+                    help='size of the evaluation cache (0: no cache)')
+parser.add_argument('--depth', type=int, default=4,
+                    help='depth of the alpha-beta search')
+parser.add_argument('--positions', type=int, default=10,
+                    help='number of positions searched')
+parser.add_argument('--states', type=int, default=200000,
+                    help='number of states created')
+args = parser.parse_args()
+
+n_states = args.states
+n_expansions = n_states // 10
+
+
+def node_size(state: TwoPlayerGameState) -> int:
+    """Bytes taken by a state, not counting the objects it refers to."""
+    size = sys.getsizeof(state)
+    attributes = getattr(state, '__dict__', None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes)
+    return size
+
+
+def rate(n: int, seconds: float) -> str:
+    return '{:,.0f}/s'.format(n / seconds)
+
+
+def evaluation_function(state: TwoPlayerGameState) -> float:
+    """Disc, mobility and corner differences, for player MAX."""
+    game = state.game
+    value = (
+        game._coin_diff(state.board)
+        + game._choice_diff(state.board)
+        + game._corner_diff(state.board)
+    )
+    return value if state.is_player_max(state.player1) else -value
+
+
+player_a = Player(name='A', strategy=RandomStrategy())
+player_b = Player(name='B', strategy=RandomStrategy())
+game = Reversi(player1=player_a, player2=player_b, height=8, width=8)
+state = TwoPlayerGameState(game=game, initial_player=player_a).setup_match()
+successor = game.generate_successors(state)[0]
+
+print('Bytes per state: {:d}'.format(node_size(successor)))
+
+time0 = time.perf_counter()
+for _ in range(n_states):
+    state.generate_successor(state.board, None)
+time1 = time.perf_counter()
+print('generate_successor: {}'.format(rate(n_states, time1 - time0)))
+
+time0 = time.perf_counter()
+n_successors = 0
+for _ in range(n_expansions):
+    n_successors += len(game.generate_successors(state))
+time1 = time.perf_counter()
+print('Reversi.generate_successors: {}'.format(rate(n_successors, time1 - time0)))
+
+states = [state.generate_successor(state.board, None) for _ in range(n_states)]
+print('{:,d} states kept alive: {:.1f} MB'.format(
+    len(states),
+    len(states) * node_size(states[0]) / 2**20,
+))
+del states
+
+# Search, with the paths switched off as asked.
+if args.no_in_place:
+    game.supports_apply_move = lambda: False
+if args.no_lazy:
+    def eager_successors(state):
+        successors = list(Reversi.iter_successors(game, state))
+        for successor in successors:
+            successor.end_of_game  # Scored on creation.
+        return iter(successors)
+    game.iter_successors = eager_successors
+
+# Positions after 10 to 30 random moves, the same in every run.
+generator = random.Random(0)
+positions = []
+while len(positions) < args.positions:
+    position = state
+    for _ in range(generator.randrange(10, 31)):
+        if position.end_of_game:
+            break
+        position = generator.choice(game.generate_successors(position))
+    if not position.end_of_game:
+        positions.append(position)
+
+strategy = MinimaxAlphaBetaStrategy(
+    Heuristic('Benchmark', evaluation_function, cache_size=args.cache_size),
+    args.depth,
+)
+search_stats = SearchStats()
+for position in positions:
+    strategy.next_move(position)
+    search_stats.add(strategy.search_stats)
+print('Alpha-beta to depth {} ({}, {}, {}):'.format(
+    args.depth,
+    'copying' if args.no_in_place else 'in place',
+    'eager' if args.no_lazy else 'lazy',
+    'cache of {}'.format(args.cache_size) if args.cache_size else 'no cache',
+))
+print('    {:.2f} s, {:,d} nodes, {:,d} leaves'.format(
+    search_stats.time,
+    search_stats.nodes,
+    search_stats.leaves,
+))
+print('    successors {:.2f} s, heuristic {:.2f} s, copies {:.2f} s'.format(
+    search_stats.successor_time,
+    search_stats.heuristic_time,
+    search_stats.clone_time,
+))
@@ -0,0 +1,448 @@
+"""Bitboard engine for Othello (Reversi).
+
+    A position is stored as two integers, one per colour, in which bit
+    ``(y - 1) * width + (x - 1)`` is set when square ``(x, y)`` holds a
+    disc of that colour. Python integers have arbitrary precision, so
+    boards of any size are supported; 8x8 boards use a move generator
+    with constant masks.
+
+    Legal moves are generated with shift-and-mask flood fills and discs
+    are flipped with rays precomputed for every square.
+
+    This module is shared by juegos/reversi.py and pacman/othello.py,
+    which loads it from this file, so it must not import anything from
+    either project.
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Unit steps (delta_x, delta_y) of the eight directions.
+DIRECTIONS = (
+    (0, 1), (1, 0), (1, -1), (1, 1),
+    (0, -1), (-1, 0), (-1, 1), (-1, -1),
+)
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bits: int) -> int:
+        """Number of bits set."""
+        return bin(bits).count('1')
+
+
+def iter_squares(bits: int) -> Iterator[int]:
+    """Indices of the bits set, in increasing order."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+# Constants for the 8x8 fast path.
+_FULL_8x8 = 0xFFFFFFFFFFFFFFFF
+_INNER_COLUMNS_8x8 = 0x7E7E7E7E7E7E7E7E
+
+
+def _moves_8x8(own: int, opp: int) -> int:
+    """Legal moves on an 8x8 board (unrolled flood fill)."""
+    empty = ~(own | opp) & _FULL_8x8
+    inner = opp & _INNER_COLUMNS_8x8
+    moves = 0
+    # Masking the opponent discs of the edge columns prevents horizontal
+    # and diagonal runs from wrapping around the board.
+    for shift, mask in ((1, inner), (8, opp), (7, inner), (9, inner)):
+        run = mask & (own << shift)
+        run |= mask & (run << shift)
+        run |= mask & (run << shift)
+        run |= mask & (run << shift)
+        run |= mask & (run << shift)
+        run |= mask & (run << shift)
+        moves |= empty & (run << shift)
+
+        run = mask & (own >> shift)
+        run |= mask & (run >> shift)
+        run |= mask & (run >> shift)
+        run |= mask & (run >> shift)
+        run |= mask & (run >> shift)
+        run |= mask & (run >> shift)
+        moves |= empty & (run >> shift)
+    return moves
+
+
+class Geometry(object):
+    """Masks and rays of a board with a given size."""
+
+    def __init__(self, height: int, width: int) -> None:
+        self.height = height
+        self.width = width
+        self.n_squares = height * width
+        self.full = (1 << self.n_squares) - 1
+
+        first_column = sum(1 << (y * width) for y in range(height))
+        last_column = first_column << (width - 1)
+        self.inner_columns = self.full & ~(first_column | last_column)
+
+        # Shifts of the flood fill along the four axes, and whether the
+        # axis has a horizontal component (and thus may wrap around).
+        self._axes = tuple(
+            (shift, horizontal)
+            for (shift, horizontal) in (
+                (1, True), (width, False), (width - 1, True), (width + 1, True),
+            )
+            if shift > 0
+        )
+
+        # For every square, the ray in each direction and whether it
+        # points towards higher bits.
+        self.rays = tuple(
+            tuple(
+                self._ray(square, delta_x, delta_y)
+                for (delta_x, delta_y) in DIRECTIONS
+            )
+            for square in range(self.n_squares)
+        )
+
+        self._moves = _moves_8x8 if (height, width) == (8, 8) else None
+
+    def _ray(self, square: int, delta_x: int, delta_y: int) -> Tuple[int, bool]:
+        x, y = self.position(square)
+        ray = 0
+        x, y = x + delta_x, y + delta_y
+        while 1 <= x <= self.width and 1 <= y <= self.height:
+            ray |= 1 << self.square((x, y))
+            x, y = x + delta_x, y + delta_y
+        return ray, (delta_y * self.width + delta_x) > 0
+
+    def square(self, position: Tuple[int, int]) -> int:
+        """Bit index of a position (x, y), with 1 <= x <= width."""
+        x, y = position
+        if not (1 <= x <= self.width and 1 <= y <= self.height):
+            raise KeyError(position)
+        return (y - 1) * self.width + (x - 1)
+
+    def position(self, square: int) -> Tuple[int, int]:
+        """Position (x, y) of a bit index."""
+        return square % self.width + 1, square // self.width + 1
+
+    def moves(self, own: int, opp: int) -> int:
+        """Mask of the legal moves of the player owning ``own``."""
+        if self._moves is not None:
+            return self._moves(own, opp)
+        empty = self.full & ~(own | opp)
+        moves = 0
+        for shift, horizontal in self._axes:
+            mask = opp & self.inner_columns if horizontal else opp
+            run = mask & (own << shift)
+            while run:
+                run <<= shift
+                moves |= run & empty
+                run &= mask
+            run = mask & (own >> shift)
+            while run:
+                run >>= shift
+                moves |= run & empty
+                run &= mask
+        return moves
+
+    def flips(self, own: int, opp: int, square: int) -> int:
+        """Mask of the discs flipped when ``own`` plays on ``square``."""
+        flipped = 0
+        for ray, ascending in self.rays[square]:
+            blockers = ray & ~opp
+            if not blockers:
+                continue
+            if ascending:
+                blocker = blockers & -blockers
+                if blocker & own:
+                    flipped |= ray & (blocker - 1)
+            else:
+                blocker = 1 << (blockers.bit_length() - 1)
+                if blocker & own:
+                    flipped |= ray & -(blocker << 1)
+        return flipped
+
+    def flips_in_direction(
+        self,
+        own: int,
+        opp: int,
+        square: int,
+        direction: Tuple[int, int],
+    ) -> int:
+        """Mask of the discs flipped along one direction only."""
+        ray, ascending = self.rays[square][DIRECTIONS.index(direction)]
+        blockers = ray & ~opp
+        if not blockers:
+            return 0
+        if ascending:
+            blocker = blockers & -blockers
+            return ray & (blocker - 1) if blocker & own else 0
+        blocker = 1 << (blockers.bit_length() - 1)
+        return ray & -(blocker << 1) if blocker & own else 0
+
+
+@lru_cache(maxsize=None)
+def geometry(height: int, width: int) -> Geometry:
+    """Shared geometry for boards of a given size."""
+    return Geometry(height, width)
+
+
+class OthelloBoard(Mapping):
+    """Othello position backed by bitboards.
+
+    The board behaves as a read-only ``dict`` that maps each occupied
+    position ``(x, y)`` to the label of its disc, so code written for the
+    dictionary boards keeps working. ``labels`` are the labels of the
+    first (black) and second (white) player.
+
+    The legal moves of each player are computed once per position.
+    """
+
+    __slots__ = ('geometry', 'black', 'white', 'labels', '_moves')
+
+    def __init__(
+        self,
+        height: int,
+        width: int,
+        black: int = 0,
+        white: int = 0,
+        labels: Tuple[Any, Any] = ('B', 'W'),
+    ) -> None:
+        self.geometry = geometry(height, width)
+        self.black = black
+        self.white = white
+        self.labels = tuple(labels)
+        self._moves: Optional[List[Optional[int]]] = None
+
+    @classmethod
+    def from_dict(
+        cls,
+        board: Dict[Tuple[int, int], Any],
+        height: int,
+        width: int,
+        labels: Tuple[Any, Any] = ('B', 'W'),
+    ) -> OthelloBoard:
+        """Convert a dictionary board."""
+        new_board = cls(height, width, labels=labels)
+        black = white = 0
+        for position, label in board.items():
+            bit = 1 << new_board.geometry.square(position)
+            if label == new_board.labels[0]:
+                black |= bit
+            elif label == new_board.labels[1]:
+                white |= bit
+            else:
+                raise ValueError('Unknown label {!r} at {}'.format(label, position))
+        new_board.black = black
+        new_board.white = white
+        new_board._moves = None
+        return new_board
+
+    def to_dict(self) -> Dict[Tuple[int, int], Any]:
+        """Convert to a dictionary board."""
+        return dict(self.items())
+
+    @property
+    def height(self) -> int:
+        return self.geometry.height
+
+    @property
+    def width(self) -> int:
+        return self.geometry.width
+
+    def _derive(self, black: int, white: int) -> OthelloBoard:
+        board = OthelloBoard.__new__(OthelloBoard)
+        board.geometry = self.geometry
+        board.black = black
+        board.white = white
+        board.labels = self.labels
+        board._moves = None
+        return board
+
+    def bits(self, label: Any) -> Tuple[int, int]:
+        """Bitboards (own, opponent) from the point of view of a player."""
+        if label == self.labels[0]:
+            return self.black, self.white
+        if label == self.labels[1]:
+            return self.white, self.black
+        raise ValueError('Unknown player label {!r}'.format(label))
+
+    def count(self, label: Any) -> int:
+        """Number of discs of a player."""
+        return popcount(self.bits(label)[0])
+
+    def valid_moves(self, label: Any) -> int:
+        """Mask of the legal moves of a player."""
+        if label == self.labels[0]:
+            index = 0
+        elif label == self.labels[1]:
+            index = 1
+        else:
+            raise ValueError('Unknown player label {!r}'.format(label))
+        if self._moves is None:
+            self._moves = [None, None]
+        moves = self._moves[index]
+        if moves is None:
+            own, opp = self.bits(label)
+            moves = self._moves[index] = self.geometry.moves(own, opp)
+        return moves
+
+    def legal_moves(self, label: Any) -> List[Tuple[int, int]]:
+        """Positions (x, y) of the legal moves of a player."""
+        position = self.geometry.position
+        return [position(square) for square in iter_squares(self.valid_moves(label))]
+
+    def flips(self, label: Any, move: Tuple[int, int]) -> int:
+        """Mask of the discs captured by a move."""
+        own, opp = self.bits(label)
+        return self.geometry.flips(own, opp, self.geometry.square(move))
+
+    def captured(self, label: Any, move: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Positions of the discs captured by a move."""
+        position = self.geometry.position
+        return [position(square) for square in iter_squares(self.flips(label, move))]
+
+    def play(self, label: Any, move: Tuple[int, int]) -> OthelloBoard:
+        """Board after a move. The current board is not modified."""
+        own, opp = self.bits(label)
+        square = self.geometry.square(move)
+        flipped = self.geometry.flips(own, opp, square)
+        own |= flipped | (1 << square)
+        opp ^= flipped
+        if label == self.labels[0]:
+            return self._derive(own, opp)
+        return self._derive(opp, own)
+
+    # In-place updates, meant for search. They bypass the read-only view.
+
+    def play_in_place(self, label: Any, move: Tuple[int, int]) -> Tuple[int, int]:
+        """Make a move on this board; return (placed, flipped) for unplay()."""
+        own, opp = self.bits(label)
+        square = self.geometry.square(move)
+        flipped = self.geometry.flips(own, opp, square)
+        placed = flipped | (1 << square)
+        self._toggle(label, placed, flipped)
+        return placed, flipped
+
+    def unplay(self, label: Any, placed: int, flipped: int) -> None:
+        """Take back a move made with play_in_place()."""
+        self._toggle(label, placed, flipped)
+
+    def _toggle(self, label: Any, placed: int, flipped: int) -> None:
+        self._moves = None
+        if label == self.labels[0]:
+            self.black ^= placed
+            self.white ^= flipped
+        else:
+            self.white ^= placed
+            self.black ^= flipped
+
+    def read_only(self) -> OthelloBoard:
+        """Frozen copy of the board, which copies no discs.
+
+        The copy shares the cache of legal moves with this board, so
+        legal moves found on either are computed once.
+        """
+        if self._moves is None:
+            self._moves = [None, None]
+        return FrozenOthelloBoard(self)
+
+    # Read-only dictionary interface
+
+    def __getitem__(self, position: Tuple[int, int]) -> Any:
+        bit = 1 << self.geometry.square(position)
+        if self.black & bit:
+            return self.labels[0]
+        if self.white & bit:
+            return self.labels[1]
+        raise KeyError(position)
+
+    def get(self, position: Tuple[int, int], default: Optional[Any] = None) -> Any:
+        try:
+            return self[position]
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    def __contains__(self, position: Any) -> bool:
+        try:
+            bit = 1 << self.geometry.square(position)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return bool((self.black | self.white) & bit)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        position = self.geometry.position
+        for square in iter_squares(self.black | self.white):
+            yield position(square)
+
+    def __len__(self) -> int:
+        return popcount(self.black | self.white)
+
+    def copy(self) -> Dict[Tuple[int, int], Any]:
+        """Mutable dictionary copy, as ``dict.copy`` would return."""
+        return self.to_dict()
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, OthelloBoard):
+            return (
+                self.black == other.black
+                and self.white == other.white
+                and self.labels == other.labels
+                and self.geometry.n_squares == other.geometry.n_squares
+            )
+        return super().__eq__(other)
+
+    def __hash__(self) -> int:
+        return hash((self.black, self.white))
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    # Boards share the geometry, which is immutable and expensive to copy.
+
+    def __copy__(self) -> OthelloBoard:
+        return self._derive(self.black, self.white)
+
+    def __deepcopy__(self, memo: dict) -> OthelloBoard:
+        return self._derive(self.black, self.white)
+
+    def __reduce__(self) -> tuple:
+        return (
+            OthelloBoard,
+            (self.height, self.width, self.black, self.white, self.labels),
+        )
+
+
+class FrozenOthelloBoard(OthelloBoard):
+    """Othello position that cannot be changed, handed to evaluation functions.
+
+    Discs cannot be set and moves cannot be made in place; play(), copy()
+    and deepcopy() return ordinary boards.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, board: OthelloBoard) -> None:
+        for name in OthelloBoard.__slots__:
+            object.__setattr__(self, name, getattr(board, name))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('Boards are read-only during evaluation.')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('Boards are read-only during evaluation.')
+
+    def read_only(self) -> OthelloBoard:
+        return self
+
+    def play_in_place(self, label: Any, move: Tuple[int, int]) -> Tuple[int, int]:
+        raise AttributeError('Boards are read-only during evaluation.')
+
+    def unplay(self, label: Any, placed: int, flipped: int) -> None:
+        raise AttributeError('Boards are read-only during evaluation.')
+
+    def _toggle(self, label: Any, placed: int, flipped: int) -> None:
+        raise AttributeError('Boards are read-only during evaluation.')
@@ -0,0 +1,203 @@
+"""Self-play datasets of Reversi positions.
+
+SelfPlayWriter records the positions of the matches played by
+TwoPlayerMatch.play_many (see its recorder argument), with the final
+result of each match, to be used e.g. to tune heuristics. Positions are
+streamed to a .npy file of SAMPLE_RECORD records that is mapped in
+memory and grown as needed, so memory use does not depend on the size
+of the dataset. The file can be read with numpy.load at any time after
+flush().
+
+Each writer has its own file (a shard), so that writers can run in
+parallel processes (see self_play_shard). concatenate_shards() joins
+shards into a single file, copying them chunk by chunk.
+
+Records of SAMPLE_RECORD (20 bytes each):
+
+    black, white: bitboards of the discs of player1 and player2, as in
+        bitboard.OthelloBoard (bit (y-1)*width + (x-1) is square (x, y)).
+    player: player on turn, 0 for player1 and 1 for player2.
+    ply: number of moves played in the match before the position.
+    outcome: final disc difference of the match (player1 - player2).
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+import struct
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game import TwoPlayerGameState, TwoPlayerMatch
+
+SAMPLE_RECORD = np.dtype([
+    ('black', '<u8'),
+    ('white', '<u8'),
+    ('player', 'u1'),
+    ('ply', '<u2'),
+    ('outcome', 'i1'),
+])
+
+# Fixed size of the .npy header, with room for any number of records,
+# so that it can be rewritten in place as the file grows.
+_HEADER_SIZE = 256
+
+
+def _npy_header(n_records: int) -> bytes:
+    """Header of a version 1.0 .npy file with n_records SAMPLE_RECORDs."""
+    header = repr({
+        'descr': np.lib.format.dtype_to_descr(SAMPLE_RECORD),
+        'fortran_order': False,
+        'shape': (n_records,),
+    })
+    prefix = np.lib.format.magic(1, 0) + struct.pack('<H', _HEADER_SIZE - 10)
+    return prefix + header.ljust(_HEADER_SIZE - len(prefix) - 1).encode('latin1') + b'\n'
+
+
+class SelfPlayWriter(object):
+    """Stream self-play positions to a memory-mapped .npy file.
+
+    The positions of a match are kept until end_game() is called, when
+    the final result is known, and are then written to the file at path,
+    which is created (or overwritten). Room for capacity records is
+    reserved first, and doubled whenever it is full. Call close() (or use
+    the writer in a with statement) to trim the file to its records.
+
+    The game must be Reversi, or another game whose board_key is a pair
+    of bitboards of at most 64 squares.
+    """
+
+    def __init__(self, path: str, capacity: int = 2**16) -> None:
+        self.path = path
+        self.n_games = 0
+        self._file = open(path, 'w+b')
+        self._n_records = 0
+        self._capacity = 0
+        self._records: Optional[np.memmap] = None
+        self._game: List[Tuple[int, int, int, int]] = []
+        self._grow(max(capacity, 1))
+        self._file.write(_npy_header(0))
+
+    def __enter__(self) -> SelfPlayWriter:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._n_records
+
+    def add_position(self, state: TwoPlayerGameState) -> None:
+        """Record a position of the current match."""
+        game = state.game
+        black, white = game.board_key(state.board)
+        player = 0 if state.next_player.label == game.player1.label else 1
+        self._game.append((black, white, player, len(self._game)))
+
+    def end_game(self, state: TwoPlayerGameState) -> None:
+        """Write the positions of the match that ended in state."""
+        scores = state.scores
+        outcome = int(scores[0] - scores[1])
+        positions = self._game
+        self._game = []
+        self.n_games += 1
+        if not positions:
+            return
+        n_records = self._n_records + len(positions)
+        if n_records > self._capacity:
+            self._grow(max(n_records, 2 * self._capacity))
+        records = self._records[self._n_records:n_records]
+        columns = np.array(positions, dtype=np.uint64).T
+        records['black'] = columns[0]
+        records['white'] = columns[1]
+        records['player'] = columns[2]
+        records['ply'] = columns[3]
+        records['outcome'] = outcome
+        self._n_records = n_records
+
+    def flush(self) -> None:
+        """Write the records to disk, so that the file can be read."""
+        if self._records is None:
+            return
+        self._records.flush()
+        self._file.seek(0)
+        self._file.write(_npy_header(self._n_records))
+        self._file.flush()
+
+    def close(self) -> None:
+        """Flush the records and trim the file to them."""
+        if self._records is None:
+            return
+        self.flush()
+        self._records = None
+        self._file.truncate(_HEADER_SIZE + self._n_records * SAMPLE_RECORD.itemsize)
+        self._file.close()
+
+    def _grow(self, capacity: int) -> None:
+        """Make room in the file for capacity records and map them."""
+        if self._records is not None:
+            self._records.flush()
+            self._records = None
+        self._file.truncate(_HEADER_SIZE + capacity * SAMPLE_RECORD.itemsize)
+        self._records = np.memmap(
+            self._file,
+            dtype=SAMPLE_RECORD,
+            mode='r+',
+            offset=_HEADER_SIZE,
+            shape=(capacity,),
+        )
+        self._capacity = capacity
+
+
+def self_play_shard(
+    match: TwoPlayerMatch,
+    path: str,
+    n_games: int,
+    random_plies: int = 0,
+    seed: Optional[int] = None,
+) -> int:
+    """Play n_games matches and write their positions to the shard at path.
+
+    Module level function, so that shards can be written in parallel,
+    e.g. with different paths and seeds in a ProcessPoolExecutor (the
+    match must then be picklable). Returns the number of records.
+    """
+    with SelfPlayWriter(path) as writer:
+        match.play_many(n_games, random_plies, seed, recorder=writer)
+    return len(writer)
+
+
+def concatenate_shards(
+    paths: Sequence[str],
+    path: str,
+    chunk_size: int = 2**20,
+) -> int:
+    """Join the shards at paths into a single file at path.
+
+    Shards are mapped in memory and copied chunk_size records at a time,
+    so they need not fit in memory. Returns the number of records.
+    """
+    shards = [np.load(shard_path, mmap_mode='r') for shard_path in paths]
+    for shard_path, shard in zip(paths, shards):
+        if shard.dtype != SAMPLE_RECORD or shard.ndim != 1:
+            raise ValueError('{} is not a self-play shard'.format(shard_path))
+    n_records = sum(len(shard) for shard in shards)
+    if n_records == 0:
+        np.save(path, np.empty(0, dtype=SAMPLE_RECORD))
+        return 0
+
+    output = np.lib.format.open_memmap(
+        path,
+        mode='w+',
+        dtype=SAMPLE_RECORD,
+        shape=(n_records,),
+    )
+    start = 0
+    for shard in shards:
+        for chunk_start in range(0, len(shard), chunk_size):
+            chunk = shard[chunk_start:chunk_start + chunk_size]
+            output[start:start + len(chunk)] = chunk
+            start += len(chunk)
+    output.flush()
+    del output
+    return n_records
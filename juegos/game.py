@@ -9,10 +9,12 @@
 from __future__ import annotations  # For Python 3.7
 
 import copy
+import random
 import time
 from abc import ABC, abstractmethod
 from tkinter import Frame, Tk, messagebox
-from typing import Any, Callable, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 
@@ -20,6 +22,120 @@ import _thread
 import threading
 from contextlib import contextmanager
 
+class _Pending(object):
+    """Type of _PENDING, which stays the same object when pickled."""
+
+    def __reduce__(self) -> str:
+        return '_PENDING'
+
+
+# Placeholder for state attributes that have not been computed yet.
+_PENDING = _Pending()
+
+
+class Deadline(object):
+    """Time limit of a move, checked by the strategy while it searches.
+
+    Strategies that search compare the time with end_time every
+    check_every nodes and, when the time is up, return the best move
+    found so far instead of being interrupted.
+    """
+
+    def __init__(self, seconds: float, check_every: int = 256) -> None:
+        self.seconds = seconds
+        self.check_every = check_every
+        self.end_time = time.time() + seconds
+
+
+class SearchStats(object):
+    """Statistics of the search of a strategy.
+
+    Searching strategies fill in a new instance (strategy.search_stats)
+    on every call to next_move, and TwoPlayerMatch adds them up for each
+    player. Counts only cover the search done in the process of the
+    strategy, not in its worker processes.
+
+    Attributes:
+        n_moves: number of moves (1, unless the statistics are a sum).
+        nodes: nodes expanded (whose successors were generated).
+        leaves: leaves evaluated with the heuristic.
+        cutoffs: alpha-beta cutoffs.
+        depth: depth of the deepest completed search.
+        time: seconds spent in next_move.
+        heuristic_time: seconds spent evaluating leaves.
+        successor_time: seconds spent generating successors (or making
+            and taking back moves in place).
+        clone_time: seconds spent copying states.
+    """
+
+    _COUNTERS = (
+        'n_moves',
+        'nodes',
+        'leaves',
+        'cutoffs',
+        'depth',
+        'time',
+        'heuristic_time',
+        'successor_time',
+        'clone_time',
+    )
+
+    def __init__(self, n_moves: int = 1) -> None:
+        self.n_moves = n_moves
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.depth = 0
+        self.time = 0.0
+        self.heuristic_time = 0.0
+        self.successor_time = 0.0
+        self.clone_time = 0.0
+
+    @property
+    def mean_depth(self) -> float:
+        """Depth reached, on average over the moves."""
+        return self.depth / self.n_moves if self.n_moves else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        """Nodes and leaves visited per second."""
+        return (self.nodes + self.leaves) / self.time if self.time > 0 else 0.0
+
+    @property
+    def effective_branching_factor(self) -> float:
+        """b such that b ** depth is the number of nodes and leaves of a move."""
+        if not self.n_moves or self.mean_depth <= 0:
+            return 0.0
+        return ((self.nodes + self.leaves) / self.n_moves) ** (1 / self.mean_depth)
+
+    def add(self, other: SearchStats) -> None:
+        """Add the statistics of other to these."""
+        for name in self._COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> dict:
+        """Statistics, including the derived ones, as a dictionary."""
+        stats = {name: getattr(self, name) for name in self._COUNTERS}
+        stats['nodes_per_second'] = self.nodes_per_second
+        stats['effective_branching_factor'] = self.effective_branching_factor
+        return stats
+
+    def __repr__(self) -> str:
+        return (
+            '{}(n_moves={}, nodes={}, leaves={}, cutoffs={}, depth={}, '
+            'time={:.3g}s, nps={:.0f}, ebf={:.3g})'.format(
+                type(self).__name__,
+                self.n_moves,
+                self.nodes,
+                self.leaves,
+                self.cutoffs,
+                self.depth,
+                self.time,
+                self.nodes_per_second,
+                self.effective_branching_factor,
+            )
+        )
+
 
 class Player(object):
     """Player properties."""
@@ -39,16 +155,125 @@ class Player(object):
         self,
         state: TwoPlayerGameState,
         gui: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> TwoPlayerGameState:
         """Player's move."""
         if self.delay > 0:
             time.sleep(self.delay)
-        return self.strategy.next_move(state, gui)
+        if deadline is None:
+            return self.strategy.next_move(state, gui)
+        return self.strategy.next_move(state, gui, deadline)
+
+    def read_only(self) -> Player:
+        """Immutable view of the player, without access to its strategy."""
+        view = self.__dict__.get('_read_only_view')
+        if view is None:
+            view = self._read_only_view = ReadOnlyPlayer(self)
+        return view
+
+
+class ReadOnlyPlayer(Player):
+    """Immutable view of a player, handed to evaluation functions."""
+
+    def __init__(self, player: Player) -> None:
+        object.__setattr__(self, '_player', player)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('Players are read-only during evaluation.')
+
+    @property
+    def name(self) -> str:
+        return self._player.name
+
+    @property
+    def label(self) -> Any:
+        return self._player.label
+
+    @property
+    def delay(self) -> int:
+        return self._player.delay
+
+    @property
+    def strategy(self) -> "Strategy":
+        raise AttributeError('Strategies are not available during evaluation.')
+
+    def move(
+        self,
+        state: TwoPlayerGameState,
+        gui: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> TwoPlayerGameState:
+        raise AttributeError('Players are read-only during evaluation.')
+
+    def read_only(self) -> Player:
+        return self
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ReadOnlyPlayer):
+            other = other._player
+        return self._player is other
+
+    def __hash__(self) -> int:
+        return hash(self._player)
+
+    def __reduce__(self) -> tuple:
+        return ReadOnlyPlayer, (self._player,)
+
+
+class GuiSession(threading.Thread):
+    """Graphical interface of a match, running in its own thread.
+
+    There is one session per match, stored in TwoPlayerGame.gui_session,
+    so that game states (and thus search nodes) carry no GUI handles.
+    """
+
+    def __init__(self, game: TwoPlayerGame, board: Any):
+        threading.Thread.__init__(self)
+        self.game = game
+        self.board = board
+        self.gui_root = None
+        self.gui_frame = None
+        self.gui_buttons = None
+        self.setDaemon(True)
+        self.start()
+
+    def run(self):
+        self.gui_root = Tk()
+        self.gui_root.title(self.game.name)
+
+        def on_closing():
+            if messagebox.askokcancel("Quit", "Do you want to quit?"):
+                self.gui_root.destroy()
+                self.gui_root.quit()
+                self.gui_root = None
+        self.gui_root.protocol("WM_DELETE_WINDOW", on_closing)
+        self.gui_frame = Frame(self.gui_root)
+        self.gui_frame.pack()
+        self.gui_buttons = self.game.initialize_buttons(self.board, self.gui_frame)
+        self.gui_root.mainloop()
+
+    def __deepcopy__(self, memo: dict) -> GuiSession:
+        # Cloned states keep displaying in the same window.
+        return self
 
 
 class TwoPlayerGameState(object):
     """State of a two-player game."""
 
+    # Search trees hold many states: avoid a __dict__ per instance.
+    __slots__ = (
+        'game',
+        'player_max',
+        'next_player',
+        '_end_of_game',
+        '_scores',
+        '_legal_moves',
+        '_zobrist',
+        'board',
+        'move_code',
+        'parent',
+    )
+
     def __init__(
         self,
         game: Optional[TwoPlayerGame] = None,
@@ -61,21 +286,73 @@ class TwoPlayerGameState(object):
         self.game = game
         self.player_max = player_max
         self.next_player = initial_player
-        self.end_of_game: Optional[bool] = None
-        self.scores: Optional[np.ndarray] = None
+        # Computed on first access (see end_of_game and scores).
+        self._end_of_game: Any = _PENDING
+        self._scores: Any = _PENDING
+        # Legal moves of each player, by label (see legal_moves).
+        self._legal_moves: Optional[dict] = None
+        # Zobrist hash (see TwoPlayerGame.zobrist_hash).
+        self._zobrist: Optional[int] = None
         self.board = board
         self.move_code = move_code
         self.parent = parent
-        # variables for GUI:
-        self.gui_root = None
-        self.gui_frame = None
-        self.gui_buttons = None
-        self.gui_thread = None
+
+    @property
+    def end_of_game(self) -> Optional[bool]:
+        """Whether the game is over (computed on first access)."""
+        if self._end_of_game is _PENDING:
+            self._score()
+        return None if self._end_of_game is _PENDING else self._end_of_game
+
+    @end_of_game.setter
+    def end_of_game(self, end_of_game: Optional[bool]) -> None:
+        self._end_of_game = end_of_game
+
+    @property
+    def scores(self) -> Optional[np.ndarray]:
+        """Scores of the players (computed on first access)."""
+        if self._scores is _PENDING:
+            self._score()
+        return None if self._scores is _PENDING else self._scores
+
+    @scores.setter
+    def scores(self, scores: Optional[np.ndarray]) -> None:
+        self._scores = scores
+
+    def _score(self) -> None:
+        """Fill in whichever of end_of_game and scores is pending."""
+        if self.game is None or self.board is None:
+            return  # Not set up yet.
+        end_of_game, scores = self.game.score(self)
+        if self._end_of_game is _PENDING:
+            self._end_of_game = end_of_game
+        if self._scores is _PENDING:
+            self._scores = scores
+
+    def legal_moves(self, player: Optional[Player] = None) -> list:
+        """Legal moves of a player (by default, the one on turn).
+
+        The list is computed once per state and player, and shared by
+        terminal detection, expansion and display: do not modify it.
+        """
+        if player is None:
+            player = self.next_player
+        if self._legal_moves is None:
+            self._legal_moves = {}
+        try:
+            return self._legal_moves[player.label]
+        except KeyError:
+            assert isinstance(self.game, TwoPlayerGame)
+            moves = self.game.compute_legal_moves(self, player)
+            self._legal_moves[player.label] = moves
+            return moves
 
     @property
     def previous_player(self) -> Player:
-        if self.parent:
-            return self.parent.next_player
+        # Players alternate (passing is a move), so this does not need the
+        # parent, which is None when moves are applied in place.
+        if self.game is not None and self.next_player is not None:
+            return self.game.opponent(self.next_player)
 
     @property
     def player1(self) -> Player:
@@ -98,35 +375,7 @@ class TwoPlayerGameState(object):
         if self.board is None:
             self.board = self.game.initialize_board()
         if gui:
-            class GuiThread(threading.Thread):
-                def __init__(self, game: TwoPlayerGame, board: Any):
-                    threading.Thread.__init__(self)
-                    self.game = game
-                    self.board = board
-                    self.gui_root = None
-                    self.gui_frame = None
-                    self.gui_buttons = None
-                    self.setDaemon(True)
-                    self.start()
-
-                def run(self):
-                    self.gui_root = Tk()
-                    self.gui_root.title(self.game.name)
-
-                    def on_closing():
-                        if messagebox.askokcancel("Quit", "Do you want to quit?"):
-                            self.gui_root.destroy()
-                            self.gui_root.quit()
-                            self.gui_root = None
-                    self.gui_root.protocol("WM_DELETE_WINDOW", on_closing)
-                    self.gui_frame = Frame(self.gui_root)
-                    self.gui_frame.pack()
-                    self.gui_buttons = self.game.initialize_buttons(self.board, self.gui_frame)
-                    self.gui_root.mainloop()
-            self.gui_thread = GuiThread(self.game, self.board)
-            self.gui_frame = self.gui_thread.gui_frame
-            self.gui_root = self.gui_thread.gui_root
-            self.gui_buttons = self.gui_thread.gui_buttons
+            self.game.gui_session = GuiSession(self.game, self.board)
         return self
 
     def is_player_max(self, player: Player) -> bool:
@@ -143,13 +392,34 @@ class TwoPlayerGameState(object):
         c.move_code = copy.deepcopy(self.move_code)
         c.parent = self.parent
 
-        c.end_of_game = self.end_of_game
-        c.scores = self.scores
+        c._end_of_game = self._end_of_game
+        c._scores = self._scores
+        c._zobrist = self._zobrist
 
-        c.gui_root = self.gui_root
-        c.gui_frame = self.gui_frame
-        c.gui_buttons = self.gui_buttons
-        c.gui_thread = self.gui_thread
+        return c
+
+    def copy(self) -> TwoPlayerGameState:
+        """Copy that shares game and players but owns its board.
+
+        Unlike clone(), nothing but the board is copied, so the copy is
+        cheap enough to walk down and up the game tree with apply_move()
+        and undo_move(). Its parent is None: moves applied in place do
+        not build parent states, so a parent would be wrong below the
+        copy.
+        """
+        assert isinstance(self.game, TwoPlayerGame)
+        c = TwoPlayerGameState(
+            game=self.game,
+            initial_player=self.next_player,
+            player_max=self.player_max,
+            board=self.game.copy_board(self.board),
+            move_code=self.move_code,
+        )
+
+        c._end_of_game = self._end_of_game
+        c._scores = self._scores
+        c._legal_moves = self._legal_moves
+        c._zobrist = self._zobrist
 
         return c
 
@@ -174,27 +444,25 @@ class TwoPlayerGameState(object):
         successor.move_code = move_code
         successor.parent = self
 
-        end_of_game, scores = self.game.score(successor)
-        successor.end_of_game = end_of_game
-        successor.scores = scores
-
-        successor.gui_root = self.gui_root
-        successor.gui_frame = self.gui_frame
-        successor.gui_buttons = self.gui_buttons
-        successor.gui_thread = self.gui_thread
-
         return successor
 
-    def move(self, gui: bool = False) -> TwoPlayerGameState:
-        """Make move."""
+    def read_only(self) -> TwoPlayerGameState:
+        """Read-only view of the state, which copies nothing."""
+        return ReadOnlyState(self)
+
+    def move(
+        self,
+        gui: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> TwoPlayerGameState:
+        """Make move, within the deadline if one is given."""
         assert isinstance(self.next_player, Player)
-        next_state = self.next_player.move(self, gui)
+        next_state = self.next_player.move(self, gui, deadline)
         if gui:
-            self.gui_root = self.gui_thread.gui_root
-            self.gui_buttons = self.gui_thread.gui_buttons
+            gui_session = self.game.gui_session
             self.game.gui_update(state=next_state,
-                                 gui_buttons=self.gui_buttons,
-                                 gui_root=self.gui_root,
+                                 gui_buttons=gui_session.gui_buttons,
+                                 gui_root=gui_session.gui_root,
                                  moves=[],
                                  click_function=None)
         assert isinstance(self.game, TwoPlayerGame)
@@ -208,6 +476,133 @@ class TwoPlayerGameState(object):
         self.game.display(self, gui)
 
 
+def _read_only_board(board: Any) -> Any:
+    """Read-only proxy of a board, without copying it."""
+    if isinstance(board, np.ndarray):
+        view = board.view()
+        view.flags.writeable = False
+        return view
+    if isinstance(board, dict):
+        return MappingProxyType(board)
+    if isinstance(board, list):
+        return tuple(board)
+    if hasattr(board, 'read_only'):
+        # E.g. bitboard.OthelloBoard, which can be played in place.
+        return board.read_only()
+    # Strings and other immutable boards.
+    return board
+
+
+class ReadOnlyState(TwoPlayerGameState):
+    """Read-only view of a game state, handed to evaluation functions.
+
+    Nothing is copied: the board is wrapped in a read-only proxy, the
+    players in ReadOnlyPlayer views and the game in a ReadOnlyGame view.
+    Methods that build new states (generate_successor, clone, copy) work
+    on the underlying state.
+    """
+
+    __slots__ = ('_state', '_board')
+
+    def __init__(self, state: TwoPlayerGameState) -> None:
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, '_board', _read_only_board(state.board))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(
+            'Game states are read-only during evaluation; '
+            'use clone() to get a copy that can be modified.'
+        )
+
+    @property
+    def game(self) -> TwoPlayerGame:
+        return self._state.game.read_only()
+
+    @property
+    def board(self) -> Any:
+        return self._board
+
+    @property
+    def move_code(self) -> Any:
+        return self._state.move_code
+
+    @property
+    def parent(self) -> Optional[TwoPlayerGameState]:
+        parent = self._state.parent
+        return None if parent is None else parent.read_only()
+
+    @property
+    def next_player(self) -> Player:
+        return self._state.next_player.read_only()
+
+    @property
+    def player_max(self) -> Player:
+        return self._state.player_max.read_only()
+
+    @property
+    def player1(self) -> Player:
+        return self._state.player1.read_only()
+
+    @property
+    def player2(self) -> Player:
+        return self._state.player2.read_only()
+
+    @property
+    def previous_player(self) -> Player:
+        previous_player = self._state.previous_player
+        return None if previous_player is None else previous_player.read_only()
+
+    @property
+    def end_of_game(self) -> Optional[bool]:
+        return self._state.end_of_game
+
+    @property
+    def scores(self) -> Any:
+        return _read_only_board(self._state.scores)
+
+    def legal_moves(self, player: Optional[Player] = None) -> tuple:
+        return tuple(self._state.legal_moves(player))
+
+    def read_only(self) -> TwoPlayerGameState:
+        return self
+
+    def clone(self) -> TwoPlayerGameState:
+        return self._state.clone()
+
+    def copy(self) -> TwoPlayerGameState:
+        return self._state.copy()
+
+    def generate_successor(
+        self,
+        board_successor: Any = None,
+        move_code: Any = None,
+    ) -> TwoPlayerGameState:
+        return self._state.generate_successor(board_successor, move_code)
+
+    def display(self, gui: bool = False) -> None:
+        self._state.display(gui)
+
+    def setup_match(self, gui: bool = False) -> TwoPlayerGameState:
+        raise AttributeError('Game states are read-only during evaluation.')
+
+    def move(
+        self,
+        gui: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> TwoPlayerGameState:
+        raise AttributeError('Game states are read-only during evaluation.')
+
+
+def zobrist_keys(seed: str, n_keys: int) -> List[int]:
+    """Random 64-bit keys for Zobrist hashing.
+
+    The keys only depend on the seed, so hashes are the same across runs
+    and processes (e.g. for opening books or shared tables).
+    """
+    generator = random.Random(seed)
+    return [generator.getrandbits(64) for _ in range(n_keys)]
+
+
 class TwoPlayerGame(ABC):
     """Abstract class for a two player game."""
 
@@ -225,6 +620,14 @@ class TwoPlayerGame(ABC):
         self.player2.label = -1
         self.max_score: float = np.inf
         self.min_score: float = -np.inf
+        self.gui_session: Optional[GuiSession] = None
+
+    def __getstate__(self) -> dict:
+        # The GUI stays in this process (e.g. when sent to search workers).
+        state = self.__dict__.copy()
+        state['gui_session'] = None
+        state.pop('_read_only_view', None)
+        return state
 
     def opponent(self, player: Player) -> Player:
         """Return the opponent in the match."""
@@ -284,8 +687,8 @@ class TwoPlayerGame(ABC):
             nonlocal next_move
             next_move = move
 
-        gui_root = state.gui_thread.gui_root
-        gui_buttons = state.gui_thread.gui_buttons
+        gui_root = self.gui_session.gui_root
+        gui_buttons = self.gui_session.gui_buttons
         self.gui_update(state=state, gui_buttons=gui_buttons,
                         gui_root=gui_root, moves=moves,
                         click_function=get_move)
@@ -333,6 +736,18 @@ class TwoPlayerGame(ABC):
         pass
     #   NOTE return list of successors
 
+    def iter_successors(
+        self,
+        state: TwoPlayerGameState,
+    ) -> Iterator[TwoPlayerGameState]:
+        """Generate the successors of a game state one at a time.
+
+        Games should override this with a generator, so that searches
+        which stop early (e.g. on alpha-beta cutoffs) only build the
+        successors they visit.
+        """
+        yield from self.generate_successors(state)
+
     @abstractmethod
     def score(
         self,
@@ -342,9 +757,213 @@ class TwoPlayerGame(ABC):
         pass
     #   NOTE return end_of_game and scores
 
+    # Optional in-place move protocol.
+    #
+    # Games that implement legal_moves(), apply_move() and undo_move() can
+    # be searched by walking a single mutable state down and back up the
+    # game tree, instead of building a new state for every node.
+
+    def supports_apply_move(self) -> bool:
+        """Whether the game implements the in-place move protocol."""
+        return type(self).apply_move is not TwoPlayerGame.apply_move
+
+    def compute_legal_moves(
+        self,
+        state: TwoPlayerGameState,
+        player: Player,
+    ) -> list:
+        """List the moves of a player. Use state.legal_moves(), which caches."""
+        raise NotImplementedError
+
+    def legal_moves(self, state: TwoPlayerGameState) -> list:
+        """List the moves available to the player on turn."""
+        return state.legal_moves()
+
+    def apply_move(self, state: TwoPlayerGameState, move: Any) -> Any:
+        """Make a move on the state in place and return an undo token."""
+        raise NotImplementedError
+
+    def undo_move(self, state: TwoPlayerGameState, undo_token: Any) -> None:
+        """Take back the move that returned undo_token."""
+        raise NotImplementedError
+
+    def copy_board(self, board: Any) -> Any:
+        """Copy a board so that it can be modified in place."""
+        return copy.deepcopy(board)
+
+    def board_key(self, board: Any) -> Hashable:
+        """Hashable value that identifies a board (e.g. for caches)."""
+        if isinstance(board, np.ndarray):
+            return board.shape, board.tobytes()
+        if isinstance(board, dict):
+            return frozenset(board.items())
+        return board
+
+    def stack_boards(self, boards: Sequence[Any]) -> np.ndarray:
+        """Stack boards in an array, boards[k] being the k-th board.
+
+        Used to evaluate many boards at once (see Heuristic.evaluate_batch).
+        """
+        return np.stack([np.asarray(board) for board in boards])
+
+    def play_move(
+        self,
+        state: TwoPlayerGameState,
+        move: Any,
+    ) -> TwoPlayerGameState:
+        """Generate the successor reached by a move, leaving state as is."""
+        successor = state.copy()
+        self.apply_move(successor, move)
+        successor.parent = state
+        return successor
+
+    def _switch_turn(self, state: TwoPlayerGameState, move_code: Any) -> tuple:
+        """Pass the turn and reset cached values after modifying the board.
+
+        The Zobrist hash is reset too: apply_move() should update it from
+        the saved value (saved[-1]) when that is not None.
+        """
+        saved = (
+            state.next_player,
+            state.move_code,
+            state._end_of_game,
+            state._scores,
+            state._legal_moves,
+            state._zobrist,
+        )
+        state.next_player = self.opponent(state.next_player)
+        state.move_code = move_code
+        state._end_of_game = _PENDING
+        state._scores = _PENDING
+        state._legal_moves = None
+        state._zobrist = None
+        return saved
+
+    def _restore_turn(self, state: TwoPlayerGameState, saved: tuple) -> None:
+        """Undo _switch_turn()."""
+        (
+            state.next_player,
+            state.move_code,
+            state._end_of_game,
+            state._scores,
+            state._legal_moves,
+            state._zobrist,
+        ) = saved
+
+    # Zobrist hashing.
+    #
+    # Games that implement compute_zobrist() can be searched with a
+    # transposition table. The hash covers the board and the player on
+    # turn, and apply_move() updates it incrementally.
+
+    def supports_zobrist(self) -> bool:
+        """Whether the game implements Zobrist hashing."""
+        return type(self).compute_zobrist is not TwoPlayerGame.compute_zobrist
+
+    def zobrist_hash(self, state: TwoPlayerGameState) -> int:
+        """Zobrist hash of a state, computed at most once per position."""
+        if state._zobrist is None:
+            state._zobrist = self.compute_zobrist(state)
+        return state._zobrist
+
+    def compute_zobrist(self, state: TwoPlayerGameState) -> int:
+        """Compute the Zobrist hash of a state from scratch."""
+        raise NotImplementedError
+
+    def solve_endgame(
+        self,
+        state: TwoPlayerGameState,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[Tuple[float, Any]]:
+        """Exact value and best move of a state, if the game can solve it.
+
+        Games with an endgame solver return (value, move), where value
+        is the final score difference from the point of view of the
+        player on turn and move is a legal move for apply_move().
+        Strategies play that move instead of searching. Returns None when
+        the state is not solved (by default, always). The solver should
+        return its best move so far when the deadline, if any, is over.
+        """
+        return None
+
+    def random_playout(
+        self,
+        state: TwoPlayerGameState,
+        generator: random.Random,
+    ) -> Optional[np.ndarray]:
+        """Scores at the end of a random playout from a state.
+
+        Games that can play random moves faster than apply_move() return
+        the scores of the players at the end of the game, leaving the
+        state as it was. Returns None (by default, always) to let the
+        strategy play out through apply_move().
+        """
+        return None
+
+    def read_only(self) -> TwoPlayerGame:
+        """Read-only view of the game, handed to evaluation functions."""
+        view = self.__dict__.get('_read_only_view')
+        if view is None:
+            view = self._read_only_view = ReadOnlyGame(self)
+        return view
+
+
+class ReadOnlyGame(object):
+    """Read-only view of a game, handed to evaluation functions.
+
+    Attributes and methods are looked up in the game, so the view has
+    those of any game (e.g. the helpers of Reversi), and isinstance works
+    as with the game itself. But attributes cannot be set, player1 and
+    player2 are ReadOnlyPlayer views, and moves cannot be made in place
+    (apply_move, undo_move), since that would change the searched state.
+    """
+
+    __slots__ = ('_game',)
+
+    _BLOCKED = frozenset(('apply_move', 'undo_move', 'gui_session'))
+
+    def __init__(self, game: TwoPlayerGame) -> None:
+        object.__setattr__(self, '_game', game)
+
+    def __getattribute__(self, name: str) -> Any:
+        if (name.startswith('__') and name != '__class__') or name == 'read_only':
+            return object.__getattribute__(self, name)
+        game = object.__getattribute__(self, '_game')
+        if name in ('player1', 'player2'):
+            return getattr(game, name).read_only()
+        if name in ReadOnlyGame._BLOCKED:
+            raise AttributeError('{} is not available during evaluation.'.format(name))
+        return getattr(game, name)
+
+    def read_only(self) -> TwoPlayerGame:
+        return self
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('Games are read-only during evaluation.')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('Games are read-only during evaluation.')
+
+    def __reduce__(self) -> tuple:
+        return ReadOnlyGame, (object.__getattribute__(self, '_game'),)
+
+    def __repr__(self) -> str:
+        return 'ReadOnlyGame({!r})'.format(object.__getattribute__(self, '_game'))
+
 
 class TwoPlayerMatch(object):
-    """Infrastructure for a match between two players."""
+    """Infrastructure for a match between two players.
+
+    Strategies are given a Deadline of deadline_fraction *
+    max_seconds_per_move seconds for each move, after which they should
+    return their best move so far. A player that is still thinking after
+    max_seconds_per_move seconds is interrupted and loses the match (only
+    when the match runs in the main thread).
+
+    After a match, search_stats maps the label of each player to the sum
+    of the SearchStats of its moves (only for strategies that have
+    search_stats).
+    """
 
     def __init__(
         self,
@@ -352,6 +971,7 @@ class TwoPlayerMatch(object):
         n_moves_max: int = 500,
         max_seconds_per_move: float = 5,
         gui: bool = False,
+        deadline_fraction: float = 0.9,
     ) -> None:
         self.initial_state = initial_state
         self.n_moves_max = n_moves_max
@@ -368,9 +988,16 @@ class TwoPlayerMatch(object):
 
         self.max_seconds_per_move = max_seconds_per_move
         self.gui = gui
+        self.deadline_fraction = deadline_fraction
+        self.search_stats: Dict[Any, SearchStats] = {}
 
     @contextmanager
     def time_limit(self, seconds: float):
+        if threading.current_thread() is not threading.main_thread():
+            # interrupt_main() would stop the main thread: rely on the
+            # deadline given to the strategy
+            yield
+            return
         timer = threading.Timer(seconds, lambda: _thread.interrupt_main())
         timer.start()
         try:
@@ -387,6 +1014,7 @@ class TwoPlayerMatch(object):
             raise ValueError('Please, provide an initial state')
 
         state = self.initial_state.setup_match(self.gui)
+        self.search_stats = {}
         if (self._verbose > 0):
             print('\nLet\'s play %s!\n' % (self.initial_state.game.name))
             if self._verbose != 3:
@@ -432,9 +1060,13 @@ class TwoPlayerMatch(object):
 
             # limit maximum seconds for this move
             finished = False
+            player = state.next_player
+            deadline = Deadline(self.deadline_fraction * self.max_seconds_per_move)
             with self.time_limit(self.max_seconds_per_move):
-                state = state.move(self.gui)
+                state = state.move(self.gui, deadline)
                 finished = True
+            if finished:
+                self._add_search_stats(player)
 
             if not finished:
                 print("Match cancelled because player %s as %s used too much time" % (state.next_player.name, state.next_player.label))
@@ -473,3 +1105,92 @@ class TwoPlayerMatch(object):
             )
 
         return state.scores
+
+    def play_many(
+        self,
+        n_games: int,
+        random_plies: int = 0,
+        seed: Optional[int] = None,
+        recorder: Any = None,
+    ) -> np.ndarray:
+        """Play n_games matches without display and return their scores.
+
+        Lean version of play_match for self-play experiments: nothing is
+        displayed or asked, there is no timer to interrupt the players,
+        and all the matches start from initial_state with the same game
+        and players. The first random_plies plies of each match are
+        random legal moves, drawn with a generator seeded with seed, so
+        that deterministic players do not play the same match every time.
+        Strategies are given a Deadline as in play_match (none if
+        max_seconds_per_move is 0).
+
+        If a recorder is given (e.g. a dataset.SelfPlayWriter), its
+        add_position(state) method is called with every position of a
+        match before its move is made, random or not, and its
+        end_game(state) method with the final state of the match.
+
+        search_stats has the sum of the statistics of all the matches.
+
+        Returns:
+            Array of shape (n_games, 2) with the scores of player1 and
+            player2 in each match.
+        """
+        if (self.initial_state is None):
+            raise ValueError('Please, provide an initial state')
+
+        self.search_stats = {}
+        generator = random.Random(seed)
+        scores = np.empty((n_games, 2), dtype=float)
+        for n_game in range(n_games):
+            scores[n_game] = self._play_quiet(generator, random_plies, recorder)
+        return scores
+
+    def _play_quiet(
+        self,
+        generator: random.Random,
+        random_plies: int,
+        recorder: Any,
+    ) -> np.ndarray:
+        """Play a match for play_many and return its scores."""
+        state = self.initial_state.setup_match()
+        game = state.game
+        in_place = game.supports_apply_move()
+        n_moves = 0
+        while (n_moves < self.n_moves_max) and not state.end_of_game:
+            if recorder is not None:
+                recorder.add_position(state)
+            if n_moves < random_plies:
+                if in_place:
+                    move = generator.choice(game.legal_moves(state))
+                    state = game.play_move(state, move)
+                else:
+                    state = generator.choice(game.generate_successors(state))
+                state = state.setup_match()
+            else:
+                player = state.next_player
+                if self.max_seconds_per_move > 0:
+                    deadline = Deadline(self.deadline_fraction * self.max_seconds_per_move)
+                    state = state.move(deadline=deadline)
+                else:
+                    state = state.move()
+                self._add_search_stats(player)
+            n_moves += 1
+
+        if not state.end_of_game:
+            raise Warning(
+                'Game did not finish in {:d} moves.\n'.format(self.n_moves_max),
+            )
+        if state.scores is None:
+            raise Warning('Score cannot be computed.')
+        if recorder is not None:
+            recorder.end_game(state)
+        return state.scores
+
+    def _add_search_stats(self, player: Player) -> None:
+        """Add the statistics of the last move of player to search_stats."""
+        stats = getattr(player.strategy, 'search_stats', None)
+        if stats is None:
+            return
+        if player.label not in self.search_stats:
+            self.search_stats[player.label] = SearchStats(n_moves=0)
+        self.search_stats[player.label].add(stats)
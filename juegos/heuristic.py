@@ -10,32 +10,276 @@
 
 from __future__ import annotations  # For Python 3.7
 
-from typing import Callable, Sequence
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
 
 import numpy as np
 
 from game import TwoPlayerGameState
 
+# Returned by EvaluationCache.get for keys that are not cached.
+_MISSING = object()
+
+
+class EvaluationCache(object):
+    """Bounded cache of heuristic values.
+
+    When it is full, an entry is evicted to make room for a new one:
+    the least recently used one (policy='lru'), or the first one that
+    has not been used since the clock hand last passed over it
+    (policy='clock', an approximation of LRU that is cheaper on hits).
+    """
+
+    def __init__(self, max_size: int = 2**16, policy: str = 'lru') -> None:
+        if policy not in ('lru', 'clock'):
+            raise ValueError('Unknown eviction policy {!r}'.format(policy))
+        self.max_size = max_size
+        self.policy = policy
+        self.clear()
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the counters."""
+        self._lru: OrderedDict = OrderedDict()
+        self._slots: Dict[Hashable, int] = {}
+        self._keys: List[Any] = []
+        self._values: List[float] = []
+        self._used: List[bool] = []
+        self._hand = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that found the value."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value of key, or _MISSING."""
+        if self.policy == 'lru':
+            value = self._lru.get(key, _MISSING)
+            if value is not _MISSING:
+                self._lru.move_to_end(key)
+        else:
+            slot = self._slots.get(key)
+            if slot is None:
+                value = _MISSING
+            else:
+                value = self._values[slot]
+                self._used[slot] = True
+        if value is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: float) -> None:
+        """Cache the value of key, evicting an entry if full."""
+        if self.max_size <= 0:
+            return
+        if self.policy == 'lru':
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            if len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+            return
+
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._values[slot] = value
+            self._used[slot] = True
+            return
+        if len(self._keys) < self.max_size:
+            self._slots[key] = len(self._keys)
+            self._keys.append(key)
+            self._values.append(value)
+            self._used.append(False)
+            return
+        # Give a second chance to the entries used since the last pass.
+        while self._used[self._hand]:
+            self._used[self._hand] = False
+            self._hand = (self._hand + 1) % self.max_size
+        slot = self._hand
+        del self._slots[self._keys[slot]]
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._values[slot] = value
+        self._hand = (slot + 1) % self.max_size
+        self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._lru) if self.policy == 'lru' else len(self._keys)
+
+    def __repr__(self) -> str:
+        return '{}(max_size={}, policy={!r}): {} hits, {} misses'.format(
+            type(self).__name__,
+            self.max_size,
+            self.policy,
+            self.hits,
+            self.misses,
+        )
+
+
+class StateBatch(object):
+    """States evaluated at once by a vectorized evaluation function.
+
+    Attributes:
+        boards: array with the boards stacked along the first axis (see
+            TwoPlayerGame.stack_boards).
+        next_player_labels: array with the label of the player on turn
+            in each state.
+        player_max_labels: array with the label of player MAX in each
+            state.
+        states: read-only views of the states, for anything else.
+    """
+
+    __slots__ = ('boards', 'next_player_labels', 'player_max_labels', '_states', '_views')
+
+    def __init__(self, states: Sequence[TwoPlayerGameState]) -> None:
+        game = states[0].game
+        self.boards = game.stack_boards([state.board for state in states])
+        self.next_player_labels = np.array(
+            [state.next_player.label for state in states],
+        )
+        self.player_max_labels = np.array(
+            [state.player_max.label for state in states],
+        )
+        self._states = states
+        self._views: Optional[Tuple[Any, ...]] = None
+
+    @property
+    def states(self) -> Tuple[Any, ...]:
+        if self._views is None:
+            self._views = tuple(state.read_only() for state in self._states)
+        return self._views
+
+    def __len__(self) -> int:
+        return len(self._states)
+
 
 class Heuristic(object):
-    """Encapsulation of the evaluation fucnction."""
+    """Encapsulation of the evaluation fucnction.
+
+    The evaluation function receives a read-only view of the state, so
+    that it cannot modify the state without paying for a copy. With
+    paranoid=True it receives a deep copy instead, which is much slower
+    but lets the function modify it (useful for debugging).
+
+    Games that support apply_move are searched in place, on a single
+    state, so the states evaluated then have no parent (state.parent is
+    None) and their move_code is that of the last move. Use
+    previous_player rather than the parent to know who moved last.
+
+    With vectorized=True, the evaluation function receives a StateBatch
+    instead, whose boards attribute is a stacked NumPy array of boards,
+    and returns an array with the value of each state. Minimax strategies
+    then evaluate all the leaves under a node in one call (see
+    evaluate_batch), which is much faster for NumPy-based evaluations.
+
+    With cache_size > 0, values are memoised in an EvaluationCache
+    (heuristic.cache) with the given eviction policy, keyed by the game,
+    the board (see TwoPlayerGame.board_key), the player on turn and
+    player MAX, so a heuristic can be shared by games of several sizes.
+    Use it only if the evaluation function depends on nothing else
+    (e.g. not on random numbers or on the parent states).
+    """
 
     def __init__(
         self,
         name: str,
         evaluation_function: Callable[[TwoPlayerGameState], float],
+        paranoid: bool = False,
+        vectorized: bool = False,
+        cache_size: int = 0,
+        cache_policy: str = 'lru',
     ) -> None:
         """Initialize name of heuristic & evaluation function."""
         self.name = name
         self.evaluation_function = evaluation_function
+        self.paranoid = paranoid
+        self.vectorized = vectorized
+        self.cache: Optional[EvaluationCache] = None
+        if cache_size > 0:
+            self.cache = EvaluationCache(cache_size, cache_policy)
+        # Number of states actually evaluated (not found in the cache)
+        # by the last call to evaluate or evaluate_batch.
+        self.last_n_evaluated = 0
+
+    def _cache_key(self, state: TwoPlayerGameState) -> Hashable:
+        # Board keys only identify boards of the same game (e.g. the
+        # bitboards of Reversi do not tell the size of the board). Games
+        # are hashed by identity; keeping them in the key, unlike their
+        # id(), they cannot be replaced by a new game at the same address.
+        return (
+            state.game,
+            state.game.board_key(state.board),
+            state.next_player.label,
+            state.player_max.label,
+        )
 
     def evaluate(self, state: TwoPlayerGameState) -> float:
         """Evaluate a state."""
-        # Prevent modifications of the state.
-        # Deep copy everything, except attributes related
-        # to graphical display.
-        state_copy = state.clone()
-        return self.evaluation_function(state_copy)
+        if self.vectorized:
+            return float(self.evaluate_batch([state])[0])
+        if self.cache is not None:
+            key = self._cache_key(state)
+            value = self.cache.get(key)
+            if value is not _MISSING:
+                self.last_n_evaluated = 0
+                return value
+        self.last_n_evaluated = 1
+        if self.paranoid:
+            # Deep copy everything, except attributes related
+            # to graphical display.
+            value = self.evaluation_function(state.clone())
+        else:
+            # Prevent modifications of the state without copying it.
+            value = self.evaluation_function(state.read_only())
+        if self.cache is not None:
+            self.cache.put(key, value)
+        return value
+
+    def evaluate_batch(self, states: Sequence[TwoPlayerGameState]) -> np.ndarray:
+        """Evaluate several states of the same game.
+
+        The states must not change until the call returns. If the
+        evaluation function is not vectorized, it is called for each
+        state.
+        """
+        if not self.vectorized:
+            values = np.empty(len(states))
+            n_evaluated = 0
+            for index, state in enumerate(states):
+                values[index] = self.evaluate(state)
+                n_evaluated += self.last_n_evaluated
+            self.last_n_evaluated = n_evaluated
+            return values
+
+        if self.cache is None:
+            missing = list(range(len(states)))
+            values = np.empty(len(states))
+        else:
+            keys = [self._cache_key(state) for state in states]
+            cached = [self.cache.get(key) for key in keys]
+            missing = [index for index, value in enumerate(cached) if value is _MISSING]
+            values = np.array(
+                [np.nan if value is _MISSING else value for value in cached],
+                dtype=float,
+            )
+        self.last_n_evaluated = len(missing)
+        if missing:
+            batch_states = [states[index] for index in missing]
+            if self.paranoid:
+                batch_states = [state.clone() for state in batch_states]
+            batch_values = self.evaluation_function(StateBatch(batch_states))
+            batch_values = np.asarray(batch_values, dtype=float).reshape(len(missing))
+            values[missing] = batch_values
+            if self.cache is not None:
+                for index, value in zip(missing, batch_values.tolist()):
+                    self.cache.put(keys[index], value)
+        return values
 
     def get_name(self) -> str:
         """Name getter."""
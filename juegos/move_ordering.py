@@ -0,0 +1,187 @@
+"""Move ordering for alpha-beta search.
+
+Alpha-beta prunes the most when the best move of each node is searched
+first. MoveOrdering sorts the legal moves of a node using:
+
+    - The hash move: the best move stored in the transposition table.
+    - Killer moves: moves that caused a cutoff at the same ply.
+    - The history table: how often (and how deep) each move has caused
+      cutoffs anywhere in the tree.
+    - Optionally, a cheap static evaluation of the successors.
+
+It also keeps statistics of the cutoffs, to measure how good the order is.
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from game import TwoPlayerGameState
+
+
+class MoveOrdering(object):
+    """Killer moves, history heuristic and hash move ordering.
+
+    Args:
+        n_killers: number of killer moves kept per ply.
+        history: whether to order the remaining moves by the history table.
+        evaluator: cheap evaluation function of a state, from the point of
+            view of the player MAX of the search (e.g. Heuristic.evaluate).
+            If given, the moves that are not hash or killer moves are
+            sorted by the value of their successors.
+        evaluator_min_depth: the evaluator is only used in nodes with at
+            least this remaining depth, where ordering pays off.
+    """
+
+    def __init__(
+        self,
+        n_killers: int = 2,
+        history: bool = True,
+        evaluator: Optional[Callable[[TwoPlayerGameState], float]] = None,
+        evaluator_min_depth: int = 2,
+    ) -> None:
+        self.n_killers = n_killers
+        self.history = history
+        self.evaluator = evaluator
+        self.evaluator_min_depth = evaluator_min_depth
+        self._killers: List[List[Any]] = []
+        self._history: Dict[Tuple[Any, Any], int] = {}
+        self.reset_statistics()
+
+    def reset_statistics(self) -> None:
+        """Set the cutoff statistics to zero."""
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.moves_before_cutoff = 0
+
+    @property
+    def cutoff_rate(self) -> float:
+        """Fraction of ordered nodes where a cutoff happened."""
+        return self.cutoffs / self.nodes if self.nodes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """Fraction of cutoffs caused by the first move searched."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def mean_moves_before_cutoff(self) -> float:
+        """Average number of moves searched in nodes with a cutoff."""
+        return self.moves_before_cutoff / self.cutoffs if self.cutoffs else 0.0
+
+    def new_search(self) -> None:
+        """Prepare for a search from a new root.
+
+        Killer moves are forgotten, since plies are counted from the root,
+        and the history table is aged so that recent cutoffs weigh more.
+        """
+        self._killers = []
+        self._history = {
+            key: value // 2 for key, value in self._history.items() if value > 1
+        }
+
+    def clear(self) -> None:
+        """Forget killer moves and history, and reset the statistics."""
+        self._killers = []
+        self._history = {}
+        self.reset_statistics()
+
+    def order(
+        self,
+        state: TwoPlayerGameState,
+        moves: Sequence[Any],
+        ply: int,
+        depth: int,
+        hash_move: Any = None,
+        maximizing: bool = True,
+    ) -> List[Any]:
+        """Sort the legal moves of a node, best first.
+
+        Args:
+            state: node of the search, with moves applied in place.
+            moves: legal moves of the node, in the order of the game.
+            ply: distance of the node to the root.
+            depth: remaining depth of the search below the node.
+            hash_move: best move of the node in a previous search, if any.
+            maximizing: whether the player on turn is MAX.
+        """
+        self.nodes += 1
+        first = []
+        if hash_move is not None and hash_move in moves:
+            first.append(hash_move)
+        if ply < len(self._killers):
+            for killer in self._killers[ply]:
+                if killer not in first and killer in moves:
+                    first.append(killer)
+        rest = [move for move in moves if move not in first]
+
+        if self.evaluator is not None and depth >= self.evaluator_min_depth:
+            rest = self._sort_by_evaluation(state, rest, maximizing)
+        elif self.history and self._history:
+            label = state.next_player.label
+            history = self._history
+            rest.sort(key=lambda move: -history.get((label, move), 0))
+        return first + rest
+
+    def _sort_by_evaluation(
+        self,
+        state: TwoPlayerGameState,
+        moves: List[Any],
+        maximizing: bool,
+    ) -> List[Any]:
+        """Sort moves by the static value of their successors."""
+        game = state.game
+        values = []
+        for move in moves:
+            undo_token = game.apply_move(state, move)
+            try:
+                values.append(self.evaluator(state))
+            finally:
+                game.undo_move(state, undo_token)
+        sign = -1 if maximizing else 1
+        order = sorted(range(len(moves)), key=lambda i: sign * values[i])
+        return [moves[i] for i in order]
+
+    def cutoff(
+        self,
+        state: TwoPlayerGameState,
+        move: Any,
+        ply: int,
+        depth: int,
+        index: int,
+    ) -> None:
+        """Record that move caused a cutoff.
+
+        Args:
+            state: node of the search, with the move undone.
+            move: move that caused the cutoff.
+            ply: distance of the node to the root.
+            depth: remaining depth of the search below the node.
+            index: position of the move in the order in which it was searched.
+        """
+        self.cutoffs += 1
+        self.moves_before_cutoff += index + 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if self.n_killers > 0:
+            while len(self._killers) <= ply:
+                self._killers.append([])
+            killers = self._killers[ply]
+            if move in killers:
+                killers.remove(move)
+            killers.insert(0, move)
+            del killers[self.n_killers:]
+
+        if self.history:
+            key = (state.next_player.label, move)
+            self._history[key] = self._history.get(key, 0) + depth * depth
+
+    def __repr__(self) -> str:
+        return '{}: {} nodes, cutoff rate {:.2f}, first move {:.2f}'.format(
+            type(self).__name__,
+            self.nodes,
+            self.cutoff_rate,
+            self.first_move_cutoff_rate,
+        )
@@ -0,0 +1,250 @@
+"""Opening books built from self-play.
+
+An opening book stores the best move of positions that are often
+reached at the beginning of a game, so that they need not be searched
+again. build_opening_book() plays games of a strategy against itself and
+writes the moves it chose, and BookStrategy plays them, falling back to
+another strategy for positions that are not in the book.
+
+A book file has a header (the magic bytes BOOK_MAGIC and the number of
+records, as a little-endian uint64) followed by records of BOOK_RECORD
+(16 bytes each) sorted by key:
+
+    key: Zobrist hash of the position (see TwoPlayerGame.zobrist_hash).
+    move: the move, packed as a*256 + b for a move (a, b), -1 for a pass.
+    score: average final score difference, from the point of view of
+        the player on turn, of the games where the move was played.
+
+Books are built for Reversi, but work for any game with Zobrist hashing
+and moves that are pairs of small integers (e.g. TicTacToe).
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+import mmap
+import random
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from game import Deadline, SearchStats, TwoPlayerGame, TwoPlayerGameState
+from strategy import Strategy
+
+BOOK_MAGIC = b'GAMEBOOK'
+BOOK_HEADER = struct.Struct('<8sQ')
+BOOK_RECORD = np.dtype([('key', '<u8'), ('move', '<i4'), ('score', '<f4')])
+
+
+def _encode_move(move: Any) -> int:
+    if move is None:
+        return -1
+    a, b = move
+    return a * 256 + b
+
+
+def _decode_move(code: int) -> Any:
+    if code < 0:
+        return None
+    return code // 256, code % 256
+
+
+def _find_move(state: TwoPlayerGameState, successor: TwoPlayerGameState) -> Any:
+    """Legal move of state that leads to the board of successor."""
+    game = state.game
+    board_key = game.board_key(successor.board)
+    for move in game.legal_moves(state):
+        if game.board_key(game.play_move(state, move).board) == board_key:
+            return move
+    raise ValueError('The successor cannot be reached with a legal move')
+
+
+def _final_scores(state: TwoPlayerGameState) -> Dict[Any, float]:
+    """Score difference at the end of the game, for each player label."""
+    scores = state.scores
+    game = state.game
+    return {
+        game.player1.label: float(scores[0] - scores[1]),
+        game.player2.label: float(scores[1] - scores[0]),
+    }
+
+
+def build_opening_book(
+    initial_state: TwoPlayerGameState,
+    strategy: Strategy,
+    path: str,
+    n_games: int = 100,
+    book_plies: int = 16,
+    epsilon: float = 0.2,
+    seed: Optional[int] = None,
+    verbose: int = 0,
+) -> int:
+    """Build an opening book by self-play and write it to path.
+
+    Plays n_games games from initial_state in which strategy plays both
+    sides. In the first book_plies plies, a random move is played with
+    probability epsilon instead, so that the games (and the book) cover
+    more than one line. The moves of strategy in those plies are
+    recorded; if it chose different moves in the same position, the one
+    chosen most often is kept (the one with the best score on ties).
+
+    The game must support apply_move and Zobrist hashing.
+
+    Returns the number of positions in the book.
+    """
+    game = initial_state.game
+    assert isinstance(game, TwoPlayerGame)
+    generator = random.Random(seed)
+    # key -> move -> [times played, sum of final scores]
+    statistics: Dict[int, Dict[Any, List[float]]] = {}
+
+    for n_game in range(n_games):
+        state = initial_state
+        played: List[Tuple[int, Any, Any]] = []
+        n_plies = 0
+        while not state.end_of_game:
+            state = state.setup_match()
+            if n_plies < book_plies and generator.random() < epsilon:
+                move = generator.choice(game.legal_moves(state))
+                state = game.play_move(state, move)
+            else:
+                successor = strategy.next_move(state)
+                if n_plies < book_plies:
+                    played.append((
+                        game.zobrist_hash(state),
+                        _find_move(state, successor),
+                        state.next_player.label,
+                    ))
+                state = successor
+            n_plies += 1
+
+        final_scores = _final_scores(state)
+        for key, move, label in played:
+            record = statistics.setdefault(key, {}).setdefault(move, [0, 0.0])
+            record[0] += 1
+            record[1] += final_scores[label]
+        if verbose > 0:
+            print('Game {}: {} positions in the book'.format(n_game + 1, len(statistics)))
+
+    records = np.empty(len(statistics), dtype=BOOK_RECORD)
+    for index, (key, moves) in enumerate(statistics.items()):
+        move, (n_played, total_score) = max(
+            moves.items(),
+            key=lambda item: (item[1][0], item[1][1] / item[1][0]),
+        )
+        records[index] = (key, _encode_move(move), total_score / n_played)
+    records.sort(order='key')
+
+    with open(path, 'wb') as book_file:
+        book_file.write(BOOK_HEADER.pack(BOOK_MAGIC, len(records)))
+        book_file.write(records.tobytes())
+    return len(records)
+
+
+class OpeningBook(object):
+    """Read-only opening book file, mapped in memory.
+
+    Positions are found by binary search on the mapped records, so
+    opening a book does not read it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self._file.close()
+            raise ValueError('{} is not an opening book'.format(path))
+        if len(self._map) < BOOK_HEADER.size:
+            self.close()
+            raise ValueError('{} is not an opening book'.format(path))
+        magic, self.n_records = BOOK_HEADER.unpack_from(self._map, 0)
+        expected_size = BOOK_HEADER.size + self.n_records * BOOK_RECORD.itemsize
+        if magic != BOOK_MAGIC or len(self._map) != expected_size:
+            self.close()
+            raise ValueError('{} is not an opening book'.format(path))
+        self._record = struct.Struct('<Qif')
+
+    def lookup(self, key: int) -> Optional[Tuple[Any, float]]:
+        """Move and score of the position with the given hash, if any."""
+        record = self._record
+        size = record.size
+        low, high = 0, self.n_records
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = struct.unpack_from('<Q', self._map, BOOK_HEADER.size + middle * size)[0]
+            if middle_key < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.n_records:
+            return None
+        found_key, move, score = record.unpack_from(self._map, BOOK_HEADER.size + low * size)
+        if found_key != key:
+            return None
+        return _decode_move(move), score
+
+    def __len__(self) -> int:
+        return self.n_records
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class BookStrategy(Strategy):
+    """Play moves from an opening book, or from another strategy.
+
+    The position is looked up in the book at path (see OpeningBook). If
+    it is there and its move is legal, the move is played; otherwise
+    strategy chooses it. The book is opened on first use. The
+    search_stats are those of strategy, or empty for book moves.
+    """
+
+    def __init__(self, strategy: Strategy, path: str, verbose: int = 0) -> None:
+        super().__init__(verbose)
+        self.strategy = strategy
+        self.path = path
+        self.book: Optional[OpeningBook] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self) -> dict:
+        # Mapped files are opened again by each process.
+        state = self.__dict__.copy()
+        state['book'] = None
+        return state
+
+    def next_move(
+        self,
+        state: TwoPlayerGameState,
+        gui: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> TwoPlayerGameState:
+        """Compute next move."""
+        game = state.game
+        assert isinstance(game, TwoPlayerGame)
+        if game.supports_zobrist() and game.supports_apply_move():
+            if self.book is None:
+                self.book = OpeningBook(self.path)
+            entry = self.book.lookup(game.zobrist_hash(state))
+            if entry is not None and entry[0] in game.legal_moves(state):
+                self.hits += 1
+                self.search_stats = SearchStats()
+                if self.verbose > 0:
+                    print('Book move: {} (score {:.2g})'.format(*entry))
+                return game.play_move(state, entry[0])
+        self.misses += 1
+        if deadline is None:
+            successor = self.strategy.next_move(state, gui)
+        else:
+            successor = self.strategy.next_move(state, gui, deadline)
+        self.search_stats = getattr(self.strategy, 'search_stats', SearchStats())
+        return successor
+
+    def close(self) -> None:
+        """Close the book file."""
+        if self.book is not None:
+            self.book.close()
+        self.book = None
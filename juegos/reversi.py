@@ -9,16 +9,30 @@
 from __future__ import annotations  # For Python 3.7
 
 import copy
+import random
 from tkinter import Tk, Frame, Label, Button, DISABLED, NORMAL
-from typing import Any, Callable, List, Optional, Tuple
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from game import Player, TwoPlayerGame, TwoPlayerGameState
+from bitboard import OthelloBoard, iter_squares, popcount
+from endgame import EndgameSolver
+from game import Deadline, Player, TwoPlayerGame, TwoPlayerGameState, zobrist_keys
 
 
 class Reversi(TwoPlayerGame):
-    """Specific definitions for Reversi."""
+    """Specific definitions for Reversi.
+
+    When endgame_empties > 0, positions with at most that many empty
+    squares are solved exactly (see endgame.EndgameSolver and
+    solve_endgame), so the strategies play perfectly from then on
+    instead of using their heuristic. The exact search stops after
+    endgame_max_sec seconds with the best move proven so far. It is off
+    by default, since on small boards it takes over from the first
+    moves. 12 empty squares are solved in well under a second on 8x8
+    boards; larger values may hit the time limit (see
+    endgame.EndgameSolver).
+    """
 
     def __init__(
         self,
@@ -26,6 +40,8 @@ class Reversi(TwoPlayerGame):
         player2: Player,
         height: int,
         width: int,
+        endgame_empties: int = 0,
+        endgame_max_sec: float = 3,
     ) -> None:
         super().__init__(
             "Reversi",
@@ -38,61 +54,54 @@ class Reversi(TwoPlayerGame):
         self.width = width
         self.max_score = height*width
         self.min_score = - self.max_score
+        # Zobrist keys: black discs, white discs and white on turn.
+        keys = zobrist_keys('Reversi {}x{}'.format(height, width), 2*height*width + 1)
+        self._zobrist_black = keys[:height*width]
+        self._zobrist_white = keys[height*width:-1]
+        self._zobrist_side = keys[-1]
+        self.endgame_empties = endgame_empties
+        self.endgame_max_sec = endgame_max_sec
+        self.endgame_solver: Optional[EndgameSolver] = None
+
+    def __getstate__(self) -> dict:
+        # The solver, with its table, is created again where it is used.
+        state = super().__getstate__()
+        state['endgame_solver'] = None
+        return state
 
     # Private functions
+    def _bitboard(self, board: Any) -> OthelloBoard:
+        """Bitboard version of a board, converting dictionary boards."""
+        if isinstance(board, OthelloBoard):
+            return board
+        return OthelloBoard.from_dict(
+            board,
+            self.height,
+            self.width,
+            labels=(self.player1.label, self.player2.label),
+        )
+
     def _capture_enemy_in_dir(self, board: dict, move, player_label: Any, delta_x_y) -> list:
         assert isinstance(player_label, type(self.player1.label))
-        enemy = self.player2.label if player_label == self.player1.label else self.player1.label
-        (delta_x, delta_y) = delta_x_y
-        x, y = move
-        x, y = x + delta_x, y + delta_y
-        enemy_list_0 = []
-        while board.get((x, y)) == enemy:
-            enemy_list_0.append((x, y))
-            x, y = x + delta_x, y + delta_y
-        if board.get((x, y)) != player_label:
-            del enemy_list_0[:]
-        x, y = move
-        x, y = x - delta_x, y - delta_y
-        enemy_list_1 = []
-        while board.get((x, y)) == enemy:
-            enemy_list_1.append((x, y))
-            x, y = x - delta_x, y - delta_y
-        if board.get((x, y)) != player_label:
-            del enemy_list_1[:]
-        return enemy_list_0 + enemy_list_1
+        board = self._bitboard(board)
+        own, opp = board.bits(player_label)
+        square = board.geometry.square(move)
+        delta_x, delta_y = delta_x_y
+        captured = (
+            board.geometry.flips_in_direction(own, opp, square, (delta_x, delta_y))
+            | board.geometry.flips_in_direction(own, opp, square, (-delta_x, -delta_y))
+        )
+        return [board.geometry.position(index) for index in iter_squares(captured)]
 
     def _enemy_captured_by_move(self, board: dict, move, player_label: Any) -> list:
-        return self._capture_enemy_in_dir(board, move, player_label, (0, 1)) \
-               + self._capture_enemy_in_dir(board, move, player_label, (1, 0)) \
-               + self._capture_enemy_in_dir(board, move, player_label, (1, -1)) \
-               + self._capture_enemy_in_dir(board, move, player_label, (1, 1))
+        return self._bitboard(board).captured(player_label, move)
 
     def _get_valid_moves(self, board: dict, player_label: Any) -> list:
         """Returns a list of valid moves for the player judging from the board."""
-        # Get all positions adjacent to existing pieces
-        candidates = set()
-        # Check all 8 directions around each occupied position
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0),
-                      (1, 1), (1, -1), (-1, 1), (-1, -1)]
-        for (x, y) in board.keys():
-            for dx, dy in directions:
-                adj_x, adj_y = x + dx, y + dy
-                # Only consider positions within board bounds and not occupied
-                if (1 <= adj_x <= self.width and
-                    1 <= adj_y <= self.height and
-                        (adj_x, adj_y) not in board):
-                    candidates.add((adj_x, adj_y))
-        # Now check only these candidate positions for valid moves
-        valid_moves = []
-        for pos in candidates:
-            if self._enemy_captured_by_move(board, pos, player_label):
-                valid_moves.append(pos)
-
-        return valid_moves
+        return self._bitboard(board).legal_moves(player_label)
 
     def _player_coins(self, board: dict, player_label: Any) -> float:
-        return sum(x == player_label for x in board.values())
+        return self._bitboard(board).count(player_label)
 
     def _coin_diff(self, board: dict) -> float:
         """Difference in the number of coins."""
@@ -101,8 +110,9 @@ class Reversi(TwoPlayerGame):
 
     def _choice_diff(self, board: dict) -> float:
         """Difference in the number of choices available."""
-        black_moves_num = len(self._get_valid_moves(board, self.player1.label))
-        white_moves_num = len(self._get_valid_moves(board, self.player2.label))
+        board = self._bitboard(board)
+        black_moves_num = popcount(board.valid_moves(self.player1.label))
+        white_moves_num = popcount(board.valid_moves(self.player2.label))
         if (black_moves_num + white_moves_num) != 0:
             return 100 * (black_moves_num - white_moves_num) / (black_moves_num + white_moves_num)
         else:
@@ -123,7 +133,7 @@ class Reversi(TwoPlayerGame):
 
     # Public methods
 
-    def initialize_board(self) -> dict:
+    def initialize_board(self) -> OthelloBoard:
         """Initialize board with standard configuration."""
         initial_x = self.width // 2
         initial_y = self.height // 2
@@ -132,13 +142,13 @@ class Reversi(TwoPlayerGame):
         init_white_board = dict.fromkeys(init_white_pos, self.player2.label)
         init_black_board = dict.fromkeys(init_black_pos, self.player1.label)
         board = {**init_white_board, **init_black_board}
-        return board
+        return self._bitboard(board)
 
     def display(self, state: TwoPlayerGameState, gui: bool = False) -> None:
         """Display state of the board."""
         super().display(state, gui)
-        board = state.board
-        moves = self._get_valid_moves(board, state.next_player.label)
+        board = self._bitboard(state.board)
+        moves = set(state.legal_moves())
 
         # Console display
 
@@ -164,8 +174,8 @@ class Reversi(TwoPlayerGame):
             moves = [
                 self._matrix_to_display_coordinates(move) for move in moves
             ]
-            gui_root = state.gui_thread.gui_root
-            gui_buttons = state.gui_thread.gui_buttons
+            gui_root = self.gui_session.gui_root
+            gui_buttons = self.gui_session.gui_buttons
             state.game.gui_update(state=state, gui_buttons=gui_buttons,
                                   gui_root=gui_root, moves=moves,
                                   click_function=None)
@@ -181,48 +191,196 @@ class Reversi(TwoPlayerGame):
         state: TwoPlayerGameState,
     ) -> List[TwoPlayerGameState]:
         """Generate the list of successors of a game state."""
-        successors = []
-        board = state.board
-        moves = self._get_valid_moves(board, state.next_player.label)
+        return list(self.iter_successors(state))
+
+    def iter_successors(
+        self,
+        state: TwoPlayerGameState,
+    ) -> Iterator[TwoPlayerGameState]:
+        """Generate the successors of a game state one at a time."""
+        board = self._bitboard(state.board)
+        assert isinstance(state.next_player, Player)
+        moves = state.legal_moves()
 
         for move in moves:
-            board_successor = copy.deepcopy(state.board)
-            assert isinstance(state.next_player, Player)
-            # show the move on the board
-            board_successor[move] = state.next_player.label
-            # flip enemy
-            for enemy in self._enemy_captured_by_move(board, move, state.next_player.label):
-                board_successor[enemy] = state.next_player.label
+            # show the move on the board and flip enemy
+            board_successor = board.play(state.next_player.label, move)
             move_code = self._matrix_to_display_coordinates(move)
-            successor = state.generate_successor(
+            yield state.generate_successor(
                 board_successor,
                 move_code,
             )
 
-            successors.append(successor)
-
-        if not successors:
-            board_successor = copy.deepcopy(state.board)
+        if not moves:
+            board_successor = copy.copy(board)
             move_code = None
-            no_movement = state.generate_successor(
+            yield state.generate_successor(
                 board_successor,
                 move_code,
             )
-            successors = [no_movement]
 
-        return successors
+    def compute_legal_moves(
+        self,
+        state: TwoPlayerGameState,
+        player: Player,
+    ) -> list:
+        """List the moves of a player."""
+        return self._get_valid_moves(state.board, player.label)
+
+    def legal_moves(self, state: TwoPlayerGameState) -> list:
+        """List the moves of the player on turn; None stands for passing."""
+        return state.legal_moves() or [None]
+
+    def apply_move(self, state: TwoPlayerGameState, move: Any) -> tuple:
+        """Make a move on the state in place and return an undo token."""
+        board = state.board = self._bitboard(state.board)
+        label = state.next_player.label
+        if move is None:
+            placed = flipped = 0
+            move_code = None
+        else:
+            placed, flipped = board.play_in_place(label, move)
+            move_code = self._matrix_to_display_coordinates(move)
+        saved = self._switch_turn(state, move_code)
+        if saved[-1] is not None:
+            if label == self.player1.label:
+                own_keys, opp_keys = self._zobrist_black, self._zobrist_white
+            else:
+                own_keys, opp_keys = self._zobrist_white, self._zobrist_black
+            zobrist = saved[-1] ^ self._zobrist_side
+            for square in iter_squares(placed):
+                zobrist ^= own_keys[square]
+            for square in iter_squares(flipped):
+                zobrist ^= opp_keys[square]
+            state._zobrist = zobrist
+        return label, placed, flipped, saved
+
+    def undo_move(self, state: TwoPlayerGameState, undo_token: tuple) -> None:
+        """Take back the move that returned undo_token."""
+        label, placed, flipped, saved = undo_token
+        state.board.unplay(label, placed, flipped)
+        self._restore_turn(state, saved)
+
+    def board_key(self, board: Any) -> Tuple[int, int]:
+        """Hashable value that identifies a board: its bitboards."""
+        board = self._bitboard(board)
+        return board.black, board.white
+
+    def stack_boards(self, boards: Sequence[Any]) -> np.ndarray:
+        """Stack boards in an int8 array of shape (n_boards, height, width).
+
+        boards[k, y - 1, x - 1] is 1 for a disc of player 1, -1 for a disc
+        of player 2 and 0 for an empty square (x, y).
+        """
+        n_squares = self.height * self.width
+        n_bytes = (n_squares + 7) // 8
+        black = bytearray()
+        white = bytearray()
+        for board in boards:
+            board = self._bitboard(board)
+            black += board.black.to_bytes(n_bytes, 'little')
+            white += board.white.to_bytes(n_bytes, 'little')
+
+        def unpack(masks: bytearray) -> np.ndarray:
+            masks = np.frombuffer(bytes(masks), dtype=np.uint8)
+            masks = masks.reshape(len(boards), n_bytes)
+            bits = np.unpackbits(masks, axis=1, bitorder='little')[:, :n_squares]
+            return bits.view(np.int8)
+
+        stacked = unpack(black) - unpack(white)
+        return stacked.reshape(len(boards), self.height, self.width)
+
+    def compute_zobrist(self, state: TwoPlayerGameState) -> int:
+        """Compute the Zobrist hash of a state from scratch."""
+        return self._zobrist_board(state.board, state.next_player.label)
+
+    def _zobrist_board(self, board: Any, player_label: Any) -> int:
+        """Zobrist hash of a board with a given player on turn."""
+        board = self._bitboard(board)
+        zobrist = self._zobrist_side if player_label == self.player2.label else 0
+        for square in iter_squares(board.black):
+            zobrist ^= self._zobrist_black[square]
+        for square in iter_squares(board.white):
+            zobrist ^= self._zobrist_white[square]
+        return zobrist
+
+    def solve_endgame(
+        self,
+        state: TwoPlayerGameState,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[Tuple[float, Any]]:
+        """Solve states with at most endgame_empties empty squares.
+
+        Returns None, so that the strategy searches, if the deadline
+        expires before the solver knows whether the state is won.
+        """
+        board = self._bitboard(state.board)
+        if self.height * self.width - len(board) > self.endgame_empties:
+            return None
+        if state.end_of_game:
+            return None
+        if self.endgame_solver is None:
+            self.endgame_solver = EndgameSolver(self.height, self.width)
+        self.endgame_solver.max_sec_per_move = self.endgame_max_sec
+        own, opp = board.bits(state.next_player.label)
+        solution = self.endgame_solver.solve(
+            own,
+            opp,
+            deadline=None if deadline is None else deadline.end_time,
+        )
+        if solution is None:
+            return None
+        value, square = solution
+        move = None if square is None else board.geometry.position(square)
+        return value, move
+
+    def random_playout(
+        self,
+        state: TwoPlayerGameState,
+        generator: random.Random,
+    ) -> np.ndarray:
+        """Scores at the end of a random playout, played on the bitboards.
+
+        The end of the game is only checked when the player on turn has
+        to pass.
+        """
+        board = self._bitboard(state.board)
+        geometry = board.geometry
+        own, opp = board.bits(state.next_player.label)
+        own_is_black = state.next_player.label == board.labels[0]
+        while True:
+            moves = geometry.moves(own, opp)
+            if not moves:
+                if not geometry.moves(opp, own):
+                    break
+            else:
+                squares = list(iter_squares(moves))
+                square = squares[generator.randrange(len(squares))]
+                flipped = geometry.flips(own, opp, square)
+                own |= flipped | (1 << square)
+                opp ^= flipped
+            own, opp = opp, own
+            own_is_black = not own_is_black
+
+        black, white = (own, opp) if own_is_black else (opp, own)
+        # Player 1 plays black.
+        return np.array([popcount(black), popcount(white)], dtype=float)
+
+    def copy_board(self, board: Any) -> OthelloBoard:
+        """Copy a board so that it can be modified in place."""
+        return copy.copy(self._bitboard(board))
 
     def score(
         self,
         state: TwoPlayerGameState,
     ) -> Tuple[bool, Optional[np.ndarray]]:
         """Determine whether a game state is terminal."""
-        board = state.board
+        board = self._bitboard(state.board)
 
-        end_of_game = (len(
-            self._get_valid_moves(board, self.player1.label) +
-            self._get_valid_moves(board, self.player2.label)
-            ) == 0)
+        end_of_game = not (
+            board.valid_moves(self.player1.label)
+            or board.valid_moves(self.player2.label)
+        )
 
         scores = np.zeros(self.n_players, dtype=float)
         players = (self.player1, self.player2)
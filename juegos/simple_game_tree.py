@@ -9,7 +9,7 @@ from typing import Any, List, Optional, Tuple
 
 import numpy as np
 
-from game import Player, TwoPlayerGame, TwoPlayerGameState
+from game import Player, TwoPlayerGame, TwoPlayerGameState, zobrist_keys
 
 
 class SimpleGameTree(TwoPlayerGame):
@@ -43,6 +43,13 @@ class SimpleGameTree(TwoPlayerGame):
         }
         self.player1.label = 'Player 1'
         self.player2.label = 'Player 2'
+        # Zobrist keys: one per node and one for player 2 on turn.
+        nodes = sorted(
+            set(self._successor_lists).union(*self._successor_lists.values())
+        )
+        keys = zobrist_keys('SimpleGameTree', len(nodes) + 1)
+        self._zobrist_nodes = dict(zip(nodes, keys))
+        self._zobrist_side = keys[-1]
 
     def initialize_board(self) -> str:
         """Initialize board with standard configuration."""
@@ -73,6 +80,44 @@ class SimpleGameTree(TwoPlayerGame):
                 successors.append(successor)
         return successors
 
+    def compute_legal_moves(
+        self,
+        state: TwoPlayerGameState,
+        player: Player,
+    ) -> list:
+        """List the nodes reachable from the current one."""
+        return list(self._successor_lists.get(state.board, []))
+
+    def apply_move(self, state: TwoPlayerGameState, move: str) -> tuple:
+        """Move to a child node in place and return an undo token."""
+        board = state.board
+        state.board = move
+        saved = self._switch_turn(state, board + move)
+        if saved[-1] is not None:
+            state._zobrist = (
+                saved[-1]
+                ^ self._zobrist_side
+                ^ self._zobrist_nodes[board]
+                ^ self._zobrist_nodes[move]
+            )
+        return board, saved
+
+    def undo_move(self, state: TwoPlayerGameState, undo_token: tuple) -> None:
+        """Go back to the node stored in undo_token."""
+        state.board, saved = undo_token
+        self._restore_turn(state, saved)
+
+    def compute_zobrist(self, state: TwoPlayerGameState) -> int:
+        """Compute the Zobrist hash of a state from scratch."""
+        zobrist = self._zobrist_nodes[state.board]
+        if state.next_player.label == self.player2.label:
+            zobrist ^= self._zobrist_side
+        return zobrist
+
+    def copy_board(self, board: str) -> str:
+        """Nodes are strings, which are immutable."""
+        return board
+
     def score(
         self,
         state: TwoPlayerGameState,
@@ -9,13 +9,27 @@
 from __future__ import annotations  # For Python 3.7
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+import math
+import multiprocessing
+import random
 import time
-from typing import List
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from game import TwoPlayerGame, TwoPlayerGameState
+from game import Deadline, SearchStats, TwoPlayerGame, TwoPlayerGameState
 from heuristic import Heuristic
+from move_ordering import MoveOrdering
+from transposition import (
+    EXACT,
+    LOWER,
+    UPPER,
+    SharedTranspositionTable,
+    TranspositionTable,
+    TTEntry,
+)
 
 
 class Strategy(ABC):
@@ -24,14 +38,41 @@ class Strategy(ABC):
     def __init__(self, verbose: int = 0) -> None:
         """Initialize common attributes for all derived classes."""
         self.verbose = verbose
+        # Statistics of the last move (see SearchStats).
+        self.search_stats = SearchStats()
 
     @abstractmethod
     def next_move(
         self,
         state: TwoPlayerGameState,
         gui: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> TwoPlayerGameState:
-        """Compute next move."""
+        """Compute next move.
+
+        If a deadline is given, the move should be returned before it
+        expires (see Deadline): searching strategies then play the best
+        move found so far.
+        """
+
+    def solve_endgame(
+        self,
+        state: TwoPlayerGameState,
+        deadline: Optional[Deadline] = None,
+    ) -> Optional[TwoPlayerGameState]:
+        """Successor chosen by the endgame solver of the game, if any.
+
+        Searching strategies call this first, and only search when the
+        game does not solve the state (see TwoPlayerGame.solve_endgame).
+        """
+        assert isinstance(state.game, TwoPlayerGame)
+        solution = state.game.solve_endgame(state, deadline)
+        if solution is None:
+            return None
+        value, move = solution
+        if self.verbose > 0:
+            print('Endgame value = {:.2g}'.format(value))
+        return state.game.play_move(state, move)
 
     def generate_successors(
         self,
@@ -43,6 +84,65 @@ class Strategy(ABC):
         assert successors  # Error if list is empty
         return successors
 
+    def iter_successors(
+        self,
+        state: TwoPlayerGameState,
+    ) -> Iterator[TwoPlayerGameState]:
+        """Generate state successors lazily."""
+        assert isinstance(state.game, TwoPlayerGame)
+        empty = True
+        for successor in state.game.iter_successors(state):
+            empty = False
+            yield successor
+        assert not empty  # Error if there are no successors
+
+    def children(
+        self,
+        state: TwoPlayerGameState,
+        in_place: bool = False,
+        first: Any = None,
+        moves: Optional[Sequence[Any]] = None,
+    ) -> Iterator[Tuple[Any, TwoPlayerGameState]]:
+        """Iterate over (move, child) pairs of a search node.
+
+        If in_place, each child is state itself with the move applied,
+        and the move is undone when the iteration resumes. Close the
+        iterator (e.g. with contextlib.closing) if the loop may break
+        early. Moves are tried in the order given by moves (by default,
+        the legal moves in the order of the game), except for first,
+        which is tried before the others if it is legal.
+        Otherwise, the move is the successor state itself.
+        """
+        stats = self.search_stats
+        stats.nodes += 1
+        perf_counter = time.perf_counter
+        time0 = perf_counter()
+        if not in_place:
+            for successor in self.iter_successors(state):
+                stats.successor_time += perf_counter() - time0
+                yield successor, successor
+                time0 = perf_counter()
+            stats.successor_time += perf_counter() - time0
+            return
+
+        game = state.game
+        assert isinstance(game, TwoPlayerGame)
+        if moves is None:
+            moves = game.legal_moves(state)
+        assert moves  # Error if list is empty
+        if first is not None and first in moves and moves[0] != first:
+            moves = [first] + [move for move in moves if move != first]
+        for move in moves:
+            undo_token = game.apply_move(state, move)
+            stats.successor_time += perf_counter() - time0
+            try:
+                yield move, state
+            finally:
+                time0 = perf_counter()
+                game.undo_move(state, undo_token)
+                stats.successor_time += perf_counter() - time0
+            time0 = perf_counter()
+
 
 class RandomStrategy(Strategy):
     """Strategy in which moves are selected uniformly at random."""
@@ -51,6 +151,7 @@ class RandomStrategy(Strategy):
         self,
         state: TwoPlayerGameState,
         gui: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> TwoPlayerGameState:
         """Compute next move."""
         successors = self.generate_successors(state)
@@ -64,6 +165,7 @@ class ManualStrategy(Strategy):
         self,
         state: TwoPlayerGameState,
         gui: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> TwoPlayerGameState:
         """Compute next move"""
         successors = self.generate_successors(state)
@@ -82,8 +184,21 @@ class ManualStrategy(Strategy):
         return next_state
 
 
+class _SearchTimeout(Exception):
+    """Raised to abort a search when the time per move runs out."""
+
+
 class MinimaxStrategy(Strategy):
-    """Minimax strategy."""
+    """Minimax strategy.
+
+    If workers > 1, the successors of the root are searched in parallel
+    by a pool of that many processes, which is kept until close() is
+    called. The move is the same one the serial search would choose.
+    The heuristic must be picklable (e.g. a module level function).
+
+    If next_move is given a deadline, the search is aborted when it
+    expires and the best move found at the root so far is played.
+    """
 
     def __init__(
         self,
@@ -91,25 +206,76 @@ class MinimaxStrategy(Strategy):
         max_depth_minimax: int,
         max_sec_per_evaluation: float = 0,
         verbose: int = 0,
+        workers: int = 1,
     ) -> None:
         super().__init__(verbose)
         self.heuristic = heuristic
         self.max_depth_minimax = max_depth_minimax
         self.max_sec_per_evaluation = max_sec_per_evaluation
         self.timed_out = False
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_game: Optional[TwoPlayerGame] = None
+        self._shared_alpha: Any = None
+        # Best value found so far at the root, in a worker process.
+        self._worker_alpha: Any = None
+        # Depth of the last search completed by next_move.
+        self.completed_depth = 0
+        self._deadline: Optional[float] = None
+        self._check_every = 256
+        self._n_nodes = 0
+        self._root_depth = 0
+        # Best value and move found at the root by the current search.
+        self._root_best: Optional[Tuple[float, Any]] = None
+
+    def __getstate__(self) -> dict:
+        # The process pool stays in this process.
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_executor_game'] = None
+        state['_shared_alpha'] = None
+        return state
+
+    def close(self) -> None:
+        """Shut down the worker processes, if any."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._executor = None
+        self._executor_game = None
+        self._shared_alpha = None
 
     def next_move(
         self,
         state: TwoPlayerGameState,
         gui: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> TwoPlayerGameState:
         """Compute the next state in the game."""
+        self.search_stats = SearchStats()
+        start_time = time.perf_counter()
+        successor = self.solve_endgame(state, deadline)
+        if successor is not None:
+            self.search_stats.time = time.perf_counter() - start_time
+            return successor
 
-        minimax_value, minimax_successor = self._max_value(
-            state,
-            self.max_depth_minimax,
+        # Search a private copy in place if the game allows it.
+        assert isinstance(state.game, TwoPlayerGame)
+        in_place = state.game.supports_apply_move()
+        time0 = time.perf_counter()
+        root = state.copy() if in_place else state
+        self.search_stats.clone_time += time.perf_counter() - time0
+
+        minimax_value, minimax_move = self._search_with_deadline(
+            root,
+            in_place,
+            deadline,
         )
 
+        if in_place:
+            minimax_successor = state.game.play_move(state, minimax_move)
+        else:
+            minimax_successor = minimax_move
+
         if self.verbose > 0:
             if self.verbose > 1:
                 print('\nGame state before move:\n')
@@ -117,90 +283,344 @@ class MinimaxStrategy(Strategy):
                 print()
             print('Minimax value = {:.2g}'.format(minimax_value))
 
+        self.search_stats.depth = self.completed_depth
+        self.search_stats.time = time.perf_counter() - start_time
         return minimax_successor
 
-    def _min_value(
+    def _search_root(
+        self,
+        root: TwoPlayerGameState,
+        depth: int,
+        in_place: bool,
+    ) -> Tuple[float, Any]:
+        """Search the root to the given depth."""
+        if self.workers > 1 and not (root.end_of_game or depth == 0):
+            return self._parallel_root(root, depth, self.children(root, in_place))
+        return self._max_value(root, depth, in_place)
+
+    def _search_with_deadline(
+        self,
+        root: TwoPlayerGameState,
+        in_place: bool,
+        deadline: Optional[Deadline],
+    ) -> Tuple[float, Any]:
+        """Search the root to max_depth_minimax, or until the deadline.
+
+        If the deadline expires, the best move found so far is returned.
+        Subclasses that search the root differently override this method
+        (and _search_root), next_move being common to all of them.
+        """
+        self._root_depth = self.max_depth_minimax
+        self._root_best = None
+        self.completed_depth = 0
+        if deadline is None:
+            best = self._search_root(root, self.max_depth_minimax, in_place)
+            self.completed_depth = self.max_depth_minimax
+            return best
+
+        self._deadline = deadline.end_time
+        self._check_every = deadline.check_every
+        try:
+            best = self._search_root(root, self.max_depth_minimax, in_place)
+            self.completed_depth = self.max_depth_minimax
+        except _SearchTimeout:
+            if self.verbose > 0:
+                print('Search interrupted at the deadline')
+            best = self._best_so_far(root, in_place)
+        finally:
+            self._deadline = None
+        return best
+
+    def _best_so_far(
+        self,
+        root: TwoPlayerGameState,
+        in_place: bool,
+    ) -> Tuple[float, Any]:
+        """Best move found at the root by an aborted search, or any move."""
+        if self._root_best is not None:
+            return self._root_best
+        with closing(self.children(root, in_place)) as children:
+            return -np.inf, next(children)[0]
+
+    def _check_deadline(self) -> None:
+        """Abort the search if the time per move has run out."""
+        self._n_nodes += 1
+        if not self._n_nodes % self._check_every and self._must_stop():
+            raise _SearchTimeout()
+
+    def _must_stop(self) -> bool:
+        """Whether to abort the search (asked every _check_every nodes)."""
+        return time.time() > self._deadline
+
+    def _parallel_root(
+        self,
+        root: TwoPlayerGameState,
+        depth: int,
+        children: Iterator[Tuple[Any, TwoPlayerGameState]],
+    ) -> Tuple[float, Any]:
+        """Search the children of the root in the worker processes.
+
+        The first child with the highest value is chosen, as in the
+        serial search, so children must be given in the serial order.
+        """
+        game = root.game
+        if self._executor is None or self._executor_game is not game:
+            self.close()
+            self._shared_alpha = multiprocessing.Value('d', -np.inf)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self, game, self._shared_alpha),
+            )
+            self._executor_game = game
+        with self._shared_alpha.get_lock():
+            self._shared_alpha.value = -np.inf
+
+        moves = []
+        futures = []
+        with closing(children):
+            for move, child in children:
+                moves.append(move)
+                # Boards are sent later, after in place moves are undone.
+                futures.append(self._executor.submit(
+                    _search_subtree,
+                    game.copy_board(child.board),
+                    child.next_player.label == game.player1.label,
+                    child.player_max.label == game.player1.label,
+                    child.move_code,
+                    depth - 1,
+                    self._deadline,
+                ))
+        try:
+            results = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+        values = [value for value, _ in results]
+        self.timed_out = self.timed_out or any(timed_out for _, timed_out in results)
+        index = int(np.argmax(values))
+        return values[index], moves[index]
+
+    def _search_subtree(
         self,
         state: TwoPlayerGameState,
         depth: int,
+        deadline: Optional[float],
     ) -> float:
+        """Value of a child of the root, in a worker process."""
+        in_place = state.game.supports_apply_move()
+        self._deadline = deadline
+        try:
+            minimax_value, _ = self._min_value(state, depth, in_place)
+        finally:
+            self._deadline = None
+        return minimax_value
+
+    def _evaluate_children(
+        self,
+        state: TwoPlayerGameState,
+        in_place: bool,
+    ) -> Tuple[List[Any], np.ndarray]:
+        """Evaluate all the children of a node in one call.
+
+        Used with vectorized heuristics on nodes whose children are leaves.
+        """
+        stats = self.search_stats
+        moves = []
+        leaves = []
+        for move, successor in self.children(state, in_place):
+            moves.append(move)
+            if in_place:
+                time0 = time.perf_counter()
+                leaves.append(successor.copy())
+                stats.clone_time += time.perf_counter() - time0
+            else:
+                leaves.append(successor)
+        if self.timed_out:
+            return moves, np.zeros(len(leaves))
+        time0 = time.time()
+        values = self.heuristic.evaluate_batch(leaves)
+        time1 = time.time()
+        stats.leaves += len(leaves)
+        stats.heuristic_time += time1 - time0
+        # Values found in the heuristic's cache take no evaluation time.
+        n_evaluated = self.heuristic.last_n_evaluated
+        timediff = (time1 - time0) / max(n_evaluated, 1)
+        if (self.max_sec_per_evaluation > 0) and n_evaluated and (timediff > self.max_sec_per_evaluation):
+            print("Heuristic {} timeout: {} > {}".format(self.heuristic.get_name(), timediff, self.max_sec_per_evaluation))
+            self.timed_out = True
+        return moves, values
+
+    def _evaluate(self, state: TwoPlayerGameState) -> float:
+        """Evaluate a leaf, enforcing the time limit per evaluation."""
+        if self.timed_out:
+            return 0
+        time0 = time.time()
+        value = self.heuristic.evaluate(state)
+        time1 = time.time()
+        self.search_stats.leaves += 1
+        self.search_stats.heuristic_time += time1 - time0
+        timediff = time1 - time0
+        # Values found in the heuristic's cache are not timed.
+        if (self.max_sec_per_evaluation > 0) and self.heuristic.last_n_evaluated and (timediff > self.max_sec_per_evaluation):
+            print("Heuristic {} timeout: {} > {}".format(self.heuristic.get_name(), timediff, self.max_sec_per_evaluation))
+            self.timed_out = True
+        return value
+
+    def _min_value(
+        self,
+        state: TwoPlayerGameState,
+        depth: int,
+        in_place: bool = False,
+    ) -> Tuple[float, Any]:
         """Min step of the minimax algorithm."""
 
+        if self._deadline is not None:
+            self._check_deadline()
+
         if state.end_of_game or depth == 0:
-            if self.timed_out:
-                minimax_value = 0
-            else:
-                time0 = time.time()
-                minimax_value = self.heuristic.evaluate(state)
-                time1 = time.time()
-                timediff = time1 - time0
-                if (self.max_sec_per_evaluation > 0) and (timediff > self.max_sec_per_evaluation):
-                    print("Heuristic {} timeout: {} > {}".format(self.heuristic.get_name(), timediff, self.max_sec_per_evaluation))
-                    self.timed_out = True
-            minimax_successor = None
+            minimax_value = self._evaluate(state)
+            minimax_move = None
+        elif depth == 1 and self.heuristic.vectorized:
+            moves, values = self._evaluate_children(state, in_place)
+            index = int(np.argmin(values))
+            minimax_value, minimax_move = float(values[index]), moves[index]
         else:
             minimax_value = np.inf
 
-            for successor in self.generate_successors(state):
+            # In place, state.board is the child's inside the loop.
+            node_board = str(state.board) if self.verbose > 1 else None
+            for move, successor in self.children(state, in_place):
                 if self.verbose > 1:
-                    print('{}: {}'.format(state.board, minimax_value))
+                    print('{}: {}'.format(node_board, minimax_value))
 
                 successor_minimax_value, _ = self._max_value(
                     successor,
                     depth - 1,
+                    in_place,
                 )
 
                 if (successor_minimax_value < minimax_value):
                     minimax_value = successor_minimax_value
-                    minimax_successor = successor
+                    minimax_move = move
 
         if self.verbose > 1:
             print('{}: {}'.format(state.board, minimax_value))
 
-        return minimax_value, minimax_successor
+        return minimax_value, minimax_move
 
     def _max_value(
         self,
         state: TwoPlayerGameState,
         depth: int,
-    ) -> float:
+        in_place: bool = False,
+    ) -> Tuple[float, Any]:
         """Max step of the minimax algorithm."""
 
+        if self._deadline is not None:
+            self._check_deadline()
+
         if state.end_of_game or depth == 0:
-            if self.timed_out:
-                minimax_value = 0
-            else:
-                time0 = time.time()
-                minimax_value = self.heuristic.evaluate(state)
-                time1 = time.time()
-                timediff = time1 - time0
-                if (self.max_sec_per_evaluation > 0) and (timediff > self.max_sec_per_evaluation):
-                    print("Heuristic {} timeout: {} > {}".format(self.heuristic.get_name(), timediff, self.max_sec_per_evaluation))
-                    self.timed_out = True
-            minimax_successor = None
+            minimax_value = self._evaluate(state)
+            minimax_move = None
+        elif depth == 1 and self.heuristic.vectorized:
+            moves, values = self._evaluate_children(state, in_place)
+            index = int(np.argmax(values))
+            minimax_value, minimax_move = float(values[index]), moves[index]
         else:
             minimax_value = -np.inf
 
-            for successor in self.generate_successors(state):
+            # In place, state.board is the child's inside the loop.
+            node_board = str(state.board) if self.verbose > 1 else None
+            for move, successor in self.children(state, in_place):
                 if self.verbose > 1:
-                    print('{}: {}'.format(state.board, minimax_value))
+                    print('{}: {}'.format(node_board, minimax_value))
 
                 successor_minimax_value, _ = self._min_value(
                     successor,
                     depth - 1,
+                    in_place,
                 )
                 if (successor_minimax_value > minimax_value):
                     minimax_value = successor_minimax_value
-                    minimax_successor = successor
+                    minimax_move = move
+                    if depth == self._root_depth:
+                        self._root_best = minimax_value, minimax_move
 
         if self.verbose > 1:
             print('{}: {}'.format(state.board, minimax_value))
 
-        return minimax_value, minimax_successor
+        return minimax_value, minimax_move
+
+
+# Strategy and game of a worker process (see MinimaxStrategy workers).
+_worker: Any = None
+
 
+def _init_worker(strategy: MinimaxStrategy, game: TwoPlayerGame, shared_alpha: Any) -> None:
+    global _worker
+    strategy._worker_alpha = shared_alpha
+    _worker = strategy, game
 
-class MinimaxAlphaBetaStrategy(Strategy):
-    """Minimax alpha-beta strategy."""
+
+def _search_subtree(
+    board: Any,
+    next_is_player1: bool,
+    max_is_player1: bool,
+    move_code: Any,
+    depth: int,
+    deadline: Optional[float],
+) -> Tuple[float, bool]:
+    """Search a child of the root in a worker process.
+
+    Returns its value and whether a heuristic evaluation timed out.
+    """
+    strategy, game = _worker
+    state = TwoPlayerGameState(
+        game=game,
+        initial_player=game.player1 if next_is_player1 else game.player2,
+        player_max=game.player1 if max_is_player1 else game.player2,
+        board=board,
+        move_code=move_code,
+    )
+    minimax_value = strategy._search_subtree(state, depth, deadline)
+    shared_alpha = strategy._worker_alpha
+    with shared_alpha.get_lock():
+        if minimax_value > shared_alpha.value:
+            shared_alpha.value = minimax_value
+    return minimax_value, strategy.timed_out
+
+
+class MinimaxAlphaBetaStrategy(MinimaxStrategy):
+    """Minimax alpha-beta strategy.
+
+    If a transposition table is given and the game supports Zobrist
+    hashing, the results of searched nodes are stored in it. They are
+    used to cut off the search when a stored bound is good enough for
+    the current window, and to try the best move found before first.
+    The table is kept between moves. Stored values are those of the
+    player of the strategy, so a table should not be shared by players.
+
+    If max_sec_per_move > 0, the strategy uses iterative deepening:
+    it searches to depth 1, 2, ... up to max_depth_minimax until the
+    time runs out, and plays the best move of the deepest completed
+    search. The best move of each search is tried first in the next
+    one and, if no transposition table is given, a table is created
+    so that the best moves of inner nodes are reused too. A deadline
+    given to next_move shortens the time of the search if it expires
+    before max_sec_per_move.
+
+    A MoveOrdering can be given to sort the moves of each node (killer
+    moves, history heuristic...) when the game supports apply_move.
+
+    With workers > 1 (see MinimaxStrategy), each worker searches a child
+    of the root with the best value found so far by all of them as alpha.
+    Without a transposition table, the move is the one of the serial
+    search; with one, workers fill their own tables, whose deeper
+    results may change the values of the search.
+    """
 
     def __init__(
         self,
@@ -208,33 +628,952 @@ class MinimaxAlphaBetaStrategy(Strategy):
         max_depth_minimax: int,
         max_sec_per_evaluation: float = 0,
         verbose: int = 0,
+        transposition_table: Optional[TranspositionTable] = None,
+        max_sec_per_move: float = 0,
+        move_ordering: Optional[MoveOrdering] = None,
+        workers: int = 1,
+    ) -> None:
+        super().__init__(
+            heuristic,
+            max_depth_minimax,
+            max_sec_per_evaluation,
+            verbose,
+            workers,
+        )
+        if transposition_table is None and max_sec_per_move > 0:
+            transposition_table = TranspositionTable()
+        self.transposition_table = transposition_table
+        self.max_sec_per_move = max_sec_per_move
+        self.move_ordering = move_ordering
+        self._use_table = False
+        self._root_first: Any = None
+
+    def _search_with_deadline(
+        self,
+        root: TwoPlayerGameState,
+        in_place: bool,
+        deadline: Optional[Deadline],
+    ) -> Tuple[float, Any]:
+        """Search the root, deepening iteratively if max_sec_per_move > 0."""
+        self._use_table = (
+            self.transposition_table is not None
+            and root.game.supports_zobrist()
+        )
+        if self._use_table:
+            self.transposition_table.new_search()
+        if self.move_ordering is not None:
+            self.move_ordering.new_search()
+        self._root_first = None
+        if self.max_sec_per_move <= 0:
+            return super()._search_with_deadline(root, in_place, deadline)
+
+        end_time = time.time() + self.max_sec_per_move
+        if deadline is not None:
+            end_time = min(end_time, deadline.end_time)
+            self._check_every = deadline.check_every
+        return self._iterative_deepening(root, in_place, end_time)
+
+    def _iterative_deepening(
+        self,
+        root: TwoPlayerGameState,
+        in_place: bool,
+        end_time: float,
+    ) -> Tuple[float, Any]:
+        """Search with increasing depth until end_time."""
+        self._deadline = end_time
+        self._root_best = None
+        self.completed_depth = 0
+        best = None
+        try:
+            for depth in range(1, self.max_depth_minimax + 1):
+                self._root_depth = depth
+                best = self._search_root(root, depth, in_place)
+                self.completed_depth = depth
+                self._root_first = best[1]
+                if self.verbose > 0:
+                    print('Depth {}: minimax value = {:.2g}'.format(depth, best[0]))
+                if time.time() > self._deadline:
+                    break
+        except _SearchTimeout:
+            if self.verbose > 0:
+                print('Depth {} interrupted'.format(self._root_depth))
+        finally:
+            self._deadline = None
+
+        if best is None:
+            # Not even depth 1 was completed.
+            best = self._best_so_far(root, in_place)
+        return best
+
+    def _search_root(
+        self,
+        root: TwoPlayerGameState,
+        depth: int,
+        in_place: bool,
+    ) -> Tuple[float, Any]:
+        """Search the root to the given depth."""
+        if self.workers > 1 and not root.end_of_game:
+            hash_move = self._root_first
+            if hash_move is None and self._use_table:
+                entry = self.transposition_table.probe(root.game.zobrist_hash(root))
+                hash_move = None if entry is None else self._stored_move(root, entry)
+            children = self._ordered_children(root, depth, in_place, hash_move, True)
+            return self._parallel_root(root, depth, children)
+        return self._max_value(root, depth, -np.inf, np.inf, in_place)
+
+    def _search_subtree(
+        self,
+        state: TwoPlayerGameState,
+        depth: int,
+        deadline: Optional[float],
+    ) -> float:
+        """Value of a child of the root, in a worker process."""
+        in_place = state.game.supports_apply_move()
+        self._use_table = (
+            self.transposition_table is not None
+            and state.game.supports_zobrist()
+        )
+        self._root_depth = depth + 1
+        self._root_first = None
+        self._deadline = deadline
+        try:
+            alpha = np.nextafter(self._worker_alpha.value, -np.inf)
+            minimax_value, _ = self._min_value(state, depth, alpha, np.inf, in_place)
+        finally:
+            self._deadline = None
+        return minimax_value
+
+    def _search_child(
+        self,
+        successor: TwoPlayerGameState,
+        depth: int,
+        alpha: float,
+        beta: float,
+        in_place: bool,
+        index: int,
+        maximizing: bool,
+    ) -> float:
+        """Value of the index-th child searched in a MAX or MIN node."""
+        if maximizing:
+            value, _ = self._min_value(successor, depth, alpha, beta, in_place)
+        else:
+            value, _ = self._max_value(successor, depth, alpha, beta, in_place)
+        return value
+
+    def _ordered_children(
+        self,
+        state: TwoPlayerGameState,
+        depth: int,
+        in_place: bool,
+        hash_move: Any,
+        maximizing: bool,
+    ) -> Iterator[Tuple[Any, TwoPlayerGameState]]:
+        """Iterate over the children of a node, best moves first."""
+        if self.move_ordering is None or not in_place:
+            return self.children(state, in_place, hash_move)
+        moves = self.move_ordering.order(
+            state,
+            state.game.legal_moves(state),
+            self._root_depth - depth,
+            depth,
+            hash_move,
+            maximizing,
+        )
+        return self.children(state, in_place, moves=moves)
+
+    def _probe(
+        self,
+        state: TwoPlayerGameState,
+        depth: int,
+        alpha: float,
+        beta: float,
+    ) -> Tuple[int, Any, float, float, Optional[float]]:
+        """Look up a node in the transposition table.
+
+        Returns the hash of the node, the best move stored for it, the
+        search window narrowed by the stored bound, and the stored value
+        if it makes searching the node unnecessary (None otherwise).
+        The root is always searched, so that a legal move is returned.
+        """
+        key = state.game.zobrist_hash(state)
+        entry = self.transposition_table.probe(key)
+        if entry is None:
+            return key, None, alpha, beta, None
+        move = self._stored_move(state, entry)
+        if entry.depth >= depth and depth < self._root_depth:
+            if entry.bound == EXACT:
+                return key, move, alpha, beta, entry.value
+            if entry.bound == LOWER:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+            if alpha >= beta:
+                return key, move, alpha, beta, entry.value
+        return key, move, alpha, beta, None
+
+    def _stored_move(self, state: TwoPlayerGameState, entry: TTEntry) -> Any:
+        """Best move of a transposition table entry."""
+        if not self.transposition_table.move_indices:
+            return entry.move
+        if entry.move is None or entry.move < 0:
+            return None
+        moves = state.game.legal_moves(state)
+        return moves[entry.move] if entry.move < len(moves) else None
+
+    def _store(
+        self,
+        state: TwoPlayerGameState,
+        key: int,
+        depth: int,
+        alpha: float,
+        beta: float,
+        minimax_value: float,
+        minimax_move: Any,
+        in_place: bool,
+    ) -> None:
+        """Store the result of searching a node with window [alpha, beta]."""
+        if self.timed_out:
+            return
+        if minimax_value <= alpha:
+            bound = UPPER
+        elif minimax_value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if not in_place:
+            minimax_move = None
+        elif self.transposition_table.move_indices and minimax_move is not None:
+            minimax_move = state.game.legal_moves(state).index(minimax_move)
+        self.transposition_table.store(
+            key,
+            depth,
+            bound,
+            minimax_value,
+            minimax_move,
+        )
+
+    def _min_value(
+        self,
+        state: TwoPlayerGameState,
+        depth: int,
+        alpha: float = -np.inf,
+        beta: float = np.inf,
+        in_place: bool = False,
+    ) -> Tuple[float, Any]:
+        """Min step of the minimax algorithm with alpha-beta pruning."""
+
+        if self._deadline is not None:
+            self._check_deadline()
+
+        if state.end_of_game or depth == 0:
+            minimax_value = self._evaluate(state)
+            minimax_move = None
+        elif depth == 1 and self.heuristic.vectorized:
+            moves, values = self._evaluate_children(state, in_place)
+            index = int(np.argmin(values))
+            minimax_value, minimax_move = float(values[index]), moves[index]
+        else:
+            key = hash_move = None
+            if self._use_table:
+                key, hash_move, alpha, beta, stored_value = self._probe(
+                    state,
+                    depth,
+                    alpha,
+                    beta,
+                )
+                if stored_value is not None:
+                    return stored_value, hash_move
+            window = alpha, beta
+
+            minimax_value = np.inf
+            minimax_move = None
+
+            children = self._ordered_children(
+                state,
+                depth,
+                in_place,
+                hash_move,
+                False,
+            )
+            cutoff_index = None
+            # In place, state.board is the child's inside the loop.
+            node_board = str(state.board) if self.verbose > 1 else None
+            with closing(children):
+                for index, (move, successor) in enumerate(children):
+                    if self._worker_alpha is not None and depth == self._root_depth - 1:
+                        # Other workers may have found better root moves.
+                        alpha = max(
+                            alpha,
+                            np.nextafter(self._worker_alpha.value, -np.inf),
+                        )
+                    if self.verbose > 1:
+                        print('{}: [{:.2g}, {:.2g}]'.format(
+                                node_board,
+                                alpha,
+                                beta,
+                            )
+                        )
+
+                    successor_minimax_value = self._search_child(
+                        successor,
+                        depth - 1,
+                        alpha,
+                        beta,
+                        in_place,
+                        index,
+                        False,
+                    )
+
+                    if (successor_minimax_value < minimax_value):
+                        minimax_value = successor_minimax_value
+                        minimax_move = move
+                    if minimax_value <= alpha:
+                        cutoff_index = index
+                        self.search_stats.cutoffs += 1
+                        break
+                    beta = min(beta, minimax_value)
+
+            if cutoff_index is not None and self.move_ordering is not None:
+                self.move_ordering.cutoff(
+                    state,
+                    minimax_move,
+                    self._root_depth - depth,
+                    depth,
+                    cutoff_index,
+                )
+            if key is not None:
+                self._store(
+                    state,
+                    key,
+                    depth,
+                    *window,
+                    minimax_value,
+                    minimax_move,
+                    in_place,
+                )
+
+        if self.verbose > 1:
+            print('{}: {}'.format(state.board, minimax_value))
+
+        return minimax_value, minimax_move
+
+    def _max_value(
+        self,
+        state: TwoPlayerGameState,
+        depth: int,
+        alpha: float = -np.inf,
+        beta: float = np.inf,
+        in_place: bool = False,
+    ) -> Tuple[float, Any]:
+        """Max step of the minimax algorithm with alpha-beta pruning."""
+
+        if self._deadline is not None:
+            self._check_deadline()
+
+        if state.end_of_game or depth == 0:
+            minimax_value = self._evaluate(state)
+            minimax_move = None
+        elif depth == 1 and self.heuristic.vectorized:
+            moves, values = self._evaluate_children(state, in_place)
+            index = int(np.argmax(values))
+            minimax_value, minimax_move = float(values[index]), moves[index]
+        else:
+            key = hash_move = None
+            if self._use_table:
+                key, hash_move, alpha, beta, stored_value = self._probe(
+                    state,
+                    depth,
+                    alpha,
+                    beta,
+                )
+                if stored_value is not None:
+                    return stored_value, hash_move
+            root = depth == self._root_depth
+            if root and self._root_first is not None:
+                hash_move = self._root_first
+            window = alpha, beta
+
+            minimax_value = -np.inf
+            minimax_move = None
+
+            children = self._ordered_children(
+                state,
+                depth,
+                in_place,
+                hash_move,
+                True,
+            )
+            cutoff_index = None
+            # In place, state.board is the child's inside the loop.
+            node_board = str(state.board) if self.verbose > 1 else None
+            with closing(children):
+                for index, (move, successor) in enumerate(children):
+                    if self.verbose > 1:
+                        print('{}: [{:.2g}, {:.2g}]'.format(
+                                node_board,
+                                alpha,
+                                beta,
+                            )
+                        )
+
+                    successor_minimax_value = self._search_child(
+                        successor,
+                        depth - 1,
+                        alpha,
+                        beta,
+                        in_place,
+                        index,
+                        True,
+                    )
+
+                    if (successor_minimax_value > minimax_value):
+                        minimax_value = successor_minimax_value
+                        minimax_move = move
+                        if root:
+                            self._root_best = minimax_value, minimax_move
+                    if minimax_value >= beta:
+                        cutoff_index = index
+                        self.search_stats.cutoffs += 1
+                        break
+                    alpha = max(alpha, minimax_value)
+
+            if cutoff_index is not None and self.move_ordering is not None:
+                self.move_ordering.cutoff(
+                    state,
+                    minimax_move,
+                    self._root_depth - depth,
+                    depth,
+                    cutoff_index,
+                )
+            if key is not None:
+                self._store(
+                    state,
+                    key,
+                    depth,
+                    *window,
+                    minimax_value,
+                    minimax_move,
+                    in_place,
+                )
+
+        if self.verbose > 1:
+            print('{}: {}'.format(state.board, minimax_value))
+
+        return minimax_value, minimax_move
+
+
+class PVSStrategy(MinimaxAlphaBetaStrategy):
+    """Principal variation search (NegaScout).
+
+    The first child of each node is searched with the full window and the
+    others with a null window, which only tells whether they are better.
+    A child that turns out to be better is searched again with the full
+    window. If the first move is usually the best one (see transposition
+    tables, iterative deepening and move ordering in
+    MinimaxAlphaBetaStrategy) this visits fewer nodes than alpha-beta.
+    """
+
+    def _search_child(
+        self,
+        successor: TwoPlayerGameState,
+        depth: int,
+        alpha: float,
+        beta: float,
+        in_place: bool,
+        index: int,
+        maximizing: bool,
+    ) -> float:
+        """Value of the index-th child searched in a MAX or MIN node."""
+        bound = alpha if maximizing else beta
+        if index == 0 or np.isinf(bound):
+            return super()._search_child(
+                successor, depth, alpha, beta, in_place, index, maximizing,
+            )
+
+        if maximizing:
+            # Is the child better than alpha?
+            value, _ = self._min_value(
+                successor, depth, alpha, np.nextafter(alpha, np.inf), in_place,
+            )
+        else:
+            # Is the child better than beta?
+            value, _ = self._max_value(
+                successor, depth, np.nextafter(beta, -np.inf), beta, in_place,
+            )
+        if alpha < value < beta:
+            return super()._search_child(
+                successor, depth, alpha, beta, in_place, index, maximizing,
+            )
+        return value
+
+
+class MTDfStrategy(MinimaxAlphaBetaStrategy):
+    """MTD(f) search.
+
+    The minimax value is found with a sequence of null-window alpha-beta
+    searches of the root, each of which tells whether the value is above
+    or below a guess. The first guess is the value of the previous
+    iteration (with iterative deepening) or the heuristic value of the
+    root. The searches reuse each other's results through a transposition
+    table, which is created if none is given. If the value has not been
+    found after max_passes searches, a search with the remaining window
+    is done.
+    """
+
+    def __init__(
+        self,
+        heuristic: Heuristic,
+        max_depth_minimax: int,
+        max_sec_per_evaluation: float = 0,
+        verbose: int = 0,
+        transposition_table: Optional[TranspositionTable] = None,
+        max_sec_per_move: float = 0,
+        move_ordering: Optional[MoveOrdering] = None,
+        max_passes: int = 32,
+    ) -> None:
+        if transposition_table is None:
+            transposition_table = TranspositionTable()
+        super().__init__(
+            heuristic,
+            max_depth_minimax,
+            max_sec_per_evaluation,
+            verbose,
+            transposition_table,
+            max_sec_per_move,
+            move_ordering,
+        )
+        self.max_passes = max_passes
+        self._guess: Optional[float] = None
+
+    def next_move(
+        self,
+        state: TwoPlayerGameState,
+        gui: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> TwoPlayerGameState:
+        """Compute the next state in the game."""
+        self._guess = None
+        return super().next_move(state, gui, deadline)
+
+    def _search_root(
+        self,
+        root: TwoPlayerGameState,
+        depth: int,
+        in_place: bool,
+    ) -> Tuple[float, Any]:
+        """Search the root to the given depth."""
+        if self._guess is None:
+            guess = self.heuristic.evaluate(root)
+        else:
+            guess = self._guess
+        lower, upper = -np.inf, np.inf
+        minimax_value, minimax_move = guess, None
+        n_passes = 0
+        while lower < upper:
+            if n_passes == self.max_passes:
+                minimax_value, minimax_move = self._max_value(
+                    root, depth, lower, upper, in_place,
+                )
+                break
+            n_passes += 1
+            beta = np.nextafter(lower, np.inf) if minimax_value == lower else minimax_value
+            value, move = self._max_value(
+                root, depth, np.nextafter(beta, -np.inf), beta, in_place,
+            )
+            minimax_value = value
+            if value < beta:
+                upper = value
+            else:
+                lower = value
+                # Only a search that fails high proves its move is the best.
+                minimax_move = move
+            if minimax_move is None:
+                minimax_move = move
+
+        if self.verbose > 0:
+            print('MTD(f) depth {}: {} passes'.format(depth, n_passes))
+        self._guess = minimax_value
+        return minimax_value, minimax_move
+
+
+def _init_smp_worker(
+    strategy: LazySMPStrategy,
+    game: TwoPlayerGame,
+    stop_flag: Any,
+) -> None:
+    global _worker
+    strategy._stop_flag = stop_flag
+    strategy._helper = True
+    _worker = strategy, game
+
+
+def _smp_search(
+    board: Any,
+    next_is_player1: bool,
+    max_is_player1: bool,
+    helper_id: int,
+    generation: int,
+    deadline: Optional[float],
+) -> int:
+    """Search the root in a helper process until told to stop.
+
+    Returns the number of nodes visited.
+    """
+    strategy, game = _worker
+    state = TwoPlayerGameState(
+        game=game,
+        initial_player=game.player1 if next_is_player1 else game.player2,
+        player_max=game.player1 if max_is_player1 else game.player2,
+        board=board,
+    )
+    return strategy._helper_search(state, helper_id, generation, deadline)
+
+
+class LazySMPStrategy(MinimaxAlphaBetaStrategy):
+    """Alpha-beta search with Lazy SMP parallelism.
+
+    Besides the main search, workers - 1 helper processes search the same
+    root at the same time, with no other coordination than a transposition
+    table in shared memory (see SharedTranspositionTable) of table_size
+    entries. The results of the helpers make the main search faster. To
+    search different parts of the tree, odd helpers search one ply deeper
+    than the main search and each helper tries a different root move first.
+
+    The move played is the one of the main search, which may use iterative
+    deepening (max_sec_per_move) as MinimaxAlphaBetaStrategy. The game must
+    support apply_move and Zobrist hashing, as Reversi and TicTacToe do.
+    Call close() to stop the helpers and free the table.
+    """
+
+    def __init__(
+        self,
+        heuristic: Heuristic,
+        max_depth_minimax: int,
+        max_sec_per_evaluation: float = 0,
+        verbose: int = 0,
+        max_sec_per_move: float = 0,
+        move_ordering: Optional[MoveOrdering] = None,
+        workers: int = 2,
+        table_size: int = 2**20,
+    ) -> None:
+        super().__init__(
+            heuristic,
+            max_depth_minimax,
+            max_sec_per_evaluation,
+            verbose,
+            None,
+            max_sec_per_move,
+            move_ordering,
+            workers,
+        )
+        self.table_size = table_size
+        self.transposition_table = None
+        self._stop_flag: Any = None
+        self._helper = False
+        self._helper_futures: list = []
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state['_stop_flag'] = None
+        state['_helper_futures'] = []
+        return state
+
+    def close(self) -> None:
+        """Stop the helper processes and free the transposition table."""
+        super().close()
+        self._stop_flag = None
+        if isinstance(self.transposition_table, SharedTranspositionTable):
+            self.transposition_table.close()
+            self.transposition_table.unlink()
+        self.transposition_table = None
+
+    def next_move(
+        self,
+        state: TwoPlayerGameState,
+        gui: bool = False,
+        deadline: Optional[Deadline] = None,
+    ) -> TwoPlayerGameState:
+        """Compute the next state in the game."""
+        assert isinstance(state.game, TwoPlayerGame)
+        if self.transposition_table is None:
+            self.transposition_table = SharedTranspositionTable(self.table_size)
+        if self.workers > 1 and (
+            self._executor is None or self._executor_game is not state.game
+        ):
+            super().close()
+            # Without a lock: only the main process writes it, and
+            # helpers read it every _check_every nodes.
+            self._stop_flag = multiprocessing.RawValue('b', 0)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers - 1,
+                initializer=_init_smp_worker,
+                initargs=(self, state.game, self._stop_flag),
+            )
+            self._executor_game = state.game
+        try:
+            return super().next_move(state, gui, deadline)
+        finally:
+            self._stop_helpers()
+
+    def _search_root(
+        self,
+        root: TwoPlayerGameState,
+        depth: int,
+        in_place: bool,
+    ) -> Tuple[float, Any]:
+        """Search the root to the given depth, with the helpers running."""
+        if self._executor is not None and not self._helper_futures:
+            game = root.game
+            self._stop_flag.value = 0
+            self._helper_futures = [
+                self._executor.submit(
+                    _smp_search,
+                    game.copy_board(root.board),
+                    root.next_player.label == game.player1.label,
+                    root.player_max.label == game.player1.label,
+                    helper_id,
+                    self.transposition_table.generation,
+                    self._deadline,
+                )
+                for helper_id in range(1, self.workers)
+            ]
+        return self._max_value(root, depth, -np.inf, np.inf, in_place)
+
+    def _stop_helpers(self) -> None:
+        """Tell the helpers to stop and wait for them."""
+        if not self._helper_futures:
+            return
+        self._stop_flag.value = 1
+        n_nodes = sum(future.result() for future in self._helper_futures)
+        self._helper_futures = []
+        if self.verbose > 0:
+            print('Lazy SMP helpers: {} nodes'.format(n_nodes))
+
+    def _helper_search(
+        self,
+        root: TwoPlayerGameState,
+        helper_id: int,
+        generation: int,
+        deadline: Optional[float],
+    ) -> int:
+        """Iterative deepening of a helper process (see _smp_search)."""
+        game = root.game
+        in_place = game.supports_apply_move()
+        self.transposition_table.generation = generation
+        self._use_table = game.supports_zobrist()
+        if self.move_ordering is not None:
+            self.move_ordering.new_search()
+        self._deadline = np.inf if deadline is None else deadline
+        self._n_nodes = 0
+        moves = game.legal_moves(root) if in_place else []
+        offset = helper_id % 2
+        try:
+            for depth in range(1 + offset, self.max_depth_minimax + offset + 1):
+                self._root_depth = depth
+                if moves:
+                    self._root_first = moves[helper_id % len(moves)]
+                self._max_value(root, depth, -np.inf, np.inf, in_place)
+        except _SearchTimeout:
+            pass
+        finally:
+            self._deadline = None
+        return self._n_nodes
+
+    def _must_stop(self) -> bool:
+        """Whether the time is up or, in a helper, the search was stopped."""
+        return (self._helper and self._stop_flag.value) or super()._must_stop()
+
+
+class _MCTSNode(object):
+    """Node of the Monte Carlo search tree."""
+
+    __slots__ = ('move', 'parent', 'player_label', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(
+        self,
+        move: Any,
+        parent: Optional[_MCTSNode],
+        player_label: Any,
+        untried: List[Any],
+    ) -> None:
+        self.move = move
+        self.parent = parent
+        # Player that made the move, whose wins are counted.
+        self.player_label = player_label
+        self.children: List[_MCTSNode] = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MCTSStrategy(Strategy):
+    """Monte Carlo tree search with the UCT selection rule.
+
+    Each iteration descends the tree choosing the child that maximizes
+    wins / visits + exploration * sqrt(log(parent visits) / visits),
+    adds a child for an untried move, plays the game to the end from it
+    (a playout) and counts the result in the nodes of the path. Draws
+    count as half a win. The move played is that of the most visited
+    child of the root.
+
+    The search stops after n_iterations iterations or max_sec_per_move
+    seconds, whichever comes first (0 means no limit, but one of them
+    must be set), so it uses all the time it is given. It also stops
+    when the deadline given to next_move expires.
+
+    Moves are applied and undone in place on a single copy of the state,
+    so the game must support apply_move. Playout moves are random, or,
+    if a playout_heuristic is given, the best successor according to it
+    except with probability playout_epsilon. Random playouts are left to
+    the game when it implements random_playout (Reversi plays them on
+    the bitboards).
+    """
+
+    def __init__(
+        self,
+        n_iterations: int = 1000,
+        max_sec_per_move: float = 0,
+        exploration: float = math.sqrt(2),
+        playout_heuristic: Optional[Heuristic] = None,
+        playout_epsilon: float = 0.1,
+        seed: Optional[int] = None,
+        verbose: int = 0,
     ) -> None:
         super().__init__(verbose)
-        self.heuristic = heuristic
-        self.max_depth_minimax = max_depth_minimax
-        self.max_sec_per_evaluation = max_sec_per_evaluation
-        self.timed_out = False
+        if n_iterations <= 0 and max_sec_per_move <= 0:
+            raise ValueError('MCTSStrategy needs n_iterations or max_sec_per_move')
+        self.n_iterations = n_iterations
+        self.max_sec_per_move = max_sec_per_move
+        self.exploration = exploration
+        self.playout_heuristic = playout_heuristic
+        self.playout_epsilon = playout_epsilon
+        self.random = random.Random(seed)
 
     def next_move(
         self,
         state: TwoPlayerGameState,
         gui: bool = False,
+        deadline: Optional[Deadline] = None,
     ) -> TwoPlayerGameState:
         """Compute the next state in the game."""
+        game = state.game
+        assert isinstance(game, TwoPlayerGame)
+        if not game.supports_apply_move():
+            raise ValueError('MCTSStrategy needs a game that supports apply_move')
+        self.search_stats = SearchStats()
+        start_time = time.perf_counter()
+        successor = self.solve_endgame(state, deadline)
+        if successor is not None:
+            self.search_stats.time = time.perf_counter() - start_time
+            return successor
 
-        # NOTE <YOUR CODE HERE>
-        minimax_successor = None
+        board_state = state.copy()
+        root = _MCTSNode(None, None, None, list(game.legal_moves(board_state)))
+        if self.max_sec_per_move > 0:
+            end_time = time.time() + self.max_sec_per_move
+        else:
+            end_time = np.inf
+        if deadline is not None:
+            end_time = min(end_time, deadline.end_time)
+        n_iterations = 0
+        while (
+            (self.n_iterations <= 0 or n_iterations < self.n_iterations)
+            and time.time() < end_time
+        ):
+            self._iterate(root, board_state)
+            n_iterations += 1
 
-        """
-        # Use this code snippet to trace the execution of the algorithm
+        if root.children:
+            best = max(root.children, key=lambda child: child.visits)
+            move = best.move
+        else:
+            best = None
+            move = root.untried[0]
 
-                 if self.verbose > 1:
-                    print('{}: [{:.2g}, {:.2g}]'.format(
-                            state.board,
-                            alpha,
-                            beta,
-                        )
-                    )
-        """
+        if self.verbose > 0:
+            print('MCTS: {} iterations, win rate {:.2f}'.format(
+                n_iterations,
+                best.wins / best.visits if best is not None else 0.5,
+            ))
 
-        return minimax_successor
+        # Each iteration expands a node of the tree.
+        self.search_stats.nodes = n_iterations
+        self.search_stats.time = time.perf_counter() - start_time
+        return game.play_move(state, move)
+
+    def _iterate(self, root: _MCTSNode, state: TwoPlayerGameState) -> None:
+        """Selection, expansion, playout and backpropagation."""
+        game = state.game
+        undo_tokens = []
+        node = root
+
+        # Selection.
+        while not node.untried and node.children:
+            node = self._select_child(node)
+            undo_tokens.append(game.apply_move(state, node.move))
+
+        # Expansion.
+        if node.untried:
+            move = node.untried.pop(self.random.randrange(len(node.untried)))
+            player_label = state.next_player.label
+            undo_tokens.append(game.apply_move(state, move))
+            untried = [] if state.end_of_game else list(game.legal_moves(state))
+            child = _MCTSNode(move, node, player_label, untried)
+            node.children.append(child)
+            node = child
+
+        # Playout.
+        scores = None
+        if self.playout_heuristic is None:
+            scores = game.random_playout(state, self.random)
+        if scores is None:
+            while not state.end_of_game:
+                move = self._playout_move(state, game.legal_moves(state))
+                undo_tokens.append(game.apply_move(state, move))
+            scores = state.scores
+        rewards = {
+            game.player1.label: 0.5 + 0.5*np.sign(scores[0] - scores[1]),
+            game.player2.label: 0.5 + 0.5*np.sign(scores[1] - scores[0]),
+        }
+        while undo_tokens:
+            game.undo_move(state, undo_tokens.pop())
+
+        # Backpropagation.
+        while node is not None:
+            node.visits += 1
+            if node.player_label is not None:
+                node.wins += rewards[node.player_label]
+            node = node.parent
+
+    def _select_child(self, node: _MCTSNode) -> _MCTSNode:
+        """Child with the highest upper confidence bound (UCT)."""
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(
+            node.children,
+            key=lambda child: (
+                child.wins / child.visits
+                + exploration * math.sqrt(log_visits / child.visits)
+            ),
+        )
+
+    def _playout_move(self, state: TwoPlayerGameState, moves: Sequence[Any]) -> Any:
+        """Move of the playout policy."""
+        if (
+            self.playout_heuristic is None
+            or len(moves) == 1
+            or self.random.random() < self.playout_epsilon
+        ):
+            return moves[self.random.randrange(len(moves))]
+
+        game = state.game
+        values = []
+        for move in moves:
+            undo_token = game.apply_move(state, move)
+            try:
+                values.append(self.playout_heuristic.evaluate(state))
+            finally:
+                game.undo_move(state, undo_token)
+        if state.is_player_max(state.next_player):
+            return moves[int(np.argmax(values))]
+        return moves[int(np.argmin(values))]
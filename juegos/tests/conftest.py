@@ -0,0 +1,10 @@
+"""Make the modules of juegos importable from the tests.
+
+The modules of juegos import each other as top-level modules (e.g.
+``from game import Player``), as when the demos are run from juegos.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,81 @@
+"""Tests of the bitboard engine against the dictionary implementation."""
+
+import os
+import random
+import sys
+
+import pytest
+
+from bitboard import DIRECTIONS, OthelloBoard
+
+
+def _captured(board, move, label, enemy):
+    """Discs captured by a move, as in the dictionary boards of Reversi."""
+    captured = []
+    for delta_x, delta_y in DIRECTIONS:
+        x, y = move[0] + delta_x, move[1] + delta_y
+        line = []
+        while board.get((x, y)) == enemy:
+            line.append((x, y))
+            x, y = x + delta_x, y + delta_y
+        if line and board.get((x, y)) == label:
+            captured.extend(line)
+    return captured
+
+
+def _valid_moves(board, label, enemy, height, width):
+    return [
+        (x, y)
+        for x in range(1, width + 1)
+        for y in range(1, height + 1)
+        if (x, y) not in board and _captured(board, (x, y), label, enemy)
+    ]
+
+
+def _initial_board(height, width):
+    x, y = width // 2, height // 2
+    return {(x, y): 'W', (x + 1, y + 1): 'W', (x + 1, y): 'B', (x, y + 1): 'B'}
+
+
+@pytest.mark.parametrize('height, width', [(8, 8), (6, 6), (4, 6), (5, 7), (10, 10)])
+def test_random_games_match_dictionary_boards(height, width):
+    generator = random.Random(height * 100 + width)
+    for _ in range(5):
+        board = _initial_board(height, width)
+        bitboard = OthelloBoard.from_dict(board, height, width)
+        label, enemy = 'B', 'W'
+        n_passes = 0
+        while n_passes < 2:
+            assert bitboard.to_dict() == board
+            moves = _valid_moves(board, label, enemy, height, width)
+            assert sorted(bitboard.legal_moves(label)) == sorted(moves)
+            if moves:
+                n_passes = 0
+                move = generator.choice(moves)
+                captured = _captured(board, move, label, enemy)
+                assert sorted(bitboard.captured(label, move)) == sorted(captured)
+
+                # In place, and undone.
+                placed, flipped = bitboard.play_in_place(label, move)
+                bitboard.unplay(label, placed, flipped)
+                assert bitboard.to_dict() == board
+
+                bitboard = bitboard.play(label, move)
+                board = dict(board)
+                for position in captured + [move]:
+                    board[position] = label
+            else:
+                n_passes += 1
+            label, enemy = enemy, label
+
+
+def test_pacman_uses_the_same_module():
+    juegos = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    pacman = os.path.join(juegos, os.pardir, 'pacman')
+    assert not os.path.exists(os.path.join(pacman, 'bitboard.py'))
+    sys.path.insert(0, pacman)
+    try:
+        import othello
+    finally:
+        sys.path.remove(pacman)
+    assert othello.OthelloBoard is OthelloBoard
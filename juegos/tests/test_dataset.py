@@ -0,0 +1,61 @@
+"""Tests of the self-play datasets."""
+
+import numpy as np
+
+from dataset import SAMPLE_RECORD, SelfPlayWriter, concatenate_shards
+from game import Player, TwoPlayerGameState, TwoPlayerMatch
+from reversi import Reversi
+from strategy import RandomStrategy
+
+
+def _create_match():
+    player1 = Player('player1', RandomStrategy())
+    player2 = Player('player2', RandomStrategy())
+    game = Reversi(player1, player2, 6, 6)
+    return TwoPlayerMatch(
+        TwoPlayerGameState(game=game, initial_player=player1),
+        max_seconds_per_move=0,
+    )
+
+
+def _popcount(bits):
+    return np.array([bin(int(value)).count('1') for value in bits])
+
+
+def test_written_file_loads_with_numpy(tmp_path):
+    path = str(tmp_path / 'shard.npy')
+    match = _create_match()
+    # A small capacity, so that the file grows several times.
+    with SelfPlayWriter(path, capacity=5) as writer:
+        scores = match.play_many(3, seed=0, recorder=writer)
+        writer.flush()
+        flushed = np.load(path)
+        assert flushed.dtype == SAMPLE_RECORD
+        assert len(flushed) == len(writer)
+
+    records = np.load(path)
+    assert np.array_equal(records, flushed)
+    assert writer.n_games == 3
+    # The matches start at ply 0, with the 4 discs of the initial board.
+    starts = np.flatnonzero(records['ply'] == 0)
+    assert len(starts) == 3
+    assert np.all(_popcount(records['black'][starts]) + _popcount(records['white'][starts]) == 4)
+    assert np.all(records['black'] & records['white'] == 0)
+    outcomes = records['outcome'][starts]
+    assert outcomes.tolist() == (scores[:, 0] - scores[:, 1]).astype(int).tolist()
+
+    # Mapped in memory, and joined with another shard.
+    mapped = np.load(path, mmap_mode='r')
+    assert np.array_equal(mapped, records)
+    joined_path = str(tmp_path / 'joined.npy')
+    assert concatenate_shards([path, path], joined_path, chunk_size=7) == 2 * len(records)
+    assert np.array_equal(np.load(joined_path), np.concatenate([records, records]))
+
+
+def test_empty_writer(tmp_path):
+    path = str(tmp_path / 'empty.npy')
+    with SelfPlayWriter(path):
+        pass
+    records = np.load(path)
+    assert records.shape == (0,)
+    assert records.dtype == SAMPLE_RECORD
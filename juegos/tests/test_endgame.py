@@ -0,0 +1,108 @@
+"""Tests of the exact endgame solver against a brute-force search."""
+
+import random
+import time
+
+import pytest
+
+from bitboard import OthelloBoard, geometry, iter_squares, popcount
+from endgame import EndgameSolver
+from game import Player, TwoPlayerGameState
+from reversi import Reversi
+from strategy import RandomStrategy
+
+
+def _brute_force(board_geometry, own, opp):
+    """Final disc difference with perfect play, by plain negamax."""
+    moves = board_geometry.moves(own, opp)
+    if not moves:
+        if not board_geometry.moves(opp, own):
+            return popcount(own) - popcount(opp)
+        return -_brute_force(board_geometry, opp, own)
+    values = []
+    for square in iter_squares(moves):
+        flipped = board_geometry.flips(own, opp, square)
+        values.append(-_brute_force(board_geometry, opp ^ flipped, own | flipped | 1 << square))
+    return max(values)
+
+
+def _random_position(board_geometry, n_empties, generator):
+    """(own, opp) with at most n_empties empty squares, reached by random play."""
+    height, width = board_geometry.height, board_geometry.width
+    center = [
+        (height // 2 - 1) * width + width // 2 - 1,
+        (height // 2 - 1) * width + width // 2,
+        (height // 2) * width + width // 2 - 1,
+        (height // 2) * width + width // 2,
+    ]
+    while True:
+        own = 1 << center[0] | 1 << center[3]
+        opp = 1 << center[1] | 1 << center[2]
+        while True:
+            moves = board_geometry.moves(own, opp)
+            if not moves:
+                if not board_geometry.moves(opp, own):
+                    break  # The game is over: start again.
+                own, opp = opp, own
+                continue
+            if board_geometry.n_squares - popcount(own | opp) <= n_empties:
+                return own, opp
+            square = generator.choice(list(iter_squares(moves)))
+            flipped = board_geometry.flips(own, opp, square)
+            own, opp = opp ^ flipped, own | flipped | 1 << square
+
+
+@pytest.mark.parametrize('height, width, n_empties', [(4, 4, 9), (4, 6, 9), (6, 6, 8), (8, 8, 8)])
+def test_solver_matches_brute_force(height, width, n_empties):
+    board_geometry = geometry(height, width)
+    generator = random.Random(height * 100 + width)
+    solver = EndgameSolver(height, width, fastest_first_empties=5)
+    for _ in range(10):
+        own, opp = _random_position(board_geometry, n_empties, generator)
+        value, square = solver.solve(own, opp)
+        assert value == _brute_force(board_geometry, own, opp)
+        assert solver.exact
+        # The move reaches the value.
+        flipped = board_geometry.flips(own, opp, square)
+        assert -_brute_force(board_geometry, opp ^ flipped, own | flipped | 1 << square) == value
+
+
+def test_win_draw_loss_has_the_right_sign():
+    board_geometry = geometry(6, 6)
+    generator = random.Random(1)
+    solver = EndgameSolver(6, 6)
+    for _ in range(10):
+        own, opp = _random_position(board_geometry, 8, generator)
+        value, _ = solver.solve(own, opp, exact=False)
+        exact_value = _brute_force(board_geometry, own, opp)
+        assert (value > 0) - (value < 0) == (exact_value > 0) - (exact_value < 0)
+
+
+def test_expired_deadline_stops_the_solver():
+    generator = random.Random(2)
+    own, opp = _random_position(geometry(8, 8), 16, generator)
+    solver = EndgameSolver()
+    start_time = time.time()
+    assert solver.solve(own, opp, deadline=start_time - 1) is None
+    assert time.time() - start_time < 1
+
+
+def test_reversi_solves_endgames_only_when_asked():
+    board_geometry = geometry(6, 6)
+    black, white = _random_position(board_geometry, 8, random.Random(3))
+    for endgame_empties, solved in [(None, False), (7, False), (8, True)]:
+        player1 = Player('player1', RandomStrategy())
+        player2 = Player('player2', RandomStrategy())
+        if endgame_empties is None:
+            game = Reversi(player1, player2, 6, 6)
+        else:
+            game = Reversi(player1, player2, 6, 6, endgame_empties=endgame_empties)
+        state = TwoPlayerGameState(
+            game=game,
+            board=OthelloBoard(6, 6, black, white),
+            initial_player=player1,
+        )
+        solution = game.solve_endgame(state)
+        assert (solution is not None) == solved
+        if solved:
+            assert solution[0] == _brute_force(board_geometry, black, white)
@@ -0,0 +1,106 @@
+"""Tests of matches."""
+
+import time
+
+import numpy as np
+import pytest
+
+from game import Player, SearchStats, TwoPlayerGame, TwoPlayerGameState, TwoPlayerMatch
+from heuristic import Heuristic
+from reversi import Reversi
+from strategy import MinimaxAlphaBetaStrategy, RandomStrategy, Strategy
+from tictactoe import TicTacToe
+
+
+class _SlowStrategy(Strategy):
+    """Fills in its statistics, then uses up the time of the move."""
+
+    def next_move(self, state, gui=False, deadline=None):
+        self.search_stats = SearchStats()
+        self.search_stats.nodes = 100
+        while True:
+            time.sleep(0.01)
+
+
+def test_interrupted_move_adds_no_search_stats():
+    player1 = Player('slow', _SlowStrategy())
+    player2 = Player('random', RandomStrategy())
+    game = TicTacToe(player1=player1, player2=player2, dim_board=3)
+    state = TwoPlayerGameState(game=game, board=np.zeros((3, 3)), initial_player=player1)
+    match = TwoPlayerMatch(state, max_seconds_per_move=0.2)
+    scores = match.play_match()
+    assert list(scores) == [-1, 0]
+    assert player1.label not in match.search_stats
+
+
+def test_read_only_state_protects_the_game():
+    player1 = Player('player1', RandomStrategy())
+    player2 = Player('player2', RandomStrategy())
+    game = Reversi(player1, player2, 6, 6)
+    state = TwoPlayerGameState(game=game, initial_player=player1).setup_match()
+    view = state.read_only().game
+    # The methods and attributes of the game are available...
+    assert isinstance(view, Reversi)
+    assert isinstance(view, TwoPlayerGame)
+    assert view.height == 6
+    assert view.board_key(state.board) == game.board_key(state.board)
+    assert len(view.generate_successors(state.read_only())) == 4
+    # ... but nothing can be changed.
+    with pytest.raises(AttributeError):
+        view.height = 8
+    with pytest.raises(AttributeError):
+        view.player1.label = 'X'
+    with pytest.raises(AttributeError):
+        view.apply_move(state, view.legal_moves(state)[0])
+    board = state.read_only().board
+    assert board == state.board
+    assert board.legal_moves('B') == state.board.legal_moves('B')
+    with pytest.raises(AttributeError):
+        board.black = 0
+    with pytest.raises(AttributeError):
+        board.play_in_place('B', board.legal_moves('B')[0])
+    with pytest.raises(AttributeError):
+        board.unplay('B', 1, 0)
+    assert game.height == 6
+    assert player1.label == 'B'
+    assert state.board.black != 0
+    assert len(state.board) == 4
+
+
+class _BoardRecorder(object):
+    """Recorder of play_many that keeps the boards of each match."""
+
+    def __init__(self):
+        self.matches = [[]]
+
+    def add_position(self, state):
+        self.matches[-1].append(state.game.board_key(state.board))
+
+    def end_game(self, state):
+        self.matches.append([])
+
+
+def _coin_difference(state):
+    value = state.game._coin_diff(state.board)
+    return -value if state.is_player_max(state.player1) else value
+
+
+def test_play_many_is_reproducible():
+    heuristic = Heuristic('coins', _coin_difference)
+    player1 = Player('player1', MinimaxAlphaBetaStrategy(heuristic, 2))
+    player2 = Player('player2', MinimaxAlphaBetaStrategy(heuristic, 1))
+    game = Reversi(player1, player2, 6, 6)
+    match = TwoPlayerMatch(
+        TwoPlayerGameState(game=game, initial_player=player1),
+        max_seconds_per_move=0,
+    )
+    runs = []
+    for seed in (0, 0, 1):
+        recorder = _BoardRecorder()
+        scores = match.play_many(4, random_plies=4, seed=seed, recorder=recorder)
+        runs.append((scores.tolist(), recorder.matches))
+    assert runs[0] == runs[1]
+    assert runs[0][1] != runs[2][1]
+    # The random plies make the matches of a run different.
+    first_boards = [boards[5] for boards in runs[0][1][:-1]]
+    assert len(set(first_boards)) > 1
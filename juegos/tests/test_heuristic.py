@@ -0,0 +1,130 @@
+"""Tests of heuristics and of their evaluation cache."""
+
+import random
+
+import numpy as np
+import pytest
+
+from bitboard import OthelloBoard
+from game import Player, TwoPlayerGameState
+from heuristic import _MISSING, EvaluationCache, Heuristic
+from reversi import Reversi
+from strategy import RandomStrategy
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = EvaluationCache(3, 'lru')
+    for key in 'abc':
+        cache.put(key, ord(key))
+    assert cache.get('a') == ord('a')
+    cache.put('d', ord('d'))
+    assert cache.get('b') is _MISSING
+    assert [cache.get(key) for key in 'acd'] == [ord(key) for key in 'acd']
+    assert len(cache) == 3
+    assert cache.evictions == 1
+
+
+def test_clock_gives_a_second_chance_to_used_entries():
+    cache = EvaluationCache(3, 'clock')
+    for key in 'abc':
+        cache.put(key, ord(key))
+    assert cache.get('a') == ord('a')
+    # The hand skips 'a', which was used, and evicts 'b'.
+    cache.put('d', ord('d'))
+    assert cache.get('b') is _MISSING
+    # 'a' lost its second chance, but 'c' is next.
+    cache.put('e', ord('e'))
+    assert cache.get('c') is _MISSING
+    assert [cache.get(key) for key in 'ade'] == [ord(key) for key in 'ade']
+    assert len(cache) == 3
+    assert cache.evictions == 2
+
+
+@pytest.mark.parametrize('policy', ['lru', 'clock'])
+def test_counters_and_updates(policy):
+    cache = EvaluationCache(2, policy)
+    assert cache.get('a') is _MISSING
+    cache.put('a', 1.0)
+    cache.put('a', 2.0)
+    assert cache.get('a') == 2.0
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get('a') is _MISSING
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        EvaluationCache(2, 'fifo')
+
+
+def test_cache_tells_games_apart():
+    heuristic = Heuristic('size', lambda state: state.game.width, cache_size=16)
+    values = []
+    for size in (4, 6, 4):
+        player1 = Player('player1', RandomStrategy())
+        player2 = Player('player2', RandomStrategy())
+        game = Reversi(player1, player2, size, size)
+        # The same bitboards on both sizes.
+        state = TwoPlayerGameState(
+            game=game,
+            board=OthelloBoard(size, size, 0b0110, 0b1001),
+            initial_player=player1,
+            player_max=player1,
+        )
+        values.append(heuristic.evaluate(state))
+        values.append(heuristic.evaluate(state))
+    assert values == [4, 4, 6, 6, 4, 4]
+    assert heuristic.cache.hits == 3
+
+
+
+def _weight(x, y):
+    return 10*x + y
+
+
+def _weighted_squares(state):
+    """Weighted discs of player MAX minus those of the other player."""
+    value = 0
+    for (x, y), label in state.board.items():
+        value += _weight(x, y) if label == state.player_max.label else -_weight(x, y)
+    return float(value)
+
+
+def _weighted_squares_batch(batch):
+    """_weighted_squares of a StateBatch of Reversi states."""
+    height, width = batch.boards.shape[1:]
+    weights = np.array([[_weight(x, y) for x in range(1, width + 1)] for y in range(1, height + 1)])
+    values = (batch.boards * weights).sum(axis=(1, 2))
+    # Boards are 1 for the discs of player 1 ('B').
+    return np.where(batch.player_max_labels == 'B', values, -values)
+
+
+def test_batch_evaluation_matches_single_evaluations():
+    player1 = Player('player1', RandomStrategy())
+    player2 = Player('player2', RandomStrategy())
+    game = Reversi(player1, player2, 6, 8)
+    generator = random.Random(0)
+    states = []
+    for _ in range(5):
+        state = TwoPlayerGameState(game=game, initial_player=player1).setup_match()
+        while not state.end_of_game:
+            state = generator.choice(game.generate_successors(state))
+            position = state.copy()
+            position.player_max = generator.choice((player1, player2))
+            states.append(position)
+
+    heuristic = Heuristic('weights', _weighted_squares)
+    expected = [heuristic.evaluate(state) for state in states]
+    for cache_size in (0, 64):
+        batch_heuristic = Heuristic(
+            'weights',
+            _weighted_squares_batch,
+            vectorized=True,
+            cache_size=cache_size,
+        )
+        assert batch_heuristic.evaluate_batch(states).tolist() == expected
+        # Again, with the cache full or in small batches.
+        assert batch_heuristic.evaluate_batch(states).tolist() == expected
+        assert [batch_heuristic.evaluate(state) for state in states] == expected
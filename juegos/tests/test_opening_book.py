@@ -0,0 +1,78 @@
+"""Tests of the opening books."""
+
+import pytest
+
+from game import Player, TwoPlayerGameState
+from heuristic import Heuristic
+from opening_book import BookStrategy, OpeningBook, build_opening_book
+from reversi import Reversi
+from strategy import MinimaxAlphaBetaStrategy, RandomStrategy
+
+
+class _CountingStrategy(MinimaxAlphaBetaStrategy):
+    """Alpha-beta that counts the moves it searches."""
+
+    n_moves = 0
+
+    def next_move(self, state, gui=False, deadline=None):
+        self.n_moves += 1
+        return super().next_move(state, gui, deadline)
+
+
+def _evaluation_function(state):
+    value = state.game._coin_diff(state.board)
+    return value if state.is_player_max(state.player1) else -value
+
+
+def _initial_state():
+    player1 = Player('player1', RandomStrategy())
+    player2 = Player('player2', RandomStrategy())
+    game = Reversi(player1, player2, 6, 6)
+    return TwoPlayerGameState(game=game, initial_player=player1).setup_match()
+
+
+def test_book_moves_and_fallback(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    state = _initial_state()
+    game = state.game
+    strategy = MinimaxAlphaBetaStrategy(Heuristic('coins', _evaluation_function), 2)
+    # A single game without random moves: the book holds its first 4 plies.
+    assert build_opening_book(state, strategy, path, n_games=1, book_plies=4, epsilon=0) == 4
+    book = OpeningBook(path)
+    assert len(book) == 4
+    move, _ = book.lookup(game.zobrist_hash(state))
+    assert game.play_move(state, move).board == strategy.next_move(state).board
+    book.close()
+
+    fallback = _CountingStrategy(Heuristic('coins', _evaluation_function), 2)
+    book_strategy = BookStrategy(fallback, path)
+    try:
+        # In the book: the move of the strategy, without searching.
+        successor = book_strategy.next_move(state)
+        assert successor.board == strategy.next_move(state).board
+        assert (book_strategy.hits, book_strategy.misses, fallback.n_moves) == (1, 0, 0)
+        # Out of the book: searched by the fallback strategy.
+        other_moves = [
+            move for move in game.legal_moves(state)
+            if game.play_move(state, move).board != successor.board
+        ]
+        off_book = game.play_move(state, other_moves[0])
+        assert book_strategy.book.lookup(game.zobrist_hash(off_book)) is None
+        book_strategy.next_move(off_book)
+        assert (book_strategy.hits, book_strategy.misses, fallback.n_moves) == (1, 1, 1)
+    finally:
+        book_strategy.close()
+
+
+@pytest.mark.parametrize('size', [0, 5, 16 + 8])
+def test_cut_files_are_not_books(tmp_path, size):
+    path = str(tmp_path / 'book.bin')
+    state = _initial_state()
+    strategy = MinimaxAlphaBetaStrategy(Heuristic('coins', _evaluation_function), 1)
+    build_opening_book(state, strategy, path, n_games=1, book_plies=4, epsilon=0)
+    with open(path, 'rb') as book_file:
+        content = book_file.read()
+    with open(path, 'wb') as book_file:
+        book_file.write(content[:size])
+    with pytest.raises(ValueError):
+        OpeningBook(path)
@@ -0,0 +1,231 @@
+"""Tests of the minimax strategies."""
+
+import random
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+from bitboard import OthelloBoard
+from game import Deadline, Player, TwoPlayerGameState
+from heuristic import Heuristic
+from move_ordering import MoveOrdering
+from reversi import Reversi
+from strategy import (
+    LazySMPStrategy,
+    MCTSStrategy,
+    MinimaxAlphaBetaStrategy,
+    MinimaxStrategy,
+    MTDfStrategy,
+    PVSStrategy,
+    RandomStrategy,
+)
+from tictactoe import TicTacToe
+from transposition import TranspositionTable
+
+
+def _evaluation_function(state):
+    """Disc, mobility and corner differences, with a tie-breaker.
+
+    The tie-breaker depends only on the board, so that best moves are
+    unique and strategies that search in a different order agree.
+    """
+    game = state.game
+    tie_breaker = zlib.crc32(repr(game.board_key(state.board)).encode()) % 1000 / 1e6
+    if isinstance(game, TicTacToe):
+        value = float(np.sum(state.board * np.arange(1, 10).reshape(3, 3)))
+    else:
+        value = (
+            game._coin_diff(state.board)
+            + game._choice_diff(state.board)
+            + game._corner_diff(state.board)
+        )
+    value += tie_breaker
+    return value if state.is_player_max(state.player1) else -value
+
+
+HEURISTIC = Heuristic('test', _evaluation_function)
+
+
+def _create_game(game_name):
+    player1 = Player('player1', RandomStrategy())
+    player2 = Player('player2', RandomStrategy())
+    if game_name == 'reversi':
+        return Reversi(player1, player2, 6, 6)
+    return TicTacToe(player1, player2, 3)
+
+
+def _positions(game, n_positions, seed):
+    """Positions of a game played with random moves."""
+    generator = random.Random(seed)
+    state = TwoPlayerGameState(game=game, initial_player=game.player1).setup_match()
+    positions = []
+    while len(positions) < n_positions and not state.end_of_game:
+        positions.append(state)
+        state = generator.choice(game.generate_successors(state))
+    return positions
+
+
+@pytest.mark.parametrize('game_name, depth', [('reversi', 3), ('tictactoe', 4)])
+@pytest.mark.parametrize('strategy_class', [MinimaxStrategy, MinimaxAlphaBetaStrategy])
+def test_in_place_and_copying_searches_agree(monkeypatch, game_name, depth, strategy_class):
+    game = _create_game(game_name)
+    assert game.supports_apply_move()
+    strategy = strategy_class(HEURISTIC, depth)
+    for state in _positions(game, 12, seed=0):
+        in_place_move = strategy.next_move(state).move_code
+        with monkeypatch.context() as patch:
+            patch.setattr(game, 'supports_apply_move', lambda: False)
+            copying_move = strategy.next_move(state).move_code
+        assert in_place_move == copying_move
+
+
+# Strategies that must choose the same move as plain alpha-beta, when
+# created for each position.
+VARIANTS = {
+    'table always': lambda depth: MinimaxAlphaBetaStrategy(
+        HEURISTIC, depth, transposition_table=TranspositionTable(2**12, 'always'),
+    ),
+    'table depth': lambda depth: MinimaxAlphaBetaStrategy(
+        HEURISTIC, depth, transposition_table=TranspositionTable(2**12, 'depth'),
+    ),
+    'table two_tier': lambda depth: MinimaxAlphaBetaStrategy(
+        HEURISTIC, depth, transposition_table=TranspositionTable(2**12, 'two_tier'),
+    ),
+    # Enough time to complete the search to depth.
+    'iterative deepening': lambda depth: MinimaxAlphaBetaStrategy(
+        HEURISTIC, depth, max_sec_per_move=1000,
+    ),
+    'move ordering': lambda depth: MinimaxAlphaBetaStrategy(
+        HEURISTIC, depth, move_ordering=MoveOrdering(),
+    ),
+    'PVS': lambda depth: PVSStrategy(HEURISTIC, depth),
+    'PVS with table': lambda depth: PVSStrategy(
+        HEURISTIC, depth, transposition_table=TranspositionTable(2**12),
+    ),
+    'MTD(f)': lambda depth: MTDfStrategy(HEURISTIC, depth),
+    'MTD(f) with iterative deepening': lambda depth: MTDfStrategy(
+        HEURISTIC, depth, max_sec_per_move=1000,
+    ),
+}
+
+
+@pytest.mark.parametrize('game_name, depth', [('reversi', 4), ('tictactoe', 4)])
+@pytest.mark.parametrize('variant', sorted(VARIANTS))
+def test_variants_play_the_alpha_beta_move(game_name, depth, variant):
+    game = _create_game(game_name)
+    alpha_beta = MinimaxAlphaBetaStrategy(HEURISTIC, depth)
+    for state in _positions(game, 12, seed=1):
+        expected_move = alpha_beta.next_move(state).move_code
+        assert VARIANTS[variant](depth).next_move(state).move_code == expected_move
+
+
+def test_states_searched_in_place_have_no_parent(monkeypatch):
+    game = _create_game('reversi')
+    parents = []
+
+    def evaluation_function(state):
+        parents.append(state.parent)
+        return _evaluation_function(state)
+
+    strategy = MinimaxAlphaBetaStrategy(Heuristic('parents', evaluation_function), 2)
+    state = _positions(game, 5, seed=0)[-1]
+    assert state.parent is not None
+    strategy.next_move(state)
+    assert parents and all(parent is None for parent in parents)
+
+    # Copied successors have the right parent.
+    parents.clear()
+    monkeypatch.setattr(game, 'supports_apply_move', lambda: False)
+    strategy.next_move(state)
+    assert parents and all(parent.parent.board == state.board for parent in parents)
+
+
+@pytest.mark.parametrize('strategy_class', [MinimaxStrategy, MinimaxAlphaBetaStrategy])
+def test_parallel_root_plays_the_serial_move(strategy_class):
+    game = _create_game('reversi')
+    serial = strategy_class(HEURISTIC, 3)
+    parallel = strategy_class(HEURISTIC, 3, workers=2)
+    try:
+        for state in _positions(game, 8, seed=2):
+            assert parallel.next_move(state).move_code == serial.next_move(state).move_code
+    finally:
+        parallel.close()
+
+
+@pytest.mark.parametrize('playout_heuristic', [None, HEURISTIC])
+def test_mcts_takes_the_winning_corner(playout_heuristic):
+    game = _create_game('reversi')
+    # White on turn, 7 empty squares. Only the corner (6, 1) wins
+    # (by 8 discs); the best of the other moves draws.
+    state = TwoPlayerGameState(
+        game=game,
+        board=OthelloBoard(6, 6, 0x20c788218, 0x73077dc5),
+        initial_player=game.player2,
+        player_max=game.player2,
+    )
+    moves = state.legal_moves()
+    strategy = MCTSStrategy(n_iterations=2000, playout_heuristic=playout_heuristic, seed=0)
+    successor = strategy.next_move(state)
+    assert successor.move_code == game._matrix_to_display_coordinates((6, 1))
+    # The search leaves the root as it was.
+    assert game.board_key(state.board) == (0x20c788218, 0x73077dc5)
+    assert state.next_player is game.player2
+    assert state.legal_moves() == moves
+    assert not state.end_of_game
+
+
+@pytest.mark.parametrize('strategy_class, max_sec_per_move', [
+    (MinimaxStrategy, None),
+    (MinimaxAlphaBetaStrategy, 0),
+    (MinimaxAlphaBetaStrategy, 10),  # Iterative deepening.
+])
+def test_short_deadline_plays_the_best_move_so_far(strategy_class, max_sec_per_move):
+    game = _create_game('reversi')
+    state = _positions(game, 10, seed=0)[-1]
+    # Far too deep to finish in the time given.
+    if max_sec_per_move is None:
+        strategy = strategy_class(HEURISTIC, 20)
+    else:
+        strategy = strategy_class(HEURISTIC, 20, max_sec_per_move=max_sec_per_move)
+    start_time = time.time()
+    successor = strategy.next_move(state, deadline=Deadline(0.1))
+    assert time.time() - start_time < 1
+    assert strategy.completed_depth < 20
+    assert successor.move_code in [child.move_code for child in game.generate_successors(state)]
+
+
+def test_lazy_smp_plays_legal_moves():
+    game = _create_game('reversi')
+    positions = _positions(game, 8, seed=1)
+    alpha_beta = MinimaxAlphaBetaStrategy(HEURISTIC, 3)
+    # Without helpers, the search is that of alpha-beta.
+    serial = LazySMPStrategy(HEURISTIC, 3, workers=1)
+    try:
+        for state in positions:
+            assert serial.next_move(state).move_code == alpha_beta.next_move(state).move_code
+    finally:
+        serial.close()
+
+    # Helpers may give deeper values to the main search, so only the
+    # legality of the moves is certain.
+    strategy = LazySMPStrategy(HEURISTIC, 3, workers=2, table_size=2**12)
+    try:
+        for state in positions:
+            move_codes = [child.move_code for child in game.generate_successors(state)]
+            assert strategy.next_move(state).move_code in move_codes
+            assert not strategy._helper_futures
+    finally:
+        strategy.close()
+
+    # Far too deep to finish: the helpers stop at the deadline too.
+    strategy = LazySMPStrategy(HEURISTIC, 20, workers=2, table_size=2**12)
+    try:
+        start_time = time.time()
+        successor = strategy.next_move(positions[-1], deadline=Deadline(0.2))
+        assert time.time() - start_time < 2
+        assert successor.move_code in move_codes
+        assert not strategy._helper_futures
+    finally:
+        strategy.close()
@@ -0,0 +1,169 @@
+"""Tests of the results stored by tournaments."""
+
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import tournament
+from game import Player, TwoPlayerGameState, TwoPlayerMatch
+from strategy import MinimaxAlphaBetaStrategy, MinimaxStrategy
+from tictactoe import TicTacToe
+from tournament import MatchResultStore, Tournament
+
+STUDENT_SOURCE = '''
+from tournament import StudentHeuristic
+
+
+class Solution1(StudentHeuristic):
+    def get_name(self) -> str:
+        return "solution1"
+
+    def evaluation_function(self, state) -> float:
+        return {value}
+'''
+
+
+def _write_students(folder):
+    folder.mkdir()
+    for i, value in enumerate([0, 1]):
+        (folder / 'student{}.py'.format(i)).write_text(STUDENT_SOURCE.format(value=value))
+
+
+def _create_tictactoe_match(player1: Player, player2: Player) -> TwoPlayerMatch:
+    # At module level, so that it can be sent to worker processes.
+    game = TicTacToe(player1=player1, player2=player2, dim_board=3)
+    game_state = TwoPlayerGameState(game=game, board=np.zeros((3, 3)), initial_player=player1)
+    return TwoPlayerMatch(game_state, max_seconds_per_move=1000, gui=False)
+
+
+def _create_tournament(folder, results_path, created_matches=None):
+    # New local functions and partials each time, as in a new session:
+    # their repr changes, but not the key of their matches.
+    def create_strategy(*args, **kwargs):
+        return MinimaxAlphaBetaStrategy(*args, **kwargs)
+
+    def create_match(player1: Player, player2: Player) -> TwoPlayerMatch:
+        if created_matches is not None:
+            created_matches.append((player1.name, player2.name))
+        game = TicTacToe(player1=player1, player2=player2, dim_board=3)
+        game_state = TwoPlayerGameState(
+            game=game,
+            board=np.zeros((3, 3)),
+            initial_player=player1,
+        )
+        return TwoPlayerMatch(game_state, max_seconds_per_move=1000, gui=False)
+
+    tour = Tournament(
+        max_depth=3,
+        init_match=create_match,
+        max_evaluation_time=0.5,
+        strategy_class=functools.partial(create_strategy, workers=1),
+        results_path=str(results_path),
+    )
+    return tour, tour.load_strategies_from_folder(str(folder))
+
+
+def test_stored_matches_are_not_played_again(tmp_path, monkeypatch):
+    folder = tmp_path / 'students'
+    _write_students(folder)
+    results_path = tmp_path / 'results.jsonl'
+    n_played = [0]
+    play_match = tournament._play_match
+
+    def counting_play_match(*args):
+        n_played[0] += 1
+        return play_match(*args)
+
+    monkeypatch.setattr(tournament, '_play_match', counting_play_match)
+
+    tour, strategies = _create_tournament(folder, results_path)
+    first_results = tour.run(strategies)
+    assert n_played[0] > 0
+
+    n_played[0] = 0
+    tour, strategies = _create_tournament(folder, results_path)
+    assert tour.run(strategies) == first_results
+    assert n_played[0] == 0
+
+
+def test_repeated_matches_have_their_own_results(tmp_path):
+    folder = tmp_path / 'students'
+    _write_students(folder)
+    results_path = tmp_path / 'results.jsonl'
+    created_matches = []
+    tour, strategies = _create_tournament(folder, results_path, created_matches)
+    first_results = tour.run(strategies, n_pairs=2)
+    records = [json.loads(line) for line in results_path.read_text().splitlines()]
+    # 2 pairs of matches at depths 1 and 2, each one stored.
+    assert len(records) == len(created_matches) == 8
+    assert len({record['key'] for record in records}) == 8
+
+    # Resuming creates no match, so runs no student code.
+    created_matches = []
+    tour, strategies = _create_tournament(folder, results_path, created_matches)
+    assert tour.run(strategies, n_pairs=2) == first_results
+    assert created_matches == []
+
+
+def test_parallel_tournament_gets_the_serial_results(tmp_path):
+    folder = tmp_path / 'students'
+    _write_students(folder)
+    all_results = []
+    for workers in (1, 2):
+        tour = Tournament(
+            max_depth=4,
+            init_match=_create_tictactoe_match,
+            max_evaluation_time=0.5,
+            strategy_class=MinimaxStrategy,
+        )
+        strategies = tour.load_strategies_from_folder(str(folder))
+        all_results.append(tour.run(strategies, n_pairs=2, workers=workers, progress=False))
+    assert all_results[0] == all_results[1]
+    # 2 pairs of matches at depths 1, 2 and 3, won by the first player.
+    _, totals, _ = all_results[0]
+    assert totals == {'student0.py_solution1': 6, 'student1.py_solution1': 6}
+
+
+def test_concurrent_loads_keep_the_modules_apart(tmp_path, monkeypatch):
+    # Folders with the same file names, but different heuristics.
+    folders = []
+    for value in range(8):
+        folder = tmp_path / 'students{}'.format(value)
+        folder.mkdir()
+        (folder / 'student.py').write_text(STUDENT_SOURCE.format(value=value))
+        folders.append(str(folder))
+    monkeypatch.chdir(tmp_path)
+    tour = Tournament(max_depth=2, init_match=_create_tictactoe_match, max_evaluation_time=0.5)
+    with ThreadPoolExecutor(max_workers=len(folders)) as executor:
+        loaded = list(executor.map(tour.load_strategies_from_folder, folders * 4))
+
+    classes = [strategies['student.py'][0] for strategies in loaded]
+    assert len({cls.__module__ for cls in classes}) == len(classes)
+    assert all(cls.__module__ in sys.modules for cls in classes)
+    values = [cls().evaluation_function(None) for cls in classes]
+    assert values == list(range(len(folders))) * 4
+    # Nothing is written to the current directory.
+    assert sorted(os.listdir(str(tmp_path))) == sorted(os.path.basename(folder) for folder in folders)
+
+
+def test_store_ignores_a_truncated_last_line(tmp_path):
+    path = tmp_path / 'results.jsonl'
+    store = MatchResultStore(str(path))
+    store.add('first', 1, 0)
+    store.add('second', 0, 1)
+    content = path.read_text()
+    path.write_text(content[:-10])  # cut the last line
+
+    store = MatchResultStore(str(path))
+    assert len(store) == 1
+    assert store['first'] == (1, 0)
+    store.add('third', 1, 1)
+
+    store = MatchResultStore(str(path))
+    assert len(store) == 2
+    assert store['third'] == (1, 1)
+    assert json.loads(path.read_text().splitlines()[-1])['key'] == 'third'
@@ -0,0 +1,48 @@
+"""Tests of the tuning of heuristic weights."""
+
+import random
+
+import numpy as np
+
+from game import Player, TwoPlayerGameState
+from reversi import Reversi
+from strategy import RandomStrategy
+from tuning import BoardFeatures, fit_weights
+
+
+def test_fit_recovers_the_weights():
+    generator = np.random.default_rng(0)
+    # Features of very different scales, as those of BoardFeatures.
+    features = generator.normal(size=(5000, 3)) * np.array([50.0, 1.0, 0.01])
+    weights = np.array([0.02, -1.5, 80.0])
+    targets = 1 / (1 + np.exp(-(features @ weights)))
+    fitted = fit_weights(features, targets, n_iterations=5000, tolerance=1e-9)
+    np.testing.assert_allclose(fitted, weights, rtol=1e-3)
+
+
+def test_features_match_those_of_reversi():
+    player1 = Player('player1', RandomStrategy())
+    player2 = Player('player2', RandomStrategy())
+    game = Reversi(player1, player2, 6, 8)
+    generator = random.Random(0)
+    boards = []
+    state = TwoPlayerGameState(game=game, initial_player=player1).setup_match()
+    while not state.end_of_game:
+        boards.append(state.board)
+        state = generator.choice(game.generate_successors(state))
+    boards.append(state.board)
+
+    features = BoardFeatures(6, 8)(
+        np.array([board.black for board in boards], dtype=np.uint64),
+        np.array([board.white for board in boards], dtype=np.uint64),
+    )
+    expected = [
+        [
+            # _coin_diff is that of player2, divided by the number of discs.
+            -game._coin_diff(board),
+            game._choice_diff(board),
+            game._corner_diff(board),
+        ]
+        for board in boards
+    ]
+    np.testing.assert_allclose(features, expected)
@@ -9,12 +9,12 @@
 from __future__ import annotations  # For Python 3.7
 
 import copy
-from typing import Any, List, Optional, Tuple
+from typing import Any, Iterator, List, Optional, Tuple
 from tkinter import Label, Button, DISABLED, NORMAL
 
 import numpy as np
 
-from game import Player, TwoPlayerGame, TwoPlayerGameState
+from game import Player, TwoPlayerGame, TwoPlayerGameState, zobrist_keys
 
 
 class TicTacToe(TwoPlayerGame):
@@ -36,6 +36,17 @@ class TicTacToe(TwoPlayerGame):
         self.dim_board = dim_board
         self.max_score = 1
         self.min_score = -1
+        # Zobrist keys: a cell for each player label and player 2 on turn.
+        n_cells = dim_board * dim_board
+        keys = zobrist_keys('Tictactoe {}'.format(dim_board), 2*n_cells + 1)
+        self._zobrist_cells = {
+            label: [
+                keys[offset + i*dim_board:offset + (i + 1)*dim_board]
+                for i in range(dim_board)
+            ]
+            for label, offset in ((self.player1.label, 0), (self.player2.label, n_cells))
+        }
+        self._zobrist_side = keys[-1]
 
     # Private functions
     def _determine_player_label_complete_line(
@@ -77,25 +88,23 @@ class TicTacToe(TwoPlayerGame):
         state: TwoPlayerGameState,
     ) -> List[TwoPlayerGameState]:
         """Generate the list of successors of a game state."""
-        successors = []
+        return list(self.iter_successors(state))
 
-        n_rows, n_columns = np.shape(state.board)
-        for i in range(n_rows):
-            for j in range(n_columns):
-                if (state.board[i, j] == 0):
-                    # Prevent modification of the board
-                    board_successor = copy.deepcopy(state.board)
-                    assert isinstance(state.next_player, Player)
-                    board_successor[i, j] = state.next_player.label
-                    move_code = self._matrix_to_display_coordinates(i, j)
-                    successor = state.generate_successor(
-                        board_successor,
-                        move_code,
-                    )
-
-                    successors.append(successor)
-
-        return successors
+    def iter_successors(
+        self,
+        state: TwoPlayerGameState,
+    ) -> Iterator[TwoPlayerGameState]:
+        """Generate the successors of a game state one at a time."""
+        assert isinstance(state.next_player, Player)
+        for (i, j) in state.legal_moves():
+            # Prevent modification of the board
+            board_successor = copy.deepcopy(state.board)
+            board_successor[i, j] = state.next_player.label
+            move_code = self._matrix_to_display_coordinates(i, j)
+            yield state.generate_successor(
+                board_successor,
+                move_code,
+            )
 
     def _matrix_to_display_coordinates(
         self,
@@ -104,6 +113,49 @@ class TicTacToe(TwoPlayerGame):
     ) -> str:
         return '({}, {})'.format(chr(ord('a') + i), j + 1)
 
+    def compute_legal_moves(
+        self,
+        state: TwoPlayerGameState,
+        player: Player,
+    ) -> list:
+        """List the empty cells (i, j)."""
+        rows, columns = np.nonzero(state.board == 0)
+        return list(zip(rows.tolist(), columns.tolist()))
+
+    def apply_move(self, state: TwoPlayerGameState, move: Tuple[int, int]) -> tuple:
+        """Make a move on the state in place and return an undo token."""
+        assert isinstance(state.next_player, Player)
+        label = state.next_player.label
+        state.board[move] = label
+        move_code = self._matrix_to_display_coordinates(*move)
+        saved = self._switch_turn(state, move_code)
+        if saved[-1] is not None:
+            i, j = move
+            state._zobrist = (
+                saved[-1] ^ self._zobrist_side ^ self._zobrist_cells[label][i][j]
+            )
+        return move, saved
+
+    def undo_move(self, state: TwoPlayerGameState, undo_token: tuple) -> None:
+        """Take back the move that returned undo_token."""
+        move, saved = undo_token
+        state.board[move] = 0
+        self._restore_turn(state, saved)
+
+    def compute_zobrist(self, state: TwoPlayerGameState) -> int:
+        """Compute the Zobrist hash of a state from scratch."""
+        zobrist = 0
+        if state.next_player.label == self.player2.label:
+            zobrist = self._zobrist_side
+        for label, cells in self._zobrist_cells.items():
+            for i, j in zip(*np.nonzero(state.board == label)):
+                zobrist ^= cells[i][j]
+        return zobrist
+
+    def copy_board(self, board: np.ndarray) -> np.ndarray:
+        """Copy a board so that it can be modified in place."""
+        return np.array(board)
+
     def score(
         self,
         state: TwoPlayerGameState,
@@ -6,24 +6,278 @@
 
 from __future__ import annotations  # For Python 3.7
 
+import functools
+import hashlib
 import inspect  # for dynamic members of a module
+import itertools
+import json
 import os
+import re
 import sys
-import time
 from abc import ABC
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from importlib import util
 import traceback
-from typing import Callable, Tuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 from game import Player, TwoPlayerGameState, TwoPlayerMatch
 from heuristic import Heuristic
 from strategy import MinimaxStrategy
 """
-NOTE: When MinimaxAlphaBetaStrategy has been implemented
-replace MinimaxAlphaBetaStrategy for MinimaxStrategy,
-so that the tournament runs faster.
+NOTE: Any strategy with the arguments of MinimaxStrategy can be
+used in the tournament, e.g. Tournament(..., strategy_class=
+MinimaxAlphaBetaStrategy), PVSStrategy or MTDfStrategy, so that the
+tournament runs faster. Use functools.partial to fix other
+arguments, such as max_sec_per_move.
 """
-# from strategy import MinimaxAlphaBetaStrategy
+
+
+# Attribute with the source of the modules loaded by the tournament.
+_SOURCE_ATTRIBUTE = '__tournament_source__'
+
+
+class _SourceClass(NamedTuple):
+    """Class of a module loaded from source, sent by source to workers.
+
+    Loaded modules are not importable by name, so their classes cannot
+    be pickled as such.
+    """
+
+    module_name: str
+    source: str
+    class_name: str
+
+
+# Modules loaded from source in this process, by hash of their source.
+_loaded_modules: Dict[str, Any] = {}
+
+
+# Numbers that make the names of the loaded modules unique.
+_module_numbers = itertools.count()
+
+
+def _module_from_source(name: str, source: str, filename: Optional[str] = None) -> Any:
+    """Load a module from its source, without writing any file.
+
+    The module is registered in sys.modules under the given name, which
+    should be unique (see _unique_module_name). filename is shown in the
+    tracebacks of errors in the module.
+    """
+    spec = util.spec_from_loader(name, loader=None)
+    module = util.module_from_spec(spec)
+    setattr(module, _SOURCE_ATTRIBUTE, source)
+    sys.modules[name] = module
+    try:
+        exec(compile(source, filename or name, 'exec'), module.__dict__)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def _unique_module_name(name: str) -> str:
+    """Module name for a submission, unique among all the loaded ones."""
+    stem = re.sub(r'\W', '_', os.path.splitext(name)[0])
+    return 'playermodule__%s__%d_%d' % (stem, os.getpid(), next(_module_numbers))
+
+
+def _class_reference(cls: type) -> Any:
+    """Picklable reference to a student class (see _resolve_class)."""
+    source = getattr(sys.modules.get(cls.__module__), _SOURCE_ATTRIBUTE, None)
+    if source is None:
+        return cls
+    return _SourceClass(cls.__module__, source, cls.__qualname__)
+
+
+def _resolve_class(reference: Any) -> type:
+    """Student class of a reference made by _class_reference."""
+    if not isinstance(reference, _SourceClass):
+        return reference
+    module = sys.modules.get(reference.module_name)
+    if getattr(module, _SOURCE_ATTRIBUTE, None) != reference.source:
+        key = hashlib.sha256(reference.source.encode()).hexdigest()
+        module = _loaded_modules.get(key)
+        if module is None:
+            module = _module_from_source(reference.module_name, reference.source)
+            _loaded_modules[key] = module
+    return getattr(module, reference.class_name)
+
+
+def _create_match(
+    init_match: Callable[[Player, Player], TwoPlayerMatch],
+    strategy_class: Callable[..., MinimaxStrategy],
+    max_evaluation_time: float,
+    player1_first: bool,
+    depth: int,
+    name1: str,
+    player1: Any,
+    name2: str,
+    player2: Any,
+) -> TwoPlayerMatch:
+    """Create one match of the tournament, between player1 and player2.
+
+    player1 and player2 are student classes or references to them made by
+    _class_reference, so that matches can be played in worker processes.
+    """
+    players = []
+    for name, reference in ((name1, player1), (name2, player2)):
+        student_heuristic = _resolve_class(reference)()
+        players.append(Player(
+            name=name,
+            strategy=strategy_class(
+                heuristic=Heuristic(
+                    name=student_heuristic.get_name(),
+                    evaluation_function=student_heuristic.evaluation_function),
+                max_depth_minimax=depth,
+                max_sec_per_evaluation=max_evaluation_time,
+                verbose=0,
+            ),
+        ))
+    pl1, pl2 = players
+    if player1_first:
+        return init_match(pl1, pl2)
+    return init_match(pl2, pl1)
+
+
+def _play_match(
+    init_match: Callable[[Player, Player], TwoPlayerMatch],
+    strategy_class: Callable[..., MinimaxStrategy],
+    max_evaluation_time: float,
+    player1_first: bool,
+    depth: int,
+    name1: str,
+    player1: Any,
+    name2: str,
+    player2: Any,
+) -> Tuple[int, int]:
+    """Play one match of the tournament and return (wins, loses) of player1.
+
+    The arguments are those of _create_match.
+    """
+    game = _create_match(init_match, strategy_class, max_evaluation_time,
+                         player1_first, depth, name1, player1, name2, player2)
+    try:
+        game_scores = game.play_match()
+        # let's get the scores (do not assume they will always be binary)
+        # we assume a higher score is better
+        if player1_first:
+            score1, score2 = game_scores[0], game_scores[1]
+        else:
+            score1, score2 = game_scores[1], game_scores[0]
+        wins = loses = 0
+        if score1 > score2:
+            wins, loses = 1, 0
+        elif score2 > score1:
+            wins, loses = 0, 1
+    except Warning:
+        wins = loses = 0
+    return wins, loses
+
+
+def _source(obj: Any) -> str:
+    """Source of the module of a student class or function, or of obj alone.
+
+    Partials are described by the source of their function.
+    """
+    while isinstance(obj, functools.partial):
+        obj = obj.func
+    module = sys.modules.get(getattr(obj, '__module__', None))
+    source = getattr(module, _SOURCE_ATTRIBUTE, None)
+    if source is not None:
+        return source
+    for part in (module, obj):
+        try:
+            return inspect.getsource(part)
+        except (OSError, TypeError):
+            pass
+    return ''
+
+
+def _callable_key(obj: Any) -> Any:
+    """Description of a callable that does not change between runs.
+
+    repr() of functions and partials contains memory addresses, so
+    classes and functions are described by module and qualified name,
+    and partials by their function, arguments and keywords.
+    """
+    if isinstance(obj, functools.partial):
+        return [
+            _callable_key(obj.func),
+            [_callable_key(arg) for arg in obj.args],
+            sorted((name, _callable_key(value)) for name, value in obj.keywords.items()),
+        ]
+    if callable(obj) and hasattr(obj, '__qualname__'):
+        return '{}.{}'.format(getattr(obj, '__module__', None), obj.__qualname__)
+    return repr(obj)
+
+
+def _match_key(init_match: Callable[[Player, Player], TwoPlayerMatch],
+               strategy_class: Any, max_evaluation_time: float,
+               player1_first: bool, depth: int, player1: type, player2: type,
+               repetition: int) -> str:
+    """Content hash of everything that determines the result of a match.
+
+    That is: the source and name of both student classes, the depth, who
+    plays first, the repetition of the match (see n_pairs in
+    Tournament.run), and the settings of the tournament: the function
+    that creates the matches (whose source holds the game, the initial
+    state and the settings of the match), the strategy class and the time
+    per evaluation. Nothing is created, so no student code is run.
+    """
+    content = [
+        [_source(player1), player1.__qualname__],
+        [_source(player2), player2.__qualname__],
+        depth,
+        player1_first,
+        repetition,
+        [_callable_key(init_match), _source(init_match)],
+        _callable_key(strategy_class),
+        max_evaluation_time,
+    ]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+class MatchResultStore(object):
+    """Results of tournament matches, kept in an append-only JSONL file.
+
+    Each line holds the key of a match (see _match_key) and its result,
+    and is written as soon as the match finishes, so an interrupted
+    tournament loses at most the matches that were being played. A line
+    cut by an interruption is ignored when the file is read again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__results: Dict[str, Tuple[int, int]] = dict()
+        if os.path.exists(path):
+            with open(path, 'r') as fp:
+                lines = fp.readlines()
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                    self.__results[record['key']] = (record['wins'], record['loses'])
+                except (ValueError, KeyError):
+                    pass
+            if lines and not lines[-1].endswith('\n'):
+                # end the cut line, so that new results start in a new one
+                with open(path, 'a') as fp:
+                    fp.write('\n')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__results
+
+    def __getitem__(self, key: str) -> Tuple[int, int]:
+        return self.__results[key]
+
+    def __len__(self) -> int:
+        return len(self.__results)
+
+    def add(self, key: str, wins: int, loses: int, **info: Any):
+        """Store the result of a match; info is saved for reference."""
+        self.__results[key] = (wins, loses)
+        record = dict(key=key, wins=wins, loses=loses, **info)
+        with open(self.path, 'a') as fp:
+            fp.write(json.dumps(record) + '\n')
 
 
 class StudentHeuristic(ABC):
@@ -40,37 +294,38 @@ class StudentHeuristic(ABC):
 class Tournament(object):
     def __init__(self, max_depth: int,
                  init_match: Callable[[Player, Player], TwoPlayerMatch],
-                 max_evaluation_time: float):
+                 max_evaluation_time: float,
+                 strategy_class: Callable[..., MinimaxStrategy] = MinimaxStrategy,
+                 results_path: Optional[str] = None):
+        """
+        results_path = file where the result of each match is stored (see
+        MatchResultStore). Matches already stored there are not played
+        again, so an interrupted tournament resumes where it stopped, and
+        only the matches of changed heuristics are played again.
+        """
         self.__max_depth = max_depth
         self.__init_match = init_match
         self.__max_eval_time = max_evaluation_time
+        self.__strategy_class = strategy_class
+        self.__store = None if results_path is None else MatchResultStore(results_path)
 
     def __get_function_from_str(self, name: str, definition: str, max_strat: int) -> list:
-        # write content in file with new name
-        newfile = "playermodule__" + name
-        with open(newfile, 'w') as fp:
-            print(definition, file=fp)
+        # load the content as a new module, in memory and with a unique name
+        m = _module_from_source(_unique_module_name(name), definition, name)
         student_classes = list()
         n_strat = 0
-        # not needed, but this hack somehow fixes some files not being loaded
-        time.sleep(1)
-        sp = util.find_spec(newfile.replace(".py", ""))
-        if sp:
-            m = sp.loader.load_module()
-            # return all the objects that satisfy the function signature
-            for name, obj in inspect.getmembers(m, inspect.isclass):
-                if name != "StudentHeuristic":
-                    for name2, obj2 in inspect.getmembers(obj, inspect.isfunction):
-                        if name2 == "evaluation_function" and n_strat < max_strat:
-                            student_classes.append(obj)
-                            n_strat += 1
-                        elif name2 == "evaluation_function":
-                            print("Ignoring evaluation function in %s because limit of submissions was reached (%d)" % (
-                                name, max_strat), file=sys.stderr)
-                    # end for
-            # end for
-        # remove file
-        os.remove(newfile)
+        # return all the objects that satisfy the function signature
+        for name, obj in inspect.getmembers(m, inspect.isclass):
+            if name != "StudentHeuristic":
+                for name2, obj2 in inspect.getmembers(obj, inspect.isfunction):
+                    if name2 == "evaluation_function" and n_strat < max_strat:
+                        student_classes.append(obj)
+                        n_strat += 1
+                    elif name2 == "evaluation_function":
+                        print("Ignoring evaluation function in %s because limit of submissions was reached (%d)" % (
+                            name, max_strat), file=sys.stderr)
+                # end for
+        # end for
         return student_classes
 
     #   we assume there is one file for each student/pair
@@ -88,16 +343,28 @@ class Tournament(object):
         return student_strategies
 
     def run(self, student_strategies: dict, increasing_depth: bool = True,
-            n_pairs: int = 1, allow_selfmatch: bool = False) -> Tuple[dict, dict, dict]:
+            n_pairs: int = 1, allow_selfmatch: bool = False, workers: int = 1,
+            progress: Optional[bool] = None) -> Tuple[dict, dict, dict]:
         """
         Play a tournament among the strategies.
         n_pairs = games each strategy plays as each color against
         each opponent. So with N strategies, a total of
         N*(N-1)*n_pairs games are played.
+        If workers > 1, the matches are played in that many processes;
+        the results are the same as with a single one. The classes of
+        the strategies loaded from files are sent to them by source.
+        progress = print each result as the match finishes (by default,
+        only when workers > 1).
+        If the tournament has a results_path, the matches stored there are
+        not played again.
         """
         scores = dict()
         totals = dict()
         name_mapping = dict()
+        # (player1_first, depth, name1, player1, name2, player2) of each match
+        matches = []
+        # and the pair of matches it belongs to
+        repetitions = []
         for student1 in student_strategies:
             strats1 = student_strategies[student1]
             for student2 in student_strategies:
@@ -108,7 +375,6 @@ class Tournament(object):
                 strats2 = student_strategies[student2]
                 for player1 in strats1:
                     for player2 in strats2:
-                        # we now instantiate the players
                         for pair in range(2*n_pairs):
                             player1_first = (pair % 2) == 1
                             sh1 = player1()
@@ -118,87 +384,100 @@ class Tournament(object):
                             name2 = student2 + "_" + sh2.get_name()
                             name_mapping[name2] = sh2.get_name()
                             if increasing_depth:
-                                for depth in range(1, self.__max_depth):
-                                    pl1 = Player(
-                                        name=name1,
-                                        strategy=MinimaxStrategy(  # MinimaxAlphaBetaStrategy(
-                                            heuristic=Heuristic(
-                                                name=sh1.get_name(),
-                                                evaluation_function=sh1.evaluation_function),
-                                            max_depth_minimax=depth,
-                                            max_sec_per_evaluation=self.__max_eval_time,
-                                            verbose=0,
-                                        ),
-                                    )
-                                    pl2 = Player(
-                                        name=name2,
-                                        strategy=MinimaxStrategy(  # MinimaxAlphaBetaStrategy(
-                                            heuristic=Heuristic(
-                                                name=sh2.get_name(),
-                                                evaluation_function=sh2.evaluation_function),
-                                            max_depth_minimax=depth,
-                                            max_sec_per_evaluation=self.__max_eval_time,
-                                            verbose=0,
-                                        ),
-                                    )
-
-                                    self.__single_run(
-                                        player1_first, pl1, name1, pl2, name2, scores, totals)
+                                depths = range(1, self.__max_depth)
                             else:
-                                depth = self.__max_depth
-                                pl1 = Player(
-                                    name=name1,
-                                    strategy=MinimaxStrategy(  # MinimaxAlphaBetaStrategy(
-                                        heuristic=Heuristic(
-                                            name=sh1.get_name(),
-                                            evaluation_function=sh1.evaluation_function),
-                                        max_depth_minimax=depth,
-                                        max_sec_per_evaluation=self.__max_eval_time,
-                                        verbose=0,
-                                    ),
-                                )
-                                pl2 = Player(
-                                    name=name2,
-                                    strategy=MinimaxStrategy(  # MinimaxAlphaBetaStrategy(
-                                        heuristic=Heuristic(
-                                            name=sh2.get_name(),
-                                            evaluation_function=sh2.evaluation_function),
-                                        max_depth_minimax=depth,
-                                        max_sec_per_evaluation=self.__max_eval_time,
-                                        verbose=0,
-                                    ),
-                                )
-
-                                self.__single_run(
-                                    player1_first,
-                                    pl1, name1,
-                                    pl2, name2,
-                                    scores, totals)
-        return scores, totals, name_mapping
+                                depths = [self.__max_depth]
+                            for depth in depths:
+                                matches.append((player1_first, depth,
+                                                name1, player1, name2, player2))
+                                repetitions.append(pair // 2)
 
-    def __single_run(self, player1_first: bool, pl1: Player, name1: str,
-                     pl2: Player, name2: str, scores: dict, totals: dict):
-        players = []
-        if player1_first:
-            players = [pl1, pl2]
+        if progress is None:
+            progress = workers > 1
+        results: List[Optional[Tuple[int, int]]] = [None] * len(matches)
+        pending = list(range(len(matches)))
+        keys: List[Optional[str]] = [None] * len(matches)
+        if self.__store is not None:
+            keys = [self.__match_key(*match, repetition)
+                    for match, repetition in zip(matches, repetitions)]
+            for i, key in enumerate(keys):
+                if key in self.__store:
+                    results[i] = self.__store[key]
+            pending = [i for i in pending if results[i] is None]
+            if progress:
+                print('%d of %d matches already played' % (
+                    len(matches) - len(pending), len(matches)))
+
+        def finished(i: int, result: Tuple[int, int]):
+            results[i] = result
+            player1_first, depth, name1, _, name2, _ = matches[i]
+            if self.__store is not None:
+                self.__store.add(keys[i], result[0], result[1], name1=name1,
+                                 name2=name2, depth=depth,
+                                 player1_first=player1_first,
+                                 repetition=repetitions[i])
+            if progress:
+                n_finished = sum(result is not None for result in results)
+                self.__print_progress(n_finished, len(matches), matches[i], result)
+
+        if workers > 1:
+            self.__run_parallel(matches, pending, workers, finished)
         else:
-            players = [pl2, pl1]
-        game = self.__init_match(players[0], players[1])
-        try:
-            game_scores = game.play_match()
-            # let's get the scores (do not assume they will always be binary)
-            # we assume a higher score is better
-            if player1_first:
-                score1, score2 = game_scores[0], game_scores[1]
-            else:
-                score1, score2 = game_scores[1], game_scores[0]
-            wins = loses = 0
-            if score1 > score2:
-                wins, loses = 1, 0
-            elif score2 > score1:
-                wins, loses = 0, 1
-        except Warning:
-            wins = loses = 0
+            for i in pending:
+                finished(i, self.__single_run(*matches[i]))
+        # merge the results in the order of the matches
+        for (_, _, name1, _, name2, _), (wins, loses) in zip(matches, results):
+            self.__add_result(name1, name2, wins, loses, scores, totals)
+        return scores, totals, name_mapping
+
+    def __run_parallel(self, matches: list, pending: List[int], workers: int,
+                       finished: Callable[[int, Tuple[int, int]], Any]):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for i in pending:
+                player1_first, depth, name1, player1, name2, player2 = matches[i]
+                future = executor.submit(
+                    _play_match,
+                    self.__init_match,
+                    self.__strategy_class,
+                    self.__max_eval_time,
+                    player1_first,
+                    depth,
+                    name1,
+                    _class_reference(player1),
+                    name2,
+                    _class_reference(player2),
+                )
+                futures[future] = i
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+
+    def __match_key(self, player1_first: bool, depth: int, name1: str,
+                    player1: type, name2: str, player2: type,
+                    repetition: int) -> str:
+        return _match_key(self.__init_match, self.__strategy_class,
+                          self.__max_eval_time, player1_first, depth, player1,
+                          player2, repetition)
+
+    @staticmethod
+    def __print_progress(n_finished: int, n_matches: int, match: tuple,
+                         result: Tuple[int, int]):
+        player1_first, depth, name1, _, name2, _ = match
+        if not player1_first:
+            name1, name2 = name2, name1
+            result = result[::-1]
+        print('[%d/%d] %s vs %s (depth %d): %d-%d' % (
+            n_finished, n_matches, name1, name2, depth, result[0], result[1]))
+
+    def __single_run(self, player1_first: bool, depth: int, name1: str,
+                     player1: Any, name2: str, player2: Any) -> Tuple[int, int]:
+        return _play_match(
+            self.__init_match, self.__strategy_class, self.__max_eval_time,
+            player1_first, depth, name1, player1, name2, player2)
+
+    @staticmethod
+    def __add_result(name1: str, name2: str, wins: int, loses: int,
+                     scores: dict, totals: dict):
         # store the 1-to-1 numbers
         if name1 not in scores:
             scores[name1] = dict()
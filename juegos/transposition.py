@@ -0,0 +1,324 @@
+"""Transposition tables for game tree search.
+
+A transposition table stores the result of searching a position, indexed
+by its Zobrist hash (see TwoPlayerGame.zobrist_hash), so that the search
+can reuse it when the position is reached again through another sequence
+of moves or in a later search.
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+# Bound types of a stored value.
+EXACT = 0  # The value is the minimax value of the position.
+LOWER = 1  # The search failed high: the minimax value is >= value.
+UPPER = 2  # The search failed low: the minimax value is <= value.
+
+
+class TTEntry(NamedTuple):
+    """Result of searching a position."""
+
+    key: int
+    depth: int
+    bound: int
+    value: float
+    move: Any
+    generation: int
+
+
+def _replace_always(old: TTEntry, key: int, depth: int, generation: int) -> bool:
+    """Always keep the most recent result."""
+    return True
+
+
+def _replace_by_depth(old: TTEntry, key: int, depth: int, generation: int) -> bool:
+    """Keep the deepest result, unless it is stale or from a past search."""
+    return old.key == key or old.generation != generation or depth >= old.depth
+
+
+ReplacementPolicy = Callable[[TTEntry, int, int, int], bool]
+
+REPLACEMENT_POLICIES: Dict[str, ReplacementPolicy] = {
+    'always': _replace_always,
+    'depth': _replace_by_depth,
+}
+
+
+class TranspositionTable(object):
+    """Fixed-size transposition table.
+
+    The table has size slots (rounded up to a power of two) and never
+    grows. When two positions fall in the same slot, the replacement
+    policy decides which one is kept:
+
+        'always': the most recent one.
+        'depth': the one searched deeper (results of a previous search
+            are always replaced, see new_search).
+        'two_tier': each slot has a 'depth' entry and an 'always' entry.
+
+    A callable policy(old_entry, key, depth, generation) -> bool can also
+    be given; it returns whether old_entry should be replaced.
+    """
+
+    # Whether moves are stored as indices in the list of legal moves.
+    move_indices = False
+
+    def __init__(
+        self,
+        size: int = 2**16,
+        replacement: Union[str, ReplacementPolicy] = 'depth',
+    ) -> None:
+        self.size = 1 << max(0, size - 1).bit_length()
+        self._mask = self.size - 1
+        self.two_tier = replacement == 'two_tier'
+        if self.two_tier:
+            self._replace = _replace_by_depth
+        elif callable(replacement):
+            self._replace = replacement
+        else:
+            self._replace = REPLACEMENT_POLICIES[replacement]
+        self.replacement = replacement
+        self.generation = 0
+        self.clear()
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the statistics."""
+        n_entries = 2*self.size if self.two_tier else self.size
+        self._entries: List[Optional[TTEntry]] = [None] * n_entries
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self) -> None:
+        """Mark the entries stored so far as belonging to a past search."""
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """Entry of the position with the given hash, if any."""
+        self.probes += 1
+        index = key & self._mask
+        if self.two_tier:
+            index *= 2
+            entry = self._entries[index]
+            if entry is None or entry.key != key:
+                entry = self._entries[index + 1]
+        else:
+            entry = self._entries[index]
+        if entry is None or entry.key != key:
+            return None
+        self.hits += 1
+        return entry
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        bound: int,
+        value: float,
+        move: Any = None,
+    ) -> None:
+        """Store the result of searching a position."""
+        index = key & self._mask
+        if self.two_tier:
+            index *= 2
+        old = self._entries[index]
+        if old is not None and not self._replace(old, key, depth, self.generation):
+            if not self.two_tier:
+                return
+            index += 1
+            old = self._entries[index]
+        if old is not None and old.key != key:
+            self.overwrites += 1
+        if move is None and old is not None and old.key == key:
+            move = old.move
+        self._entries[index] = TTEntry(key, depth, bound, value, move, self.generation)
+        self.stores += 1
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self._entries)
+
+    def __repr__(self) -> str:
+        return '{}(size={}, replacement={!r}): {} probes, {} hits, {} stores'.format(
+            type(self).__name__,
+            self.size,
+            self.replacement,
+            self.probes,
+            self.hits,
+            self.stores,
+        )
+
+
+# Entries of SharedTranspositionTable: three 64-bit words.
+SHARED_ENTRY_DTYPE = np.dtype([
+    ('check', '<u8'),  # key ^ value ^ info
+    ('value', '<u8'),  # bits of the float64 value
+    ('info', '<u8'),  # depth | bound << 16 | generation << 24 | (move + 1) << 32
+])
+
+
+def _float_bits(value: float) -> int:
+    return struct.unpack('<Q', struct.pack('<d', value))[0]
+
+
+def _bits_float(bits: int) -> float:
+    return struct.unpack('<d', struct.pack('<Q', bits))[0]
+
+
+class SharedTranspositionTable(object):
+    """Transposition table in shared memory, for several processes.
+
+    The entries are a fixed-size numpy record array (see
+    SHARED_ENTRY_DTYPE) in a multiprocessing.shared_memory block, so
+    all the processes that attach to it (by pickling the table, or with
+    SharedTranspositionTable(name=...)) see the same entries.
+
+    There are no locks: processes may write the same entry at once and
+    mix the words of two results. Each entry stores key ^ value ^ info
+    instead of the key, so such an entry does not match its key and is
+    ignored when probed (lockless hashing). Moves are stored as indices
+    in the list of legal moves of the position (move_indices).
+
+    The process that creates the table must call unlink() when it is no
+    longer needed; all of them should call close().
+    """
+
+    move_indices = True
+
+    def __init__(self, size: int = 2**20, name: Optional[str] = None) -> None:
+        self.size = 1 << max(0, size - 1).bit_length()
+        self._mask = self.size - 1
+        nbytes = self.size * SHARED_ENTRY_DTYPE.itemsize
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Only the owner unlinks the block (see resource_tracker).
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+            self._owner = False
+        self.entries = np.ndarray(
+            (self.size,),
+            dtype=SHARED_ENTRY_DTYPE,
+            buffer=self._shm.buf,
+        )
+        self._words = self.entries.view(np.uint64)
+        if self._owner:
+            self.entries.fill(0)
+        self.replacement = 'depth'
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block."""
+        return self._shm.name
+
+    def __reduce__(self) -> tuple:
+        return _attach_shared_table, (self.size, self.name, self.generation)
+
+    def clear(self) -> None:
+        """Remove all the entries and reset the statistics."""
+        self.entries.fill(0)
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self) -> None:
+        """Mark the entries stored so far as belonging to a past search."""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """Entry of the position with the given hash, if any."""
+        self.probes += 1
+        index = 3 * (key & self._mask)
+        words = self._words
+        check = int(words[index])
+        value = int(words[index + 1])
+        info = int(words[index + 2])
+        if info == 0 or check ^ value ^ info != key:
+            return None
+        self.hits += 1
+        return TTEntry(
+            key,
+            info & 0xFFFF,
+            (info >> 16) & 0xFF,
+            _bits_float(value),
+            (info >> 32) - 1,
+            (info >> 24) & 0xFF,
+        )
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        bound: int,
+        value: float,
+        move: Optional[int] = None,
+    ) -> None:
+        """Store the result of searching a position.
+
+        Replaces the old entry of the slot if it is of another search or
+        not deeper (the 'depth' policy of TranspositionTable).
+        """
+        index = 3 * (key & self._mask)
+        words = self._words
+        old_info = int(words[index + 2])
+        if old_info:
+            old_key = int(words[index]) ^ int(words[index + 1]) ^ old_info
+            same_key = old_key == key
+            if not (
+                same_key
+                or (old_info >> 24) & 0xFF != self.generation
+                or depth >= old_info & 0xFFFF
+            ):
+                return
+            if not same_key:
+                self.overwrites += 1
+            elif move is None:
+                move = (old_info >> 32) - 1
+        move = -1 if move is None or move < 0 else move
+        value_bits = _float_bits(value)
+        info = depth | bound << 16 | self.generation << 24 | (move + 1) << 32
+        words[index] = key ^ value_bits ^ info
+        words[index + 1] = value_bits
+        words[index + 2] = info
+        self.stores += 1
+
+    def close(self) -> None:
+        """Detach from the shared memory block."""
+        self.entries = self._words = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Free the shared memory block (only by the process that created it)."""
+        if self._owner:
+            self._shm.unlink()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.entries['info']))
+
+    def __repr__(self) -> str:
+        return '{}(size={}, name={!r}): {} probes, {} hits, {} stores'.format(
+            type(self).__name__,
+            self.size,
+            self.name,
+            self.probes,
+            self.hits,
+            self.stores,
+        )
+
+
+def _attach_shared_table(size: int, name: str, generation: int) -> SharedTranspositionTable:
+    table = SharedTranspositionTable(size, name=name)
+    table.generation = generation
+    return table
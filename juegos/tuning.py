@@ -0,0 +1,280 @@
+"""Tuning of Reversi heuristic weights on self-play positions.
+
+The heuristics of reversi.py combine features such as _coin_diff,
+_choice_diff and _corner_diff with weights chosen by hand. tune_heuristic
+fits those weights to the outcomes of recorded matches (see dataset.py)
+in the style of Texel tuning: the value of a position is a weighted sum
+of its features, and the weights are those for which sigmoid(value)
+best predicts the result of the match (1 for a win of player1, 1/2 for a
+draw and 0 for a loss), found by gradient descent on the logistic loss.
+
+All the features are computed at once for arrays of bitboards with
+NumPy (see BoardFeatures), so a million positions take a few seconds.
+The result is a vectorized Heuristic (see LinearEvaluation).
+"""
+
+from __future__ import annotations  # For Python 3.7
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from bitboard import geometry
+from heuristic import Heuristic, StateBatch
+
+# Features, from the point of view of player1, as in reversi.py:
+# 100 * (player1 - player2) / (player1 + player2) of the number of discs,
+# of legal moves and of corners (0 if the denominator is 0).
+FEATURES = ('coins', 'mobility', 'corners')
+
+# Value of a finished match per disc of difference, so that won positions
+# are above any heuristic value.
+TERMINAL_SCALE = 1000.0
+
+try:
+    _bitwise_count = np.bitwise_count
+except AttributeError:  # NumPy < 2.0
+    _BYTE_COUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+    def _bitwise_count(bits: np.ndarray) -> np.ndarray:
+        counts = _BYTE_COUNTS[bits.reshape(-1, 1).view(np.uint8)]
+        return counts.sum(axis=1, dtype=np.uint8).reshape(bits.shape)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    return _bitwise_count(bits).astype(np.int64)
+
+
+class BoardFeatures(object):
+    """Features of arrays of bitboards, computed with NumPy.
+
+    Bitboards are uint64 arrays with the discs of player1 (black) and
+    player2 (white), as in bitboard.OthelloBoard, so boards can have up
+    to 64 squares.
+    """
+
+    def __init__(self, height: int = 8, width: int = 8) -> None:
+        if height * width > 64:
+            raise ValueError('Boards with more than 64 squares are not supported')
+        self.height = height
+        self.width = width
+        board_geometry = geometry(height, width)
+        self._full = np.uint64(board_geometry.full)
+        self._inner_columns = np.uint64(board_geometry.inner_columns)
+        corners = [0, width - 1, (height - 1) * width, height * width - 1]
+        self._corners = np.uint64(sum(1 << square for square in set(corners)))
+        # Shifts of the flood fill along the four axes, and whether the
+        # axis may wrap around (see bitboard.Geometry.moves).
+        self._axes = [
+            (np.uint64(shift), horizontal)
+            for (shift, horizontal) in (
+                (1, True), (width, False), (width - 1, True), (width + 1, True),
+            )
+            if shift > 0
+        ]
+        self._n_steps = max(height, width) - 2
+
+    def __call__(self, black: np.ndarray, white: np.ndarray) -> np.ndarray:
+        """Array of shape (n_boards, len(FEATURES)) with the features."""
+        return self.from_counts(self.counts(black, white))
+
+    @staticmethod
+    def from_counts(counts: Tuple[np.ndarray, ...]) -> np.ndarray:
+        """Features of the counts returned by counts()."""
+        return np.stack([
+            _relative_difference(counts[0], counts[1]),
+            _relative_difference(counts[2], counts[3]),
+            _relative_difference(counts[4], counts[5]),
+        ], axis=1)
+
+    def counts(
+        self,
+        black: np.ndarray,
+        white: np.ndarray,
+    ) -> Tuple[np.ndarray, ...]:
+        """Discs, legal moves and corners of player1 and player2."""
+        black = np.asarray(black, dtype=np.uint64)
+        white = np.asarray(white, dtype=np.uint64)
+        return (
+            _popcount(black),
+            _popcount(white),
+            _popcount(self.moves(black, white)),
+            _popcount(self.moves(white, black)),
+            _popcount(black & self._corners),
+            _popcount(white & self._corners),
+        )
+
+    def moves(self, own: np.ndarray, opp: np.ndarray) -> np.ndarray:
+        """Legal moves of the player owning own, for each board."""
+        empty = self._full & ~(own | opp)
+        moves = np.zeros_like(own)
+        n_steps = self._n_steps
+        for shift, horizontal in self._axes:
+            mask = opp & self._inner_columns if horizontal else opp
+            run = mask & (own << shift)
+            for _ in range(n_steps):
+                run |= mask & (run << shift)
+            moves |= empty & (run << shift)
+            run = mask & (own >> shift)
+            for _ in range(n_steps):
+                run |= mask & (run >> shift)
+            moves |= empty & (run >> shift)
+        return moves
+
+
+def _relative_difference(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """100 * (first - second) / (first + second), or 0 if both are 0."""
+    total = first + second
+    return 100.0 * (first - second) / np.maximum(total, 1)
+
+
+def _pack(squares: np.ndarray) -> np.ndarray:
+    """uint64 bitboards of a boolean array of shape (n_boards, n_squares)."""
+    packed = np.packbits(squares, axis=1, bitorder='little')
+    bytes_ = np.zeros((len(squares), 8), dtype=np.uint8)
+    bytes_[:, :packed.shape[1]] = packed
+    return bytes_.view('<u8').reshape(len(squares))
+
+
+class LinearEvaluation(object):
+    """Vectorized evaluation function with a weight for each feature.
+
+    The value of a state for player1 is the weighted sum of FEATURES,
+    or TERMINAL_SCALE times the final disc difference at the end of the
+    game; its opposite for player2. Instances can be pickled, so they
+    work with parallel strategies.
+    """
+
+    def __init__(
+        self,
+        weights: Sequence[float],
+        height: int = 8,
+        width: int = 8,
+    ) -> None:
+        self.weights = np.asarray(weights, dtype=float)
+        self.features = BoardFeatures(height, width)
+
+    def __call__(self, batch: StateBatch) -> np.ndarray:
+        """Values of the states of a batch, for player MAX."""
+        game = batch.states[0].game
+        squares = batch.boards.reshape(len(batch), -1)
+        black = _pack(squares == 1)
+        white = _pack(squares == -1)
+        counts = self.features.counts(black, white)
+        values = self.features.from_counts(counts) @ self.weights
+        end_of_game = (counts[2] == 0) & (counts[3] == 0)
+        values[end_of_game] = TERMINAL_SCALE * (counts[0] - counts[1])[end_of_game]
+        values[batch.player_max_labels != game.player1.label] *= -1
+        return values
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(
+            type(self).__name__,
+            ', '.join(
+                '{}={:.4g}'.format(name, weight)
+                for name, weight in zip(FEATURES, self.weights)
+            ),
+        )
+
+
+def outcome_targets(outcomes: np.ndarray) -> np.ndarray:
+    """Results of the matches for player1: 1 (win), 1/2 (draw) or 0 (loss)."""
+    outcomes = np.asarray(outcomes)
+    return 0.5 * (np.sign(outcomes) + 1)
+
+
+def fit_weights(
+    features: np.ndarray,
+    targets: np.ndarray,
+    n_iterations: int = 500,
+    learning_rate: float = 1.0,
+    tolerance: float = 1e-6,
+    verbose: int = 0,
+) -> np.ndarray:
+    """Weights w for which sigmoid(features @ w) best predicts targets.
+
+    Full-batch gradient descent on the mean logistic loss, with the
+    features scaled to unit variance. There is no intercept: the features
+    are antisymmetric in the players, and so is the value. Stops after
+    n_iterations or when no component of the gradient exceeds tolerance.
+    """
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1.0
+    scaled = features / scale
+    targets = np.asarray(targets, dtype=float)
+    weights = np.zeros(features.shape[1])
+    n_samples = len(targets)
+    for n_iteration in range(n_iterations):
+        predictions = 1 / (1 + np.exp(-(scaled @ weights)))
+        gradient = scaled.T @ (predictions - targets) / n_samples
+        weights -= learning_rate * gradient
+        if verbose > 1 or (verbose > 0 and not n_iteration % 100):
+            print('Iteration {}: loss {:.6f}'.format(
+                n_iteration,
+                _logistic_loss(scaled @ weights, targets),
+            ))
+        if np.max(np.abs(gradient)) < tolerance:
+            break
+    return weights / scale
+
+
+def _logistic_loss(values: np.ndarray, targets: np.ndarray) -> float:
+    # log(1 + exp(-v)) = logaddexp(0, -v), without overflow.
+    return float(np.mean(
+        targets * np.logaddexp(0, -values)
+        + (1 - targets) * np.logaddexp(0, values)
+    ))
+
+
+def tune_heuristic(
+    records: np.ndarray,
+    height: int = 8,
+    width: int = 8,
+    name: str = 'Tuned heuristic',
+    min_ply: int = 0,
+    chunk_size: int = 2**20,
+    n_iterations: int = 500,
+    learning_rate: float = 1.0,
+    verbose: int = 0,
+) -> Heuristic:
+    """Fit the weights of FEATURES to recorded positions.
+
+    Args:
+        records: array of dataset.SAMPLE_RECORD, e.g. a self-play shard
+            loaded with numpy.load (mmap_mode='r' works too: records are
+            read chunk_size at a time).
+        height, width: size of the board of the records.
+        name: name of the heuristic.
+        min_ply: positions of the first min_ply plies of each match are
+            left out (e.g. the random plies of play_many).
+        n_iterations, learning_rate, verbose: see fit_weights.
+
+    Returns:
+        A vectorized Heuristic with a LinearEvaluation of the weights,
+        which can be used by any minimax strategy.
+    """
+    board_features = BoardFeatures(height, width)
+    features = []
+    targets = []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        if min_ply > 0:
+            chunk = chunk[chunk['ply'] >= min_ply]
+        features.append(board_features(chunk['black'], chunk['white']))
+        targets.append(outcome_targets(chunk['outcome']))
+    if not features or not sum(len(chunk) for chunk in targets):
+        raise ValueError('No positions to tune the heuristic')
+    features = np.concatenate(features)
+    targets = np.concatenate(targets)
+
+    weights = fit_weights(
+        features,
+        targets,
+        n_iterations=n_iterations,
+        learning_rate=learning_rate,
+        verbose=verbose,
+    )
+    evaluation = LinearEvaluation(weights, height, width)
+    if verbose > 0:
+        print('{}: {}'.format(name, evaluation))
+    return Heuristic(name, evaluation, vectorized=True)
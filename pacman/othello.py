@@ -13,13 +13,37 @@
 #
 # This file was implemented by Alejandro Bellogin (alejandro.bellogin@uam.es).
 
+import os
 import search
 import random
+import sys
 
+from importlib import util
 from timeit import default_timer as timer
 from datetime import timedelta
 
 
+def _load_bitboard():
+    """The bitboard engine of juegos/bitboard.py, shared with Reversi.
+
+    It is loaded from its file, rather than by adding juegos/ to sys.path,
+    so that the other modules of juegos (e.g. game.py) do not shadow those
+    of pacman. It is registered as 'bitboard', so that boards can be pickled.
+    """
+    if 'bitboard' in sys.modules:
+        return sys.modules['bitboard']
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'juegos', 'bitboard.py')
+    spec = util.spec_from_file_location('bitboard', path)
+    module = util.module_from_spec(spec)
+    sys.modules['bitboard'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+OthelloBoard = _load_bitboard().OthelloBoard
+
+
 def from_dictionary_to_array_board(board_dictionary, height, width):
     """From dictionary to array representation."""
     board_array = []
@@ -65,6 +89,8 @@ class OthelloState:
 
     def __init__(self, board: dict, player1='B', player2='W', cur_player='B', height=8, width=8):
         "Creates a new OthelloState."
+        if not isinstance(board, OthelloBoard):
+            board = OthelloBoard.from_dict(board, height, width, labels=(player1, player2))
         self.board = board
         self.player1 = player1
         self.player2 = player2
@@ -80,62 +106,12 @@ class OthelloState:
                    self.board.get((self.width, 1)), self.board.get((self.width, self.height))]
         return corners.count(self.player1) + corners.count(self.player2) >= min_corners
 
-    def __capture_enemy_in_dir(self, board: dict, move, player: str, delta_x_y) -> list:
-        enemy = self.player2 if player == self.player1 else self.player1
-        (delta_x, delta_y) = delta_x_y
-        x, y = move
-        x, y = x + delta_x, y + delta_y
-        enemy_list_0 = []
-        while board.get((x, y)) == enemy:
-            enemy_list_0.append((x, y))
-            x, y = x + delta_x, y + delta_y
-        if board.get((x, y)) != player:
-            del enemy_list_0[:]
-        x, y = move
-        x, y = x - delta_x, y - delta_y
-        enemy_list_1 = []
-        while board.get((x, y)) == enemy:
-            enemy_list_1.append((x, y))
-            x, y = x - delta_x, y - delta_y
-        if board.get((x, y)) != player:
-            del enemy_list_1[:]
-        return enemy_list_0 + enemy_list_1
-
-    def __enemy_captured_by_move(self, board: dict, move, player: str) -> list:
-        return self.__capture_enemy_in_dir(board, move, player, (0, 1)) \
-            + self.__capture_enemy_in_dir(board, move, player, (1, 0)) \
-            + self.__capture_enemy_in_dir(board, move, player, (1, -1)) \
-            + self.__capture_enemy_in_dir(board, move, player, (1, 1))
-
-    def __get_valid_moves(self, board: dict, player: str) -> list:
-        """Returns a list of valid moves for the player judging from the board."""
-        # Get all positions adjacent to existing pieces
-        candidates = set()
-        # Check all 8 directions around each occupied position
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0),
-                      (1, 1), (1, -1), (-1, 1), (-1, -1)]
-        for (x, y) in board.keys():
-            for dx, dy in directions:
-                adj_x, adj_y = x + dx, y + dy
-                # Only consider positions within board bounds and not occupied
-                if (1 <= adj_x <= self.width and
-                    1 <= adj_y <= self.height and
-                        (adj_x, adj_y) not in board):
-                    candidates.add((adj_x, adj_y))
-        # Now check only these candidate positions for valid moves
-        valid_moves = []
-        for pos in candidates:
-            if self.__enemy_captured_by_move(board, pos, player):
-                valid_moves.append(pos)
-
-        return valid_moves
-
     def legalMoves(self):
         """
           Returns a list of legal moves from the current state.
         """
         next_player = self.player2 if self.cur_player == self.player1 else self.player1
-        return self.__get_valid_moves(self.board, next_player)
+        return self.board.legal_moves(next_player)
 
     def result(self, move):
         """
@@ -144,13 +120,9 @@ class OthelloState:
         NOTE: This function *does not* change the current object.  Instead,
         it returns a new object.
         """
-        result_board = self.board.copy()  # shallow copy is enough
-        # show the move on the board
+        # show the move on the board and flip enemy
         adversary = self.player2 if self.cur_player == self.player1 else self.player1
-        result_board[move] = adversary
-        # flip enemy
-        for enemy in self.__enemy_captured_by_move(self.board, move, adversary):
-            result_board[enemy] = adversary
+        result_board = self.board.play(adversary, move)
         newState = OthelloState(result_board, self.player1,
                                self.player2, adversary,
                                self.height, self.width)
@@ -165,14 +137,14 @@ class OthelloState:
         return self.board == other.board
 
     def __hash__(self):
-        return hash(self.__getAsciiString())
+        return hash(self.board)
 
     def __getAsciiString(self):
         """
           Returns a display string for the state
         """
         adversary = self.player2 if self.cur_player == self.player1 else self.player1
-        moves = self.__get_valid_moves(self.board, adversary)
+        moves = set(self.board.legal_moves(adversary))
         lines = []
         for y in range(0, self.height + 1):
             rowLine = ''